@@ -4,18 +4,13 @@ Text-to-SQL interface for data quality management and analysis.
 """
 
 import streamlit as st
-import pandas as pd
-import pandasql as ps
 from pathlib import Path
 import sys
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent / 'src'))
 
-from data_loader import DataLoader
-from llm_service import LLMService
-from query_handler import QueryHandler
-from sql_validator import SQLValidator
+from query_pipeline import QueryPipeline, create_pipeline
 
 
 # Page configuration
@@ -48,27 +43,9 @@ st.markdown("""
 
 
 @st.cache_resource
-def init_services():
+def init_services() -> QueryPipeline:
     """Initialize all services (cached to avoid re-initialization)."""
-    data_loader = DataLoader("Data Dump - Accrual Accounts.xlsx")
-    data_loader.load_data()
-
-    llm_service = LLMService()
-    query_handler = QueryHandler()
-    sql_validator = SQLValidator()
-
-    return data_loader, llm_service, query_handler, sql_validator
-
-
-def execute_sql_query(sql: str, df: pd.DataFrame, table_name: str) -> pd.DataFrame:
-    """Execute SQL query on DataFrame using pandasql."""
-    try:
-        # Create a local namespace with the dataframe
-        locals_dict = {table_name: df}
-        result = ps.sqldf(sql, locals_dict)
-        return result
-    except Exception as e:
-        raise Exception(f"Query execution error: {str(e)}")
+    return create_pipeline()
 
 
 def main():
@@ -83,23 +60,33 @@ def main():
 
     # Initialize services
     try:
-        data_loader, llm_service, query_handler, sql_validator = init_services()
+        pipeline = init_services()
     except Exception as e:
         st.error(f"Failed to initialize services: {str(e)}")
         st.info("Please ensure OPENAI_API_KEY is set in .env file")
         return
 
+    data_catalog = pipeline.data_catalog
+
     # Sidebar with information
     with st.sidebar:
         st.header("📊 Dataset Information")
-        summary = data_loader.get_data_summary()
+        summary = data_catalog.get_data_summary()
 
+        if summary['table_count'] > 1:
+            st.metric("Tables", summary['table_count'])
         st.metric("Total Rows", f"{summary['row_count']:,}")
         st.metric("Columns", summary['column_count'])
+        if 'memory_bytes_before_compaction' in summary:
+            before = summary['memory_bytes_before_compaction']
+            st.metric("Memory", f"{summary['memory_bytes'] / 1024 / 1024:.1f} MB",
+                      delta=f"{(summary['memory_bytes'] - before) / 1024 / 1024:.1f} MB",
+                      delta_color="inverse")
 
-        with st.expander("📋 Column Names"):
-            for col in summary['columns']:
-                st.text(f"• {col}")
+        for table_name, table in summary['tables'].items():
+            with st.expander(f"📋 {table_name} ({table['row_count']:,} rows)"):
+                for col in table['columns']:
+                    st.text(f"• {col}")
 
         with st.expander("ℹ️ About"):
             st.markdown("""
@@ -117,6 +104,29 @@ def main():
             - What is the total value by country?
             """)
 
+        cache_stats = pipeline.response_cache.stats()
+        st.caption(
+            f"Response cache: {cache_stats['hits']} hits, "
+            f"{cache_stats['misses']} misses"
+        )
+        result_stats = pipeline.result_cache.stats()
+        st.caption(
+            f"Result cache: {result_stats['hits']} hits, "
+            f"{result_stats['size_bytes'] / 1024 / 1024:.1f} MB"
+        )
+        prompt_stats = pipeline.llm_service.prompt_cache.stats()
+        if prompt_stats['requests']:
+            st.caption(
+                f"Prompt cache: {prompt_stats['hits']}/{prompt_stats['requests']} hits, "
+                f"{prompt_stats['cached_share']:.0%} of prompt tokens cached"
+            )
+        failed_sql_cache = pipeline.failed_sql_cache
+        if len(failed_sql_cache):
+            st.caption(
+                f"Failed queries: {len(failed_sql_cache)} remembered, "
+                f"{failed_sql_cache.hits} not run again"
+            )
+
         st.divider()
         st.caption("Powered by GPT-4o-mini")
 
@@ -137,48 +147,37 @@ def main():
         if submit_button and user_question:
             with st.spinner("🤖 Generating SQL query..."):
                 try:
-                    # Build prompts
-                    schema = data_loader.get_schema_description()
-                    prompts = query_handler.build_prompt(user_question, schema)
-
-                    # Get SQL from LLM
-                    llm_response = llm_service.generate_sql_with_retry(prompts)
-
-                    # Extract SQL from response
-                    sql_query = sql_validator.extract_sql_from_response(llm_response)
-
-                    # Validate SQL
-                    is_valid, error_message = sql_validator.validate(sql_query)
-
-                    if not is_valid:
-                        # Try to correct the query
-                        st.warning(f"First attempt failed: {error_message}. Trying to correct...")
-
-                        correction_prompts = query_handler.build_correction_prompt(
-                            user_question, schema, sql_query, error_message
+                    # Show the result first; a streamed explanation is read afterwards
+                    result = pipeline.run(user_question, wait_for_explanation=False)
+
+                    for number, attempt in enumerate(result.attempts, start=1):
+                        if result.status == "ok" or number < len(result.attempts):
+                            st.warning(f"Attempt {number} failed: {attempt.error}. Trying to correct...")
+
+                    if result.status != "ok":
+                        st.error(f"❌ Could not generate a working query: {result.error}")
+                        st.code(result.attempts[-1].sql, language="sql")
+                        return
+
+                    if result.source == "intent":
+                        st.caption("⚡ Answered from a common question pattern, without the LLM")
+                    elif result.source == "cache":
+                        st.caption("⚡ Answered from cache")
+                    elif result.source == "similar":
+                        st.caption(
+                            f"♻️ Reused SQL from a similar question: \"{result.similar.question}\" "
+                            f"(similarity {result.similar.score:.2f})"
                         )
 
-                        llm_response = llm_service.generate_sql_with_retry(correction_prompts)
-                        sql_query = sql_validator.extract_sql_from_response(llm_response)
-
-                        is_valid, error_message = sql_validator.validate(sql_query)
-
-                        if not is_valid:
-                            st.error(f"❌ Could not generate valid SQL: {error_message}")
-                            st.code(sql_query, language="sql")
-                            return
+                    for note in result.notes:
+                        st.info(f"ℹ️ {note}")
 
                     # Display generated SQL
-                    with st.expander("📝 Generated SQL Query", expanded=True):
-                        st.code(sql_query, language="sql")
-
-                    # Execute query
-                    with st.spinner("⚙️ Executing query..."):
-                        result_df = execute_sql_query(
-                            sql_query,
-                            data_loader.df,
-                            data_loader.table_name
-                        )
+                    title = "📝 Corrected SQL Query" if result.attempts else "📝 Generated SQL Query"
+                    with st.expander(title, expanded=True):
+                        st.code(result.sql, language="sql")
+
+                    result_df = result.df
 
                     # Display results
                     st.success("✅ Query executed successfully!")
@@ -212,9 +211,9 @@ def main():
                         mime="text/csv"
                     )
 
-                    # Extract explanation from LLM response
-                    if "Explanation:" in llm_response:
-                        explanation = llm_response.split("Explanation:")[1].strip()
+                    # Finish reading the streamed explanation
+                    explanation = result.finish()
+                    if explanation:
                         st.info(f"💡 **Explanation:** {explanation}")
 
                 except Exception as e:
@@ -225,9 +224,9 @@ def main():
         # Quick stats
         st.subheader("📈 Quick Stats")
 
-        if data_loader.df is not None:
-            df = data_loader.df
-
+        # Stats for the first (main) table
+        df = data_catalog.loaders[0].df
+        if df is not None:
             # Currency breakdown
             if 'Currency' in df.columns:
                 st.write("**Currencies:**")
@@ -0,0 +1,356 @@
+"""
+API Server Module
+Serves the question-to-result pipeline over HTTP, for scheduled jobs and
+other services that do not go through the Streamlit app.
+
+Usage:
+    python src/api_server.py --host 0.0.0.0 --port 8000 --workers 4
+
+Endpoints:
+    POST /query   {"question": "...", "format": "json" | "ndjson" | "arrow", "max_rows": 1000}
+    GET  /health  Liveness and loaded tables, for load balancer checks
+    GET  /stats   Request, cache and prompt cache statistics
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from llm_service_async import AsyncLLMService, LoopBoundLLMService
+from query_pipeline import PipelineResult, QueryPipeline, create_pipeline
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+FORMATS = {"json": "application/json", "ndjson": NDJSON_MEDIA_TYPE, "arrow": ARROW_MEDIA_TYPE}
+
+# Rows per NDJSON write and per Arrow record batch of a streamed result
+STREAM_CHUNK_ROWS = 5000
+
+# Rows returned in a JSON body when the request does not say; streamed
+# formats return every row unless max_rows is given
+DEFAULT_JSON_ROWS = 1000
+
+
+class ConcurrencyLimiter:
+    """
+    Caps the questions answered at once.
+
+    A request waits for a free slot up to the queue timeout and is then
+    turned away, so a busy instance sheds load instead of queueing without
+    bound and the load balancer can send the request elsewhere.
+    """
+
+    def __init__(self, limit: int, queue_timeout: float):
+        """
+        Initialize the limiter.
+
+        Args:
+            limit: Questions answered at once
+            queue_timeout: Seconds a request may wait for a slot
+        """
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def acquire(self) -> bool:
+        """
+        Wait for a slot.
+
+        Returns:
+            True when a slot was taken (release() it afterwards), False
+            when none came free within the queue timeout
+        """
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            return False
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += 1
+        return True
+
+    def release(self) -> None:
+        """Give a slot back."""
+        self.in_flight -= 1
+        self.completed += 1
+        self._semaphore.release()
+
+    def stats(self) -> Dict:
+        """
+        Get request statistics.
+
+        Returns:
+            Dictionary with the limit and the requests in flight, waiting,
+            completed and rejected
+        """
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected
+        }
+
+
+def result_metadata(result: PipelineResult) -> Dict:
+    """
+    Describe a result without its rows.
+
+    Args:
+        result: Pipeline result
+
+    Returns:
+        JSON-serializable dictionary
+    """
+    metadata = {
+        "question": result.question,
+        "status": result.status,
+        "sql": result.sql,
+        "source": result.source,
+        "attempts": [{"sql": attempt.sql, "error": attempt.error} for attempt in result.attempts],
+        "notes": result.notes,
+        "error": result.error,
+        "explanation": result.explanation,
+        "elapsed_seconds": result.elapsed_seconds
+    }
+    if result.df is not None:
+        metadata["row_count"] = len(result.df)
+        metadata["columns"] = [str(column) for column in result.df.columns]
+    return metadata
+
+
+def json_body(result: PipelineResult, max_rows: int) -> str:
+    """Render a result and up to max_rows rows as one JSON document."""
+    metadata = result_metadata(result)
+    df = result.df.head(max_rows)
+    metadata["truncated"] = len(df) < len(result.df)
+
+    # The rows are serialized by pandas and spliced in, not parsed again
+    rows = df.to_json(orient="records", date_format="iso")
+    return json.dumps(metadata, ensure_ascii=False)[:-1] + ', "rows": ' + rows + "}"
+
+
+def ndjson_chunks(result: PipelineResult, df: pd.DataFrame) -> Iterator[str]:
+    """Yield the metadata line, then the rows as JSON lines, a chunk at a time."""
+    metadata = result_metadata(result)
+    metadata["truncated"] = len(df) < len(result.df)
+    yield json.dumps(metadata, ensure_ascii=False) + "\n"
+
+    for start in range(0, len(df), STREAM_CHUNK_ROWS):
+        chunk = df.iloc[start:start + STREAM_CHUNK_ROWS]
+        yield chunk.to_json(orient="records", lines=True, date_format="iso").rstrip("\n") + "\n"
+
+
+def arrow_table(result: PipelineResult, df: pd.DataFrame) -> pa.Table:
+    """Convert result rows to an Arrow table with the metadata in its schema."""
+    metadata = result_metadata(result)
+    metadata["truncated"] = len(df) < len(result.df)
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    return table.replace_schema_metadata({b"result": json.dumps(metadata).encode()})
+
+
+def arrow_chunks(table: pa.Table) -> Iterator[bytes]:
+    """Yield an Arrow IPC stream, one record batch at a time."""
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=STREAM_CHUNK_ROWS):
+            writer.write_batch(batch)
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    yield sink.getvalue()
+
+
+def pick_format(body: Dict, accept: str) -> Optional[str]:
+    """Choose the response format from the request body, then the Accept header."""
+    if body.get("format"):
+        return body["format"] if body["format"] in FORMATS else None
+    for name, media_type in FORMATS.items():
+        if media_type in accept:
+            return name
+    return "json"
+
+
+def create_app(pipeline: Optional[QueryPipeline] = None, max_concurrency: Optional[int] = None,
+               queue_timeout: Optional[float] = None) -> Starlette:
+    """
+    Build the ASGI application.
+
+    Args:
+        pipeline: Pipeline to serve (created from the environment at startup
+            when None, and closed at shutdown)
+        max_concurrency: Questions answered at once (defaults to API_MAX_CONCURRENCY)
+        queue_timeout: Seconds a request may wait for a slot (defaults to API_QUEUE_TIMEOUT)
+
+    Returns:
+        Starlette application
+    """
+    max_concurrency = max_concurrency or int(os.getenv('API_MAX_CONCURRENCY', '8'))
+    queue_timeout = queue_timeout if queue_timeout is not None else \
+        float(os.getenv('API_QUEUE_TIMEOUT', '10'))
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette):
+        owns_pipeline = pipeline is None
+        llm_service = None
+        if owns_pipeline:
+            # LLM requests run on this loop, sharing one connection pool
+            llm_service = AsyncLLMService(max_concurrency=max_concurrency)
+            # The whole response is sent at once, so there is nothing to gain from streaming
+            app.state.pipeline = await asyncio.to_thread(
+                create_pipeline, stream=False,
+                llm_service=LoopBoundLLMService(llm_service, asyncio.get_running_loop())
+            )
+        else:
+            app.state.pipeline = pipeline
+        app.state.limiter = ConcurrencyLimiter(max_concurrency, queue_timeout)
+        # Validation, the cost guard and the engine are blocking, so each
+        # pipeline run gets a thread; it waits on the loop for LLM responses
+        app.state.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="pipeline")
+        logger.info(f"API ready ({max_concurrency} questions at once)")
+        try:
+            yield
+        finally:
+            app.state.executor.shutdown(wait=True)
+            if owns_pipeline:
+                app.state.pipeline.close()
+                await llm_service.close()
+
+    async def query(request: Request) -> Response:
+        try:
+            body = await request.json()
+        except ValueError:
+            return JSONResponse({"error": "Request body must be JSON"}, status_code=400)
+
+        question = body.get("question") if isinstance(body, dict) else None
+        if not isinstance(question, str) or not question.strip():
+            return JSONResponse({"error": "'question' must be a non-empty string"}, status_code=400)
+
+        response_format = pick_format(body, request.headers.get("accept", ""))
+        if response_format is None:
+            return JSONResponse({"error": f"'format' must be one of: {', '.join(FORMATS)}"},
+                                status_code=400)
+
+        max_rows = body.get("max_rows")
+        if max_rows is not None and (not isinstance(max_rows, int) or max_rows < 0):
+            return JSONResponse({"error": "'max_rows' must be a non-negative integer"}, status_code=400)
+
+        limiter: ConcurrencyLimiter = request.app.state.limiter
+        if not await limiter.acquire():
+            return JSONResponse({"error": "Too many questions in progress; try again"},
+                                status_code=503, headers={"Retry-After": "1"})
+
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                request.app.state.executor, request.app.state.pipeline.run, question.strip()
+            )
+        except Exception as e:
+            logger.error(f"Pipeline failed: {str(e)}")
+            return JSONResponse({"error": str(e)}, status_code=502)
+        finally:
+            limiter.release()
+
+        if result.status != "ok":
+            return JSONResponse(result_metadata(result), status_code=422)
+
+        headers = {"X-Row-Count": str(len(result.df))}
+        if response_format == "json":
+            rows = DEFAULT_JSON_ROWS if max_rows is None else max_rows
+            return Response(json_body(result, rows), media_type="application/json", headers=headers)
+
+        df = result.df if max_rows is None else result.df.head(max_rows)
+        if response_format == "ndjson":
+            return StreamingResponse(ndjson_chunks(result, df), media_type=NDJSON_MEDIA_TYPE,
+                                     headers=headers)
+
+        # Converted before the status is sent, so a failure can still be reported
+        try:
+            table = await asyncio.to_thread(arrow_table, result, df)
+        except (pa.ArrowException, ValueError, TypeError) as e:
+            logger.error(f"Arrow conversion failed: {str(e)}")
+            return JSONResponse({"error": f"Result cannot be converted to Arrow: {str(e)}", "sql": result.sql},
+                                status_code=500)
+        return StreamingResponse(arrow_chunks(table), media_type=ARROW_MEDIA_TYPE, headers=headers)
+
+    async def health(request: Request) -> Response:
+        data_catalog = request.app.state.pipeline.data_catalog
+        return JSONResponse({
+            "status": "ok",
+            "tables": list(getattr(data_catalog, "table_names", [data_catalog.table_name])),
+            "data_fingerprint": data_catalog.data_fingerprint
+        })
+
+    async def stats(request: Request) -> Response:
+        active = request.app.state.pipeline
+        failed_sql_cache = active.failed_sql_cache
+        return JSONResponse({
+            "requests": request.app.state.limiter.stats(),
+            "response_cache": active.response_cache.stats() if active.response_cache else None,
+            "result_cache": active.result_cache.stats() if active.result_cache else None,
+            "prompt_cache": active.llm_service.prompt_cache.stats()
+            if hasattr(active.llm_service, "prompt_cache") else None,
+            "failed_queries": {"remembered": len(failed_sql_cache), "hits": failed_sql_cache.hits}
+        })
+
+    return Starlette(
+        routes=[
+            Route("/query", query, methods=["POST"]),
+            Route("/health", health, methods=["GET"]),
+            Route("/stats", stats, methods=["GET"]),
+        ],
+        lifespan=lifespan
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Serve the question-to-result pipeline over HTTP.")
+    parser.add_argument("--host", default=os.getenv('API_HOST', '127.0.0.1'), help="Interface to bind")
+    parser.add_argument("--port", type=int, default=int(os.getenv('API_PORT', '8000')), help="Port to bind")
+    parser.add_argument("--workers", type=int, default=int(os.getenv('API_WORKERS', '1')),
+                        help="Worker processes, each with its own pipeline")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    # Idle connections stay open longer than a typical load balancer's idle
+    # timeout, so the balancer never reuses a connection the server closed
+    uvicorn.run(
+        "api_server:create_app", factory=True,
+        host=args.host, port=args.port, workers=args.workers,
+        timeout_keep_alive=int(os.getenv('API_KEEP_ALIVE', '75'))
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
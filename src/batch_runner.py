@@ -0,0 +1,354 @@
+"""
+Batch Runner Module
+Answers a file of questions concurrently and streams the results to disk.
+
+Usage:
+    python src/batch_runner.py questions.txt -o results.jsonl --parallel 8
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from data_catalog import DataCatalog
+from data_loader import DataLoader
+from intent_matcher import IntentMatcher
+from llm_service_async import LoopBoundLLMService
+from query_cost import QueryCostGuard
+from query_engine import QueryEngine, create_query_engine
+from query_handler import QueryHandler
+from query_pipeline import QueryPipeline
+from schema_selector import SchemaSelector
+from sql_validator import SQLValidator
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchResult:
+    """Outcome of answering one question in a batch."""
+
+    index: int
+    question: str
+    status: str  # "ok", "invalid" (no query passed its checks) or "error" (failed to execute or to generate)
+    sql: Optional[str] = None
+    error: Optional[str] = None
+    row_count: Optional[int] = None
+    columns: List[str] = field(default_factory=list)
+    rows: List[Dict] = field(default_factory=list)
+    truncated: bool = False
+    elapsed_seconds: float = 0.0
+
+
+class BatchRunner:
+    """
+    Runs the question-to-result pipeline for many questions at once.
+
+    Every question goes through one shared QueryPipeline, so the batch
+    answers exactly as the app and the API do: the same intents,
+    corrections, failed-query cache, attempt budget and deadline. At most
+    max_parallel questions are in progress at a time, each in a worker
+    thread; their LLM requests run on the event loop through the async
+    service, which caps how many are in flight.
+    """
+
+    def __init__(self, data_loader: DataLoader, llm_service, query_engine: QueryEngine,
+                 query_handler: Optional[QueryHandler] = None,
+                 sql_validator: Optional[SQLValidator] = None,
+                 cost_guard: Optional[QueryCostGuard] = None,
+                 schema_selector: Optional[SchemaSelector] = None,
+                 intent_matcher: Optional[IntentMatcher] = None,
+                 candidates: Optional[int] = None,
+                 max_parallel: int = 8, max_rows: Optional[int] = 1000,
+                 max_attempts: Optional[int] = None, deadline: Optional[float] = None):
+        """
+        Initialize the batch runner.
+
+        Args:
+            data_loader: DataLoader or DataCatalog whose data has been loaded
+            llm_service: AsyncLLMService (or any object with an async generate_sql_with_retry,
+                and generate_candidates when candidates are requested)
+            query_engine: Engine holding the loader's tables
+            query_handler: Prompt builder (created when None)
+            sql_validator: SQL validator (created when None)
+            cost_guard: Query cost guard (created from the loader's profile when None)
+            schema_selector: Picks the columns described per question (created when None)
+            intent_matcher: Answers common question patterns without the LLM
+                (every question goes to the LLM when None)
+            candidates: SQL candidates requested per question, checked in
+                parallel (defaults to SQL_CANDIDATES; 1 disables)
+            max_parallel: Maximum number of questions in progress at once
+            max_rows: Maximum result rows kept per question (all rows when None)
+            max_attempts: Queries tried per question, including corrections
+                (defaults to PIPELINE_MAX_ATTEMPTS)
+            deadline: Seconds a question may take in total (defaults to
+                PIPELINE_DEADLINE; 0 for no limit)
+        """
+        self.llm_service = llm_service
+        self._llm = LoopBoundLLMService(llm_service)
+        self.pipeline = QueryPipeline(
+            data_loader, self._llm, query_engine,
+            query_handler=query_handler,
+            sql_validator=sql_validator,
+            cost_guard=cost_guard,
+            schema_selector=schema_selector,
+            intent_matcher=intent_matcher,
+            candidates=candidates,
+            stream=False,
+            max_attempts=max_attempts,
+            deadline=deadline
+        )
+        self.candidate_selector = self.pipeline.candidate_selector
+        self.max_parallel = max_parallel
+        self.max_rows = max_rows
+
+    async def run(self, questions: List[str]) -> AsyncIterator[BatchResult]:
+        """
+        Answer all questions, yielding each result as soon as it finishes.
+
+        Args:
+            questions: Questions to answer
+
+        Yields:
+            BatchResult per question, in completion order
+        """
+        self._llm.loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.max_parallel)
+        executor = ThreadPoolExecutor(max_workers=self.max_parallel, thread_name_prefix="batch")
+
+        async def bounded(index: int, question: str) -> BatchResult:
+            async with semaphore:
+                return await self._answer(index, question, executor)
+
+        tasks = [asyncio.create_task(bounded(i, q)) for i, q in enumerate(questions)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _answer(self, index: int, question: str, executor: ThreadPoolExecutor) -> BatchResult:
+        """Run the pipeline for a single question in a worker thread."""
+        start = time.perf_counter()
+        result = BatchResult(index=index, question=question, status="error")
+
+        try:
+            answer = await asyncio.get_running_loop().run_in_executor(executor, self.pipeline.run, question)
+
+            if answer.status != "ok":
+                last = answer.attempts[-1] if answer.attempts else None
+                result.sql = last.sql if last is not None else None
+                # "error" when the last query failed in the engine, "invalid" when it never got there
+                result.status = "error" if last is not None and last.executed else "invalid"
+                result.error = answer.error
+                return result
+
+            result_df = answer.df
+            result.sql = answer.sql
+            result.status = "ok"
+            result.row_count = len(result_df)
+            result.columns = [str(c) for c in result_df.columns]
+            if self.max_rows is not None and len(result_df) > self.max_rows:
+                result_df = result_df.head(self.max_rows)
+                result.truncated = True
+            result.rows = json.loads(result_df.to_json(orient="records", date_format="iso"))
+
+        except Exception as e:
+            logger.error(f"Question {index} failed: {str(e)}")
+            result.error = str(e)
+
+        finally:
+            result.elapsed_seconds = round(time.perf_counter() - start, 4)
+
+        return result
+
+
+class JSONLResultWriter:
+    """Appends one JSON object per result and flushes after each one."""
+
+    def __init__(self, path: str):
+        """Open the output file, replacing any existing one."""
+        self.path = path
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, result: BatchResult) -> None:
+        """Append a result."""
+        self._file.write(json.dumps(asdict(result), ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        """Close the output file."""
+        self._file.close()
+
+
+class ParquetResultWriter:
+    """Writes each result as its own row group so finished results reach disk early."""
+
+    SCHEMA = pa.schema([
+        ("index", pa.int64()),
+        ("question", pa.string()),
+        ("status", pa.string()),
+        ("sql", pa.string()),
+        ("error", pa.string()),
+        ("row_count", pa.int64()),
+        ("columns", pa.list_(pa.string())),
+        ("rows_json", pa.string()),
+        ("truncated", pa.bool_()),
+        ("elapsed_seconds", pa.float64()),
+    ])
+
+    def __init__(self, path: str):
+        """Open the output file, replacing any existing one."""
+        self.path = path
+        self._writer = pq.ParquetWriter(path, self.SCHEMA)
+
+    def write(self, result: BatchResult) -> None:
+        """Append a result, with its rows serialized as JSON."""
+        record = asdict(result)
+        record["rows_json"] = json.dumps(record.pop("rows"), ensure_ascii=False)
+        self._writer.write_table(pa.Table.from_pylist([record], schema=self.SCHEMA))
+
+    def close(self) -> None:
+        """Write the file footer and close the output file."""
+        self._writer.close()
+
+
+def open_result_writer(path: str):
+    """Pick a result writer from the output file extension."""
+    if Path(path).suffix.lower() == ".parquet":
+        return ParquetResultWriter(path)
+    return JSONLResultWriter(path)
+
+
+def read_questions(path: str) -> List[str]:
+    """
+    Read questions from a file.
+
+    Plain text files hold one question per line (blank lines and lines
+    starting with # are skipped); .jsonl files hold objects with a
+    "question" key.
+
+    Args:
+        path: Path to the questions file
+
+    Returns:
+        List of questions
+    """
+    questions = []
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if path.endswith(".jsonl"):
+                line = json.loads(line)["question"]
+            questions.append(line)
+
+    return questions
+
+
+async def run_batch(questions: List[str], runner: BatchRunner, output_path: str) -> Dict[str, int]:
+    """
+    Run a batch and stream every result to the output file.
+
+    Args:
+        questions: Questions to answer
+        runner: Configured batch runner
+        output_path: .jsonl or .parquet file to write
+
+    Returns:
+        Count of results per status
+    """
+    counts: Dict[str, int] = {}
+    writer = open_result_writer(output_path)
+
+    try:
+        async for result in runner.run(questions):
+            writer.write(result)
+            counts[result.status] = counts.get(result.status, 0) + 1
+            logger.info(f"[{sum(counts.values())}/{len(questions)}] {result.status}: {result.question}")
+    finally:
+        writer.close()
+
+    return counts
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Answer a file of questions in bulk.")
+    parser.add_argument("questions", help="Text file (one question per line) or .jsonl file")
+    parser.add_argument("-o", "--output", default="results.jsonl",
+                        help="Output file (.jsonl or .parquet)")
+    parser.add_argument("--data", default="Data Dump - Accrual Accounts.xlsx",
+                        help="Excel workbook to query")
+    parser.add_argument("--tables", default=None,
+                        help="Tables to query instead of --data, as name=path[#sheet]; ...")
+    parser.add_argument("--parallel", type=int, default=8,
+                        help="Maximum questions in progress at once")
+    parser.add_argument("--max-rows", type=int, default=1000,
+                        help="Maximum result rows kept per question")
+    parser.add_argument("--engine", default=None, help="Query engine backend (sqlite, duckdb or process)")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="Seconds a query may run before it is cancelled (0 for no limit)")
+    args = parser.parse_args(argv)
+
+    # Imported here so the module can be used without an API key configured
+    from llm_service_async import AsyncLLMService
+
+    questions = read_questions(args.questions)
+
+    cache_dir = os.getenv('DATA_CACHE_DIR', '.cache')
+    if args.tables:
+        data_loader = DataCatalog.from_spec(args.tables, cache_dir=cache_dir)
+    else:
+        data_loader = DataLoader(args.data, cache_dir=cache_dir)
+    data_loader.load_data()
+    engine_options = {} if args.timeout is None else {"timeout": args.timeout}
+    query_engine = create_query_engine(data_loader, backend=args.engine, **engine_options)
+    llm_service = AsyncLLMService(max_concurrency=args.parallel)
+
+    intent_matcher = None
+    if os.getenv('INTENT_MATCHING', 'true').lower() == 'true':
+        intent_matcher = IntentMatcher(data_loader.schema_profiles)
+
+    runner = BatchRunner(
+        data_loader, llm_service, query_engine, intent_matcher=intent_matcher,
+        max_parallel=args.parallel, max_rows=args.max_rows
+    )
+
+    async def run() -> Dict[str, int]:
+        try:
+            return await run_batch(questions, runner, args.output)
+        finally:
+            await llm_service.close()
+
+    try:
+        counts = asyncio.run(run())
+    finally:
+        query_engine.close()
+
+    print(f"Answered {len(questions)} questions -> {args.output}: {counts}")
+    prompt_stats = llm_service.prompt_cache.stats()
+    if prompt_stats['requests']:
+        print(f"Prompt cache: {prompt_stats['hits']}/{prompt_stats['requests']} hits, "
+              f"{prompt_stats['cached_share']:.0%} of prompt tokens cached")
+    return 0 if counts.get("ok", 0) == len(questions) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""
+Candidate Selector Module
+Checks several generated SQL candidates at once and keeps the first one that
+is valid and compiles against the loaded tables.
+"""
+
+import asyncio
+import logging
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from query_cost import QueryCostGuard
+from query_engine import QueryEngine
+from sql_validator import SQLValidator
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Seconds a candidate's dry run may take; planning is normally instant
+DEFAULT_DRY_RUN_TIMEOUT = 5.0
+
+
+@dataclass
+class CandidateSelection:
+    """Outcome of checking a set of SQL candidates."""
+
+    index: Optional[int] = None  # Winning candidate, None when every checked one failed
+    errors: Dict[int, str] = field(default_factory=dict)  # Why checked candidates were rejected
+
+    @property
+    def found(self) -> bool:
+        """Whether a candidate passed every check."""
+        return self.index is not None
+
+    def first_error(self) -> Tuple[int, str]:
+        """Get the earliest rejected candidate and its error, for a correction prompt."""
+        index = min(self.errors)
+        return index, self.errors[index]
+
+
+class CandidateSelector:
+    """
+    Validates and dry-runs SQL candidates in parallel; the first to pass wins.
+
+    Each candidate goes through the safety validator, the cost guard and a
+    dry run (EXPLAIN) on the query engine, which catches unknown tables and
+    columns without running the query. As soon as one candidate passes, the
+    checks that have not started are cancelled. Identical candidates are
+    checked once.
+    """
+
+    def __init__(self, sql_validator: SQLValidator, query_engine: QueryEngine,
+                 cost_guard: Optional[QueryCostGuard] = None, max_workers: int = 4,
+                 dry_run_timeout: Optional[float] = DEFAULT_DRY_RUN_TIMEOUT):
+        """
+        Initialize the selector.
+
+        Args:
+            sql_validator: Validator every candidate must pass
+            query_engine: Engine the candidates are dry-run on
+            cost_guard: Cost guard every candidate must pass (skipped when None)
+            max_workers: Candidates checked at once
+            dry_run_timeout: Time budget per dry run in seconds (None or 0 for no limit)
+        """
+        self.sql_validator = sql_validator
+        self.query_engine = query_engine
+        self.cost_guard = cost_guard
+        self.dry_run_timeout = dry_run_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="candidate")
+
+    def check(self, sql: str) -> Tuple[bool, str]:
+        """
+        Check one candidate.
+
+        Args:
+            sql: Candidate SQL
+
+        Returns:
+            Tuple of (is_valid, error_message)
+        """
+        is_valid, error_message = self.sql_validator.validate(sql)
+        if not is_valid:
+            return False, error_message
+
+        guarded_sql = sql
+        if self.cost_guard is not None:
+            is_allowed, guarded_sql, message = self.cost_guard.check(sql)
+            if not is_allowed:
+                return False, message
+
+        try:
+            self.query_engine.dry_run(guarded_sql, timeout=self.dry_run_timeout)
+        except Exception as e:
+            return False, f"Query does not compile: {str(e)}"
+
+        return True, ""
+
+    def select(self, candidates: List[str]) -> CandidateSelection:
+        """
+        Check candidates in parallel and pick the first that passes.
+
+        Args:
+            candidates: Candidate SQL, in the order the model returned them
+
+        Returns:
+            The winning candidate's index, or the errors of all candidates
+        """
+        futures = {self._executor.submit(self.check, sql): index
+                   for index, sql in self._unique(candidates).items()}
+        selection = CandidateSelection()
+        pending = set(futures)
+
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                if self._collect(done, futures, selection):
+                    break
+        finally:
+            for future in pending:
+                future.cancel()
+
+        self._log(selection, len(candidates))
+        return selection
+
+    async def select_async(self, candidates: List[str]) -> CandidateSelection:
+        """
+        Check candidates in parallel without blocking the event loop.
+
+        Args:
+            candidates: Candidate SQL, in the order the model returned them
+
+        Returns:
+            The winning candidate's index, or the errors of all candidates
+        """
+        futures = {self._executor.submit(self.check, sql): index
+                   for index, sql in self._unique(candidates).items()}
+        waiters = {asyncio.wrap_future(future): future for future in futures}
+        selection = CandidateSelection()
+        pending = set(waiters)
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                if self._collect([waiters[waiter] for waiter in done], futures, selection):
+                    break
+        finally:
+            for waiter in pending:
+                waiters[waiter].cancel()
+
+        self._log(selection, len(candidates))
+        return selection
+
+    def close(self) -> None:
+        """Cancel checks that have not started and wait for running ones to finish."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    @staticmethod
+    def _unique(candidates: List[str]) -> Dict[int, str]:
+        """Map the first position of every distinct candidate to its SQL."""
+        unique: Dict[int, str] = {}
+        seen = set()
+        for index, sql in enumerate(candidates):
+            key = " ".join(sql.split()).rstrip(";").lower()
+            if key not in seen:
+                seen.add(key)
+                unique[index] = sql
+        return unique
+
+    @staticmethod
+    def _collect(done, futures: Dict[Future, int], selection: CandidateSelection) -> bool:
+        """Record finished checks, earliest candidate first; True once one passed."""
+        for future in sorted(done, key=futures.get):
+            is_valid, error_message = future.result()
+            if is_valid:
+                selection.index = futures[future]
+                return True
+            selection.errors[futures[future]] = error_message
+        return False
+
+    @staticmethod
+    def _log(selection: CandidateSelection, count: int) -> None:
+        """Log the outcome of a selection."""
+        if selection.found:
+            logger.info(f"Selected SQL candidate {selection.index + 1} of {count} "
+                        f"({len(selection.errors)} rejected)")
+        else:
+            logger.info(f"All {count} SQL candidates were rejected")
@@ -0,0 +1,174 @@
+"""
+Data Cache Module
+Stores cleaned DataFrames on disk in a binary columnar format for fast reloads.
+"""
+
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def write_arrow_file(df: pd.DataFrame, path: Path) -> Path:
+    """
+    Atomically write a DataFrame as an uncompressed Arrow IPC (Feather) file.
+
+    Args:
+        df: Data to write
+        path: Destination file
+
+    Returns:
+        The destination path
+    """
+    path = Path(path)
+
+    # Write to a temporary name first so readers never see a partial file
+    tmp_path = path.with_name(path.name + f".{os.getpid()}.tmp")
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    feather.write_feather(table, tmp_path, compression="uncompressed")
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_arrow_file(path: Path, memory_map: bool = False) -> pd.DataFrame:
+    """
+    Read a DataFrame from an Arrow IPC (Feather) file.
+
+    Args:
+        path: File written by write_arrow_file()
+        memory_map: Map the file instead of reading it. Columns that need no
+            conversion (numbers and booleans without nulls, strings) then
+            reference the file's pages directly, so every process mapping
+            the same file shares one copy in the OS page cache. Mapped
+            columns are read-only; pandas copies them on write.
+
+    Returns:
+        The stored DataFrame
+    """
+    if not memory_map:
+        return feather.read_feather(path, memory_map=False)
+
+    table = pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+    # split_blocks keeps each column in its own block instead of copying
+    # same-typed columns into one consolidated 2D array
+    return table.to_pandas(split_blocks=True)
+
+
+class DataCache:
+    """
+    On-disk cache of parsed source files, stored as Arrow IPC (Feather) files.
+
+    Entries are keyed on the source file's path, size, modification time and
+    content hash, so any change to the source makes the old entry unreachable.
+    Files are written uncompressed so they can be read without decoding.
+    """
+
+    FILE_SUFFIX = ".feather"
+
+    def __init__(self, cache_dir: str = ".cache", variant: Optional[str] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Directory where cache files are stored
+            variant: Name of a processing variant (e.g. "compact"), kept
+                separately from the plain entries for the same source
+        """
+        self.cache_dir = Path(cache_dir)
+        self.variant = variant
+
+    def cache_key(self, source_path: str) -> str:
+        """
+        Compute the cache key for a source file.
+
+        Args:
+            source_path: Path to the source file
+
+        Returns:
+            Hex digest identifying this exact version of the file
+        """
+        path = Path(source_path).resolve()
+        stat = path.stat()
+
+        content_hash = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                content_hash.update(block)
+
+        key = hashlib.sha256()
+        key.update(str(path).encode())
+        key.update(f"|{stat.st_size}|{stat.st_mtime_ns}|".encode())
+        key.update(content_hash.digest())
+        return key.hexdigest()
+
+    def _entry_prefix(self, source_path: str) -> str:
+        """Get the file name prefix shared by all entries for one source path."""
+        path = Path(source_path).resolve()
+        path_hash = hashlib.sha256(str(path).encode()).hexdigest()[:8]
+        if self.variant:
+            return f"{path.stem}-{path_hash}-{self.variant}"
+        return f"{path.stem}-{path_hash}"
+
+    def cache_path(self, source_path: str, key: Optional[str] = None) -> Path:
+        """
+        Get the location of the cache entry for a source file.
+
+        Args:
+            source_path: Path to the source file
+            key: Precomputed cache key (computed when omitted)
+
+        Returns:
+            Path of the cache file
+        """
+        key = key or self.cache_key(source_path)
+        return self.cache_dir / f"{self._entry_prefix(source_path)}-{key[:16]}{self.FILE_SUFFIX}"
+
+    def load(self, source_path: str, memory_map: bool = False) -> Optional[pd.DataFrame]:
+        """
+        Load the cached DataFrame for a source file.
+
+        Args:
+            source_path: Path to the source file
+            memory_map: Map the cache file instead of reading it (see read_arrow_file())
+
+        Returns:
+            Cached DataFrame, or None if there is no valid entry
+        """
+        path = self.cache_path(source_path)
+        if not path.exists():
+            return None
+
+        try:
+            return read_arrow_file(path, memory_map=memory_map)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cache file {path}: {str(e)}")
+            return None
+
+    def store(self, source_path: str, df: pd.DataFrame) -> Path:
+        """
+        Write a DataFrame to the cache and drop stale entries for its source.
+
+        Args:
+            source_path: Path to the source file the data was read from
+            df: Cleaned DataFrame to cache
+
+        Returns:
+            Path of the written cache file
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = write_arrow_file(df, self.cache_path(source_path))
+
+        for stale in self.cache_dir.glob(f"{self._entry_prefix(source_path)}-*{self.FILE_SUFFIX}"):
+            if stale != path:
+                stale.unlink(missing_ok=True)
+
+        logger.info(f"Cached {len(df)} rows to {path}")
+        return path
@@ -0,0 +1,292 @@
+"""
+Data Catalog Module
+Loads several workbooks and worksheets into named tables queried together.
+"""
+
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+import pandas as pd
+
+from data_loader import DataLoader
+from schema_profile import SchemaProfile
+from table_diff import TableChanges
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _warm_cache(excel_path: str, sheet_name: Union[str, int], cache_dir: str,
+                compact_dtypes: bool) -> None:
+    """Parse one worksheet in a worker process and write it to the data cache."""
+    DataLoader(excel_path, cache_dir=cache_dir, memory_map=False,
+               compact_dtypes=compact_dtypes, sheet_name=sheet_name).load_data()
+
+
+class DataCatalog:
+    """
+    A set of DataLoaders, one per table, loaded and described together.
+
+    Workbooks that are not cached yet are parsed in parallel worker
+    processes, since Excel parsing holds the GIL; every table is then read
+    from its cache entry in a thread of its own. Each table keeps its own
+    loader, cache entry and schema profile, and the catalog renders their
+    descriptions as one schema for the LLM.
+    """
+
+    def __init__(self, loaders: Sequence[DataLoader], max_workers: Optional[int] = None):
+        """
+        Initialize the catalog.
+
+        Args:
+            loaders: One loader per table; table names must be unique
+            max_workers: Tables loaded at once (defaults to DATA_LOAD_WORKERS
+                or the CPU count)
+        """
+        if not loaders:
+            raise ValueError("A data catalog needs at least one table")
+
+        names = [loader.table_name.lower() for loader in loaders]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(f"Duplicate table names: {', '.join(duplicates)}")
+
+        self.loaders = list(loaders)
+        self.max_workers = max_workers or int(os.getenv('DATA_LOAD_WORKERS', '0')) or os.cpu_count() or 1
+
+    @classmethod
+    def from_spec(cls, spec: str, **loader_kwargs) -> "DataCatalog":
+        """
+        Build a catalog from a table specification.
+
+        The specification lists tables separated by semicolons, each as
+        name=path or name=path#sheet, e.g.
+        "accrual_accounts=accruals.xlsx; vendors=master.xlsx#Vendors".
+
+        Args:
+            spec: Table specification (e.g. from DATA_TABLES)
+            **loader_kwargs: Passed to every DataLoader (cache_dir, ...)
+
+        Returns:
+            Catalog with one loader per listed table
+        """
+        loaders = []
+        for entry in filter(None, (part.strip() for part in spec.split(";"))):
+            name, sep, source = entry.partition("=")
+            if not sep or not name.strip() or not source.strip():
+                raise ValueError(f"Invalid table specification '{entry}', expected name=path[#sheet]")
+
+            path, _, sheet = source.strip().partition("#")
+            loaders.append(DataLoader(path.strip(), table_name=name.strip(),
+                                      sheet_name=sheet.strip() or 0, **loader_kwargs))
+
+        return cls(loaders)
+
+    @classmethod
+    def from_workbook(cls, excel_path: str, **loader_kwargs) -> "DataCatalog":
+        """
+        Build a catalog with one table per worksheet of a workbook.
+
+        Table names are the sheet names, lowercased with every run of
+        characters other than letters and digits replaced by "_".
+
+        Args:
+            excel_path: Path to the Excel file
+            **loader_kwargs: Passed to every DataLoader (cache_dir, ...)
+
+        Returns:
+            Catalog with one loader per worksheet
+        """
+        with pd.ExcelFile(excel_path) as workbook:
+            sheets = workbook.sheet_names
+
+        return cls([
+            DataLoader(excel_path, sheet_name=sheet,
+                       table_name=re.sub(r"[^0-9a-z]+", "_", str(sheet).lower()).strip("_"),
+                       **loader_kwargs)
+            for sheet in sheets
+        ])
+
+    @property
+    def table_names(self) -> List[str]:
+        """Names of all tables in the catalog."""
+        return [loader.table_name for loader in self.loaders]
+
+    def get_loader(self, table_name: str) -> DataLoader:
+        """
+        Look up the loader of a table by name.
+
+        Args:
+            table_name: Table name (case-insensitive)
+
+        Returns:
+            Loader of the table
+
+        Raises:
+            KeyError: If the catalog has no such table
+        """
+        for loader in self.loaders:
+            if loader.table_name.lower() == table_name.lower():
+                return loader
+        raise KeyError(table_name)
+
+    def add_reload_listener(self, listener: Callable[[DataLoader], None]) -> None:
+        """
+        Register a callback to run every time any table has been reloaded.
+
+        Args:
+            listener: Called with the loader of the reloaded table
+        """
+        for loader in self.loaders:
+            loader.add_reload_listener(listener)
+
+    def load_data(self) -> Dict[str, pd.DataFrame]:
+        """
+        Load all tables in parallel.
+
+        Returns:
+            Loaded DataFrame per table name
+        """
+        self._warm_caches()
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(self.loaders))) as executor:
+            frames = list(executor.map(lambda loader: loader.load_data(), self.loaders))
+
+        logger.info(f"Loaded {len(self.loaders)} tables: {', '.join(self.table_names)}")
+        return dict(zip(self.table_names, frames))
+
+    def _warm_caches(self) -> None:
+        """Parse uncached workbooks in worker processes so loads become cache hits."""
+        if self.max_workers < 2:
+            return
+
+        pending = [loader for loader in self.loaders
+                   if loader.cache is not None and not loader.cache.cache_path(loader.excel_path).exists()]
+        if len(pending) < 2:
+            return
+
+        logger.info(f"Parsing {len(pending)} worksheets in parallel worker processes")
+        with ProcessPoolExecutor(
+            max_workers=min(self.max_workers, len(pending)),
+            mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            futures = [
+                executor.submit(_warm_cache, loader.excel_path, loader.sheet_name,
+                                str(loader.cache.cache_dir), loader.compact_dtypes)
+                for loader in pending
+            ]
+            for future in futures:
+                future.result()
+
+    def refresh(self) -> Dict[str, TableChanges]:
+        """
+        Reload every table whose workbook changed (see DataLoader.refresh()).
+
+        Returns:
+            Row-level changes per refreshed table name
+        """
+        refreshed = {}
+        for loader in self.loaders:
+            changes = loader.refresh()
+            if changes is not None:
+                refreshed[loader.table_name] = changes
+        return refreshed
+
+    def start_watching(self, interval: float = 5.0) -> None:
+        """
+        Watch every table's workbook and refresh it when it changes.
+
+        Args:
+            interval: Seconds between checks of each file
+        """
+        for loader in self.loaders:
+            loader.start_watching(interval)
+
+    def stop_watching(self) -> None:
+        """Stop all watchers started by start_watching()."""
+        for loader in self.loaders:
+            loader.stop_watching()
+
+    def load_streaming(self, engine, chunk_size: Optional[int] = None) -> List[SchemaProfile]:
+        """
+        Stream every table into a SQLite store (see DataLoader.load_streaming()).
+
+        Tables are streamed one after another, since the store has a single
+        writer and streaming is meant to bound memory.
+
+        Args:
+            engine: SQLiteEngine whose database receives the tables
+            chunk_size: Rows per chunk (defaults to DATA_CHUNK_SIZE)
+
+        Returns:
+            Profile per table
+        """
+        return [loader.load_streaming(engine, chunk_size=chunk_size) for loader in self.loaders]
+
+    @property
+    def schema_profiles(self) -> List[SchemaProfile]:
+        """Profiles of all tables, in catalog order."""
+        if any(loader.schema_profile is None for loader in self.loaders):
+            raise ValueError("Data not loaded. Call load_data() first.")
+
+        return [loader.schema_profile for loader in self.loaders]
+
+    def get_schema_description(self, tables: Optional[Sequence[str]] = None) -> str:
+        """
+        Get the combined description of the database schema for the LLM.
+
+        Args:
+            tables: Names of the tables to describe (all when None)
+
+        Returns:
+            Schema description of the tables, one block per table
+        """
+        profiles = self.schema_profiles
+        if tables is not None:
+            profiles = [self.get_loader(name).schema_profile for name in tables]
+
+        return "\n\n".join(profile.description for profile in profiles)
+
+    @property
+    def schema_fingerprint(self) -> str:
+        """Stable key identifying the combined schema description."""
+        # Same key as SchemaProfile.fingerprint for the same text, so a
+        # single-table catalog keeps the cache keys of a plain DataLoader
+        return SchemaProfile._fingerprint(self.get_schema_description())
+
+    @property
+    def data_fingerprint(self) -> str:
+        """Hash of the data fingerprints of all tables."""
+        digest = hashlib.sha256()
+        for loader in self.loaders:
+            if loader.data_fingerprint is None:
+                raise ValueError("Data not loaded. Call load_data() first.")
+            digest.update(f"{loader.table_name}:{loader.data_fingerprint}|".encode())
+        return digest.hexdigest()
+
+    def get_data_summary(self) -> Dict:
+        """
+        Get summary statistics about all tables.
+
+        Returns:
+            Dictionary with totals and a summary per table name
+        """
+        tables = {loader.table_name: loader.get_data_summary() for loader in self.loaders}
+
+        summary = {
+            "table_count": len(tables),
+            "row_count": sum(table["row_count"] for table in tables.values()),
+            "column_count": sum(table["column_count"] for table in tables.values()),
+            "tables": tables,
+        }
+
+        for key in ("memory_bytes", "memory_bytes_before_compaction"):
+            if all(key in table for table in tables.values()):
+                summary[key] = sum(table[key] for table in tables.values())
+
+        return summary
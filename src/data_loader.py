@@ -3,10 +3,21 @@ Data Loader Module
 Handles loading and preparing data from Excel files for SQL querying.
 """
 
+import hashlib
+import os
+import threading
+import numpy as np
+import openpyxl
 import pandas as pd
-from typing import Dict, List
+from pandas.io.parsers import TextParser
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
 import logging
 
+from data_cache import DataCache, read_arrow_file
+from dtype_compaction import MEMORY_BEFORE_ATTR, compact_dataframe, memory_usage
+from schema_profile import SchemaProfile, SchemaProfileBuilder
+from table_diff import TableChanges, column_hashes, diff_tables
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -14,103 +25,424 @@ logger = logging.getLogger(__name__)
 class DataLoader:
     """Loads and manages data from Excel files."""
 
-    def __init__(self, excel_path: str):
+    def __init__(self, excel_path: str, cache_dir: Optional[str] = None,
+                 memory_map: Optional[bool] = None, compact_dtypes: Optional[bool] = None,
+                 table_name: str = "accrual_accounts", sheet_name: Union[str, int] = 0):
         """
         Initialize the DataLoader with path to Excel file.
 
         Args:
             excel_path: Path to the Excel file containing the data
+            cache_dir: Directory for the parsed-data cache (disabled when None)
+            memory_map: Serve the data from a memory map of the cache file, so
+                all processes on a host share one copy (defaults to
+                DATA_MEMORY_MAP; requires cache_dir)
+            compact_dtypes: Store columns in the smallest lossless dtypes
+                (defaults to DATA_COMPACT_DTYPES)
+            table_name: Name the data is queried by
+            sheet_name: Worksheet to read, by name or position
         """
+        if memory_map is None:
+            memory_map = os.getenv('DATA_MEMORY_MAP', 'false').lower() == 'true'
+        if compact_dtypes is None:
+            compact_dtypes = os.getenv('DATA_COMPACT_DTYPES', 'false').lower() == 'true'
+        if memory_map and not cache_dir:
+            raise ValueError("memory_map requires a cache_dir to hold the shared file")
+
         self.excel_path = excel_path
         self.df = None
-        self.table_name = "accrual_accounts"  # Default table name for PandasSQL
+        self.table_name = table_name
+        self.sheet_name = sheet_name
+        self.compact_dtypes = compact_dtypes
+
+        # Other sheets and compacted data are cached apart from the plain first sheet
+        variant = "-".join(part for part in (
+            f"sheet-{sheet_name}" if sheet_name != 0 else "",
+            "compact" if compact_dtypes else ""
+        ) if part) or None
+        self.cache = DataCache(cache_dir, variant=variant) if cache_dir else None
+        self.memory_map = memory_map
+        self.schema_profile: Optional[SchemaProfile] = None
+        self.data_fingerprint: Optional[str] = None
+        self._reload_listeners: List[Callable[["DataLoader"], None]] = []
+
+        # Row-level changes of the refresh being announced to listeners
+        # (None while listeners are told about a full load)
+        self.last_changes: Optional[TableChanges] = None
+        self._source_signature: Optional[Tuple[int, int]] = None
+        self._refresh_lock = threading.Lock()
+        self._watcher: Optional[Tuple[threading.Thread, threading.Event]] = None
+
+    def add_reload_listener(self, listener: Callable[["DataLoader"], None]) -> None:
+        """
+        Register a callback to run every time new data has been loaded.
+
+        Args:
+            listener: Called with this loader after df, schema_profile and
+                data_fingerprint have been updated
+        """
+        self._reload_listeners.append(listener)
 
     def load_data(self) -> pd.DataFrame:
         """
         Load data from Excel file into a Pandas DataFrame.
 
+        When a cache is configured and holds an entry for the current version
+        of the file, the cleaned data is read from it instead of the workbook.
+        In memory-map mode the data is always served from the cache file,
+        which is written first on a cache miss. The schema profile and data
+        fingerprint are rebuilt on every load, and reload listeners are
+        notified.
+
         Returns:
             Loaded DataFrame
         """
         try:
-            logger.info(f"Loading data from {self.excel_path}")
-            self.df = pd.read_excel(self.excel_path)
-
-            # Drop the first unnamed column if it exists (index column from Excel)
-            if 'Unnamed: 0' in self.df.columns:
-                self.df = self.df.drop('Unnamed: 0', axis=1)
+            self._source_signature = self._stat_source()
 
-            # Clean column names - replace spaces and special characters
-            self.df.columns = self.df.columns.str.replace(' ', '_')
-            self.df.columns = self.df.columns.str.replace('.', '_')
-            self.df.columns = self.df.columns.str.replace('-', '_')  # Replace hyphens
-            self.df.columns = self.df.columns.str.replace('/', '_')  # Replace slashes
+            if self.cache is not None:
+                cached = self.cache.load(self.excel_path, memory_map=self.memory_map)
+                if cached is not None:
+                    source = "memory-mapped cache" if self.memory_map else "cache"
+                    logger.info(f"Loaded {len(cached)} rows and {len(cached.columns)} columns from {source}")
+                    return self._set_data(cached)
 
-            logger.info(f"Loaded {len(self.df)} rows and {len(self.df.columns)} columns")
-            return self.df
+            df = self._read_source()
+            logger.info(f"Loaded {len(df)} rows and {len(df.columns)} columns")
+            return self._set_data(df)
         except Exception as e:
             logger.error(f"Error loading data: {str(e)}")
             raise
 
-    def get_schema_description(self) -> str:
+    def _read_source(self) -> pd.DataFrame:
+        """Parse the workbook, then cache (and in memory-map mode, map) the result."""
+        logger.info(f"Loading data from {self.excel_path}")
+        df = self._clean_columns(pd.read_excel(self.excel_path, sheet_name=self.sheet_name))
+        if self.compact_dtypes:
+            df = compact_dataframe(df)
+
+        if self.memory_map:
+            # Serve the shared file rather than this process's private copy
+            path = self.cache.store(self.excel_path, df)
+            df = read_arrow_file(path, memory_map=True)
+        elif self.cache is not None:
+            try:
+                self.cache.store(self.excel_path, df)
+            except Exception as e:
+                logger.warning(f"Could not write data cache: {str(e)}")
+
+        return df
+
+    def _stat_source(self) -> Tuple[int, int]:
+        """Get the size and modification time of the workbook."""
+        stat = os.stat(self.excel_path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def refresh(self, key_columns: Optional[Sequence[str]] = None) -> Optional[TableChanges]:
         """
-        Generate a natural language description of the database schema for the LLM.
+        Reload the workbook if it changed since it was loaded, as row-level changes.
+
+        The new version is diffed against the loaded data. When the columns
+        are unchanged, reload listeners see the changes in last_changes and
+        can apply just those rows (see QueryEngine.apply_changes()), and the
+        schema profile is updated from the changed rows instead of being
+        rebuilt. Otherwise the new version is installed like a full load.
+
+        Args:
+            key_columns: Columns identifying a row, so that changed rows are
+                reported as updates (without them, as a delete plus an insert)
 
         Returns:
-            Schema description string
+            The changes, or None when the workbook has not changed or its
+            columns changed and it was reloaded in full
         """
         if self.df is None:
-            raise ValueError("Data not loaded. Call load_data() first.")
+            raise ValueError("Data not loaded. Call load_data() first (streamed data cannot be refreshed).")
 
-        schema_parts = []
-        schema_parts.append(f"Table name: {self.table_name}")
-        schema_parts.append("\nColumns:")
+        with self._refresh_lock:
+            signature = self._stat_source()
+            if signature == self._source_signature:
+                return None
 
-        for col in self.df.columns:
-            dtype = str(self.df[col].dtype)
+            old = self.df
+            new = self._read_source()
+            self._source_signature = signature
 
-            # Get sample values (non-null)
-            sample_values = self.df[col].dropna().unique()[:3]
-            sample_str = ", ".join([str(v) for v in sample_values])
+            if list(new.columns) != list(old.columns):
+                logger.info(f"Columns of {self.excel_path} changed, reloading table {self.table_name}")
+                self._set_data(new)
+                return None
 
-            # Count nulls
-            null_count = self.df[col].isnull().sum()
-            null_pct = (null_count / len(self.df)) * 100
+            changes = diff_tables(old, new, key_columns)
+            if changes.is_empty and new.dtypes.equals(old.dtypes):
+                logger.info(f"{self.excel_path} was rewritten without changing any rows")
+                self.df = new
+                return changes
 
-            schema_parts.append(
-                f"  - {col} ({dtype})"
-                f" | Sample values: [{sample_str}]"
-                f" | Nulls: {null_count} ({null_pct:.1f}%)"
+            logger.info(f"Refreshing table {self.table_name}: {changes}")
+            profile = self.schema_profile.updated(
+                new, changes.removed_rows(old), changes.added_rows(new)
             )
+            self.df = new
+            self.last_changes = changes
+            try:
+                self._set_profile(profile, self._fingerprint_data(new))
+            finally:
+                self.last_changes = None
+            return changes
 
-        schema_parts.append(f"\nTotal rows: {len(self.df)}")
+    def start_watching(self, interval: float = 5.0,
+                       key_columns: Optional[Sequence[str]] = None) -> None:
+        """
+        Poll the workbook in a background thread and refresh when it changes.
 
-        return "\n".join(schema_parts)
+        A change is picked up once the file's size and mtime are the same in
+        two consecutive checks.
+
+        Args:
+            interval: Seconds between checks of the file's size and mtime
+            key_columns: Passed to refresh()
+        """
+        if self._watcher is not None:
+            return
+
+        stop = threading.Event()
+
+        def watch() -> None:
+            seen = failed = None
+            while not stop.wait(interval):
+                try:
+                    current = self._stat_source()
+                    # Only read the file once it has stopped changing between
+                    # two checks, so a workbook still being saved is skipped
+                    if current != seen:
+                        seen = current
+                        continue
+                    if current not in (self._source_signature, failed):
+                        self.refresh(key_columns)
+                except Exception as e:
+                    # Retried once the file changes again
+                    logger.warning(f"Could not refresh {self.excel_path}: {str(e)}")
+                    failed = seen
+
+        self._watcher = (threading.Thread(target=watch, name=f"watch-{self.table_name}", daemon=True), stop)
+        self._watcher[0].start()
+        logger.info(f"Watching {self.excel_path} every {interval:g}s")
+
+    def stop_watching(self) -> None:
+        """Stop the background watcher started by start_watching()."""
+        if self._watcher is not None:
+            thread, stop = self._watcher
+            stop.set()
+            thread.join()
+            self._watcher = None
+
+    def load_streaming(self, engine, chunk_size: Optional[int] = None) -> SchemaProfile:
+        """
+        Stream the workbook into a SQLite store without holding it in memory.
+
+        Rows are read in bounded chunks and appended straight into the
+        engine's database, so peak memory does not depend on the size of the
+        workbook. The schema profile is built from the chunks as they pass,
+        with distinct counts taken from the store afterwards. df stays None
+        in this mode and the data cache is not used; reload listeners are
+        still notified.
+
+        Args:
+            engine: SQLiteEngine whose database receives the table
+            chunk_size: Rows per chunk (defaults to DATA_CHUNK_SIZE)
+
+        Returns:
+            Profile of the loaded table
+        """
+        chunk_size = chunk_size or int(os.getenv('DATA_CHUNK_SIZE', '50000'))
+        builder = SchemaProfileBuilder(self.table_name)
+        values = hashlib.sha256()
+
+        def profiled_chunks() -> Iterator[pd.DataFrame]:
+            for chunk in self._read_chunks(chunk_size):
+                builder.add_chunk(chunk)
+                values.update(self._hash_chunk(chunk))
+                yield chunk
+
+        try:
+            logger.info(f"Streaming data from {self.excel_path} in chunks of {chunk_size} rows")
+            rows = engine.load_table_chunks(self.table_name, profiled_chunks())
+
+            # One scan of the store gives every column's distinct count
+            counts = ", ".join(f'COUNT(DISTINCT "{col}")' for col in builder.columns)
+            distinct = engine.execute(f'SELECT {counts} FROM "{self.table_name}"', timeout=0)
+            profile = builder.build(dict(zip(builder.columns, distinct.iloc[0].tolist())))
+        except Exception as e:
+            logger.error(f"Error streaming data: {str(e)}")
+            raise
+
+        digest = hashlib.sha256()
+        for column in profile.columns:
+            digest.update(f"{column.name}:{column.dtype}|".encode())
+        digest.update(values.digest())
+
+        logger.info(f"Streamed {rows} rows and {len(profile.columns)} columns")
+        self.df = None
+        self._set_profile(profile, digest.hexdigest())
+        return profile
+
+    @staticmethod
+    def _hash_chunk(chunk: pd.DataFrame) -> bytes:
+        """Hash the rows of a chunk independently of how the chunk was typed."""
+        return np.column_stack([column_hashes(chunk[col]) for col in chunk.columns]).tobytes()
+
+    def _read_chunks(self, chunk_size: int) -> Iterator[pd.DataFrame]:
+        """
+        Read the worksheet as DataFrames of at most chunk_size rows.
+
+        Cells are converted and typed the way pd.read_excel does it, and the
+        column names are cleaned once up front.
+        """
+        workbook = openpyxl.load_workbook(self.excel_path, read_only=True, data_only=True)
+        try:
+            sheet = workbook.worksheets[self.sheet_name] if isinstance(self.sheet_name, int) \
+                else workbook[self.sheet_name]
+            rows = sheet.iter_rows(values_only=True)
+            header = [f"Unnamed: {i}" if name is None else name
+                      for i, name in enumerate(next(rows, ()))]
+            keep = [i for i, name in enumerate(header) if name != 'Unnamed: 0']
+            columns = self._clean_columns(pd.DataFrame(columns=header)).columns.tolist()
+
+            batch = []
+            for row in rows:
+                if all(value is None for value in row):
+                    continue
+                batch.append([self._excel_value(row[i]) if i < len(row) else "" for i in keep])
+                if len(batch) == chunk_size:
+                    yield TextParser([columns] + batch, header=0).read()
+                    batch = []
+
+            if batch:
+                yield TextParser([columns] + batch, header=0).read()
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def _excel_value(value):
+        """Convert a cell value like pd.read_excel: blanks are missing, whole floats are ints."""
+        if value is None:
+            return ""
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        return value
+
+    def _set_data(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Install newly loaded data, rebuild derived state and notify listeners."""
+        self.df = df
+        self._set_profile(SchemaProfile.from_dataframe(df, self.table_name), self._fingerprint_data(df))
+        return self.df
+
+    def _set_profile(self, profile: SchemaProfile, data_fingerprint: str) -> None:
+        """Install the profile and fingerprint of new data and notify listeners."""
+        self.schema_profile = profile
+        self.data_fingerprint = data_fingerprint
+
+        for listener in self._reload_listeners:
+            listener(self)
+
+    @staticmethod
+    def _fingerprint_data(df: pd.DataFrame) -> str:
+        """Hash the column names, dtypes and every value of a DataFrame."""
+        digest = hashlib.sha256()
+        for col, dtype in df.dtypes.items():
+            digest.update(f"{col}:{dtype}|".encode())
+        digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+        return digest.hexdigest()
+
+    @staticmethod
+    def _clean_columns(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Drop the Excel index column and make column names SQL-friendly.
+
+        Args:
+            df: DataFrame as read from the workbook
+
+        Returns:
+            DataFrame with cleaned column names
+        """
+        # Drop the first unnamed column if it exists (index column from Excel)
+        if 'Unnamed: 0' in df.columns:
+            df = df.drop('Unnamed: 0', axis=1)
+
+        # Clean column names - replace spaces and special characters
+        df.columns = df.columns.str.replace(' ', '_')
+        df.columns = df.columns.str.replace('.', '_')
+        df.columns = df.columns.str.replace('-', '_')  # Replace hyphens
+        df.columns = df.columns.str.replace('/', '_')  # Replace slashes
+
+        return df
+
+    def get_schema_description(self) -> str:
+        """
+        Get the natural language description of the database schema for the LLM.
+
+        The description is precomputed when the data is loaded.
+
+        Returns:
+            Schema description string
+        """
+        if self.schema_profile is None:
+            raise ValueError("Data not loaded. Call load_data() first.")
+
+        return self.schema_profile.description
+
+    @property
+    def schema_fingerprint(self) -> str:
+        """Stable key identifying the current schema description."""
+        if self.schema_profile is None:
+            raise ValueError("Data not loaded. Call load_data() first.")
+
+        return self.schema_profile.fingerprint
+
+    @property
+    def schema_profiles(self) -> List[SchemaProfile]:
+        """Profiles of all tables held by this loader (just its own)."""
+        if self.schema_profile is None:
+            raise ValueError("Data not loaded. Call load_data() first.")
+
+        return [self.schema_profile]
 
     def get_column_list(self) -> List[str]:
         """Get list of all column names."""
-        if self.df is None:
+        if self.schema_profile is None:
             raise ValueError("Data not loaded. Call load_data() first.")
-        return self.df.columns.tolist()
+        return [column.name for column in self.schema_profile.columns]
 
     def get_data_summary(self) -> Dict:
         """
         Get summary statistics about the loaded data.
 
+        The statistics come from the schema profile, so they are available in
+        streaming mode too; memory usage is only reported for in-memory data.
+
         Returns:
             Dictionary with summary information
         """
-        if self.df is None:
+        if self.schema_profile is None:
             raise ValueError("Data not loaded. Call load_data() first.")
 
-        return {
-            "row_count": len(self.df),
-            "column_count": len(self.df.columns),
-            "columns": self.df.columns.tolist(),
-            "dtypes": {col: str(dtype) for col, dtype in self.df.dtypes.items()},
+        profile = self.schema_profile
+        summary = {
+            "row_count": profile.row_count,
+            "column_count": len(profile.columns),
+            "columns": self.get_column_list(),
+            "dtypes": {column.name: column.dtype for column in profile.columns},
             "missing_values": {
-                col: int(count)
-                for col, count in self.df.isnull().sum().items()
-                if count > 0
+                column.name: column.null_count
+                for column in profile.columns
+                if column.null_count > 0
             }
         }
+
+        if self.df is not None:
+            summary["memory_bytes"] = memory_usage(self.df)
+            if MEMORY_BEFORE_ATTR in self.df.attrs:
+                summary["memory_bytes_before_compaction"] = self.df.attrs[MEMORY_BEFORE_ATTR]
+
+        return summary
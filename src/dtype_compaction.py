@@ -0,0 +1,116 @@
+"""
+Dtype Compaction Module
+Shrinks the in-memory footprint of loaded data by choosing tighter dtypes.
+"""
+
+import logging
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# df.attrs key recording the footprint before compaction. attrs survive
+# the Arrow cache round trip, so warm loads can still report it.
+MEMORY_BEFORE_ATTR = "memory_bytes_before_compaction"
+
+
+def memory_usage(df: pd.DataFrame) -> int:
+    """
+    Get the deep memory footprint of a DataFrame in bytes.
+
+    Args:
+        df: DataFrame to measure
+
+    Returns:
+        Bytes used by the values and the index
+    """
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def compact_dataframe(df: pd.DataFrame, max_category_ratio: float = 0.5) -> pd.DataFrame:
+    """
+    Convert columns to the smallest dtypes that keep every value intact.
+
+    - Strings that all parse as dates become datetime64
+    - Strings with few distinct values become categoricals
+    - Integers are downcast to the narrowest integer type
+    - Floats holding only whole numbers become nullable integers, and other
+      floats become float32 only when that round-trips exactly
+
+    Args:
+        df: Cleaned DataFrame
+        max_category_ratio: Highest distinct/non-null ratio for a categorical
+
+    Returns:
+        Compacted copy of the DataFrame, with the original footprint in
+        attrs[MEMORY_BEFORE_ATTR]
+    """
+    before = memory_usage(df)
+    columns: Dict[str, pd.Series] = {}
+
+    for col in df.columns:
+        series = df[col]
+
+        if pd.api.types.is_bool_dtype(series) or isinstance(series.dtype, pd.CategoricalDtype):
+            columns[col] = series
+        elif pd.api.types.is_string_dtype(series) or series.dtype == object:
+            columns[col] = _compact_strings(series, max_category_ratio)
+        elif pd.api.types.is_integer_dtype(series):
+            columns[col] = pd.to_numeric(series, downcast="integer")
+        elif pd.api.types.is_float_dtype(series):
+            columns[col] = _compact_floats(series)
+        else:
+            columns[col] = series
+
+    compacted = pd.DataFrame(columns, index=df.index)
+    compacted.attrs = {**df.attrs, MEMORY_BEFORE_ATTR: before}
+
+    after = memory_usage(compacted)
+    logger.info(
+        f"Compacted dtypes: {before / 1024 / 1024:.2f} MB -> {after / 1024 / 1024:.2f} MB "
+        f"({(1 - after / before) * 100 if before else 0:.0f}% smaller)"
+    )
+    return compacted
+
+
+def _compact_strings(series: pd.Series, max_category_ratio: float) -> pd.Series:
+    """Parse date strings, or turn low-cardinality strings into categoricals."""
+    non_null = series.dropna()
+    if non_null.empty:
+        return series
+
+    # Only strings that look like dates are tried, and only fully parsed
+    # columns are converted
+    if non_null.astype(str).str.contains(r"^\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}", regex=True).all():
+        parsed = pd.to_datetime(series, errors="coerce", format="mixed")
+        if parsed.notna().sum() == len(non_null):
+            return parsed
+
+    if non_null.nunique() <= max_category_ratio * len(non_null):
+        return series.astype("category")
+
+    return series
+
+
+def _compact_floats(series: pd.Series) -> pd.Series:
+    """Downcast floats without changing any value."""
+    non_null = series.dropna()
+
+    # Whole numbers become integers only when they fit in int64 and every
+    # value converts back exactly (2**63 rounds to a float that does not fit)
+    if (not non_null.empty and np.isfinite(non_null).all() and (non_null % 1 == 0).all()
+            and non_null.min() >= -2.0 ** 63 and non_null.max() < 2.0 ** 63):
+        as_int64 = non_null.astype("int64")
+        if np.array_equal(as_int64.astype(non_null.dtype).to_numpy(), non_null.to_numpy()):
+            as_int = pd.to_numeric(as_int64, downcast="integer")
+            return series.astype(pd.api.types.pandas_dtype(as_int.dtype.name.capitalize()))
+
+    as_float32 = series.astype("float32")
+    if np.array_equal(as_float32.astype("float64").to_numpy(), series.to_numpy(), equal_nan=True):
+        return as_float32
+
+    return series
@@ -0,0 +1,379 @@
+"""
+Intent Matcher Module
+Answers common question patterns with SQL built from the schema profile,
+without a round-trip to the LLM.
+"""
+
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from question_index import STOPWORDS
+from schema_profile import SchemaProfile
+from schema_selector import split_words, stem, words_match
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Words that refer to the rows themselves rather than to a column
+ROW_WORDS = {'entry', 'line', 'record', 'row', 'transaction'}
+
+# Words that ask for distinct values
+DISTINCT_WORDS = {'different', 'distinct', 'unique'}
+
+# Words that ask for an aggregate of a numeric column
+AGGREGATE_WORDS = {
+    'average': 'AVG', 'avg': 'AVG', 'mean': 'AVG',
+    'sum': 'SUM', 'total': 'SUM',
+    'max': 'MAX', 'maximum': 'MAX',
+    'min': 'MIN', 'minimum': 'MIN',
+}
+
+AGGREGATE_ALIASES = {'AVG': 'average', 'SUM': 'total', 'MAX': 'max', 'MIN': 'min'}
+
+# Words that start a grouping ("by currency", "per year", "for each country")
+GROUP_WORDS = {'by', 'per', 'each', 'every'}
+
+# Words that carry no meaning for these patterns, on top of the stopwords
+FILLER_WORDS = {
+    'all', 'appear', 'available', 'be', 'been', 'can', 'currently', 'data', 'dataset',
+    'exist', 'find', 'get', 'has', 'have', 'i', 'it', 'many', 'overall', 'please',
+    'present', 'see', 'table', 'tell', 'us', 'value', 'was', 'we', 'were', 'you'
+}
+
+# Values that are also common words only match when written exactly as stored
+# (a country code "US" should not match "show us")
+AMBIGUOUS_VALUES = STOPWORDS | FILLER_WORDS | {'any', 'it', 'no', 'not', 'or', 'us', 'yes'}
+
+# A column must have at least this share of its name words in the question
+MIN_NAME_SCORE = 0.5
+
+# Question words whose column references are remembered per table
+MAX_REMEMBERED_WORDS = 10000
+
+
+@dataclass(frozen=True)
+class IntentMatch:
+    """SQL for a question that matched a known pattern."""
+
+    intent: str  # "row_count", "distinct_count", "distinct_values" or "aggregate"
+    sql: str
+    table_name: str
+
+
+@dataclass
+class _Column:
+    """A column as seen by the matcher."""
+
+    name: str
+    words: List[str]
+    numeric: bool
+
+
+@dataclass
+class _Table:
+    """Column names and known values of one table."""
+
+    name: str
+    words: List[str]
+    columns: List[_Column]
+    # Value tokens -> (column, value) pairs holding that value
+    values: Dict[Tuple[str, ...], List[Tuple[_Column, str]]] = field(default_factory=dict)
+    max_value_tokens: int = 0
+    # Question word -> column name -> positions of the name words it matches
+    word_refs: Dict[str, Dict[str, Set[int]]] = field(default_factory=dict)
+
+
+class IntentMatcher:
+    """
+    Maps row counts, distinct values, filtered counts and aggregates by a
+    group straight to SQL.
+
+    Questions are matched against the column names and known values of the
+    schema profiles. Every word of the question has to be accounted for by
+    the pattern, a column, a value or a filler word, and every column has
+    to be unambiguous; anything else is left to the LLM.
+    """
+
+    def __init__(self, profiles: Iterable[SchemaProfile] = ()):
+        """
+        Initialize the matcher.
+
+        Args:
+            profiles: Profiles of the tables questions are asked over
+        """
+        self._tables: Dict[str, _Table] = {}
+        for profile in profiles:
+            self.add_profile(profile)
+
+    def add_profile(self, profile: SchemaProfile) -> None:
+        """
+        Register or replace the columns and values of a table.
+
+        Args:
+            profile: Profile of the table, e.g. after the data was reloaded
+        """
+        table = _Table(name=profile.table_name, words=split_words(profile.table_name), columns=[])
+
+        for column_profile in profile.columns:
+            dtype = column_profile.dtype.lower()
+            column = _Column(
+                name=column_profile.name,
+                words=split_words(column_profile.name),
+                numeric=dtype.startswith(('int', 'uint', 'float'))
+            )
+            table.columns.append(column)
+
+            # Flags and timestamps are not values people type in questions
+            if dtype.startswith(('bool', 'datetime')):
+                continue
+
+            for value in column_profile.known_values:
+                if column.numeric and value.endswith('.0'):
+                    value = value[:-2]
+                tokens = tuple(re.findall(r'[a-z0-9]+', value.lower()))
+                if not tokens or (len(tokens) == 1 and len(tokens[0]) < 2):
+                    continue
+                table.values.setdefault(tokens, []).append((column, value))
+                table.max_value_tokens = max(table.max_value_tokens, len(tokens))
+
+        self._tables[profile.table_name.lower()] = table
+
+    def match(self, question: str) -> Optional[IntentMatch]:
+        """
+        Match a question against the known patterns.
+
+        Args:
+            question: User's natural language question
+
+        Returns:
+            The SQL for the question, or None when the LLM should answer it
+        """
+        tokens = re.findall(r'[a-z0-9]+', question.lower())
+        if not tokens:
+            return None
+
+        matches = [match for match in (self._match_table(table, question, tokens)
+                                       for table in self._tables.values())
+                   if match is not None]
+
+        # A question that fits several tables is ambiguous
+        if len(matches) != 1:
+            return None
+
+        logger.info(f"Matched the '{matches[0].intent}' pattern without the LLM")
+        return matches[0]
+
+    def _match_table(self, table: _Table, question: str, tokens: List[str]) -> Optional[IntentMatch]:
+        """Match a question against one table."""
+        stems = [stem(token) for token in tokens]
+        consumed: Set[int] = set()
+
+        # Which words of which column names each question word refers to
+        refs = [self._word_refs(table, s) for s in stems]
+
+        # The table may be named, e.g. "rows in accrual accounts"
+        table_words = [i for i, s in enumerate(stems) if any(words_match(w, s) for w in table.words)]
+        if table.words and len(self._tables) > 1 and not table_words:
+            return None
+        consumed.update(table_words)
+
+        # Values become filters on the column holding them
+        filters: List[Tuple[_Column, str]] = []
+        for span, entries in self._find_values(table, question, tokens):
+            columns = {id(column): column for column, _ in entries}
+            if len(columns) == 1:
+                column = entries[0][0]
+            else:
+                # A value in several columns needs the column to be named
+                others = set(range(len(stems))) - set(span)
+                named = self._resolve(list(columns.values()), refs, stems, others)
+                if named is None:
+                    return None
+                column = named[0]
+
+            if any(existing is column for existing, _ in filters):
+                return None
+            filters.append((column, next(value for c, value in entries if c is column)))
+            consumed.update(span)
+            consumed.update(i for i, ref in enumerate(refs) if column.name in ref)
+
+        # A grouping covers the rest of the question
+        group_start = next(
+            (i for i, token in enumerate(tokens) if token in GROUP_WORDS and i not in consumed), None
+        )
+        group = None
+        if group_start is not None:
+            phrase = {i for i in range(group_start + 1, len(tokens)) if i not in consumed}
+            resolved = self._resolve(table.columns, refs, stems, phrase)
+            if resolved is None:
+                return None
+            group = resolved[0]
+            consumed.add(group_start)
+            consumed.update(resolved[1])
+
+        before_group = set(range(group_start if group_start is not None else len(tokens)))
+
+        # The pattern is decided by its cue words
+        counting = any(tokens[i:i + 2] == ['how', 'many'] for i in range(len(tokens))) or \
+            bool({'count', 'number'} & set(stems))
+        distinct = bool(DISTINCT_WORDS & set(stems))
+        aggregate = next((AGGREGATE_WORDS[s] for i, s in enumerate(stems)
+                          if s in AGGREGATE_WORDS and i not in consumed), None)
+        consumed.update(i for i, s in enumerate(stems)
+                        if s in DISTINCT_WORDS or s in {'count', 'number'} or s in AGGREGATE_WORDS)
+
+        order = group
+        if counting and distinct:
+            resolved = self._resolve(table.columns, refs, stems, before_group - consumed)
+            if resolved is None or group is not None:
+                return None
+            column, used = resolved
+            intent = "distinct_count"
+            select = f"COUNT(DISTINCT {self._identifier(column.name)}) AS distinct_{self._alias(column.name)}"
+
+        elif counting:
+            consumed.update(i for i, s in enumerate(stems) if s in ROW_WORDS)
+            used = set()
+            intent = "row_count"
+            select = "COUNT(*) AS row_count"
+
+        elif aggregate is not None:
+            resolved = self._resolve(table.columns, refs, stems, before_group - consumed)
+            if resolved is None or not resolved[0].numeric:
+                return None
+            column, used = resolved
+            intent = "aggregate"
+            select = (f"{aggregate}({self._identifier(column.name)}) AS "
+                      f"{AGGREGATE_ALIASES[aggregate]}_{self._alias(column.name)}")
+
+        elif distinct or tokens[0] in ('what', 'which', 'list', 'show'):
+            resolved = self._resolve(table.columns, refs, stems, before_group - consumed)
+            if resolved is None or group is not None:
+                return None
+            column, used = resolved
+            intent = "distinct_values"
+            select = f"DISTINCT {self._identifier(column.name)}"
+            order = column
+
+        else:
+            return None
+
+        consumed.update(used)
+
+        # Every remaining word must be meaningless for the pattern
+        for i, token in enumerate(tokens):
+            if i not in consumed and token not in STOPWORDS and stems[i] not in STOPWORDS \
+                    and stems[i] not in FILLER_WORDS:
+                return None
+
+        if group is not None:
+            select = f"{self._identifier(group.name)}, {select}"
+        sql = f"SELECT {select} FROM {self._identifier(table.name)}"
+        if filters:
+            sql += " WHERE " + " AND ".join(
+                f"{self._identifier(column.name)} = {self._literal(column, value)}"
+                for column, value in filters
+            )
+        if group is not None:
+            sql += f" GROUP BY {self._identifier(group.name)}"
+        if order is not None:
+            sql += f" ORDER BY {self._identifier(order.name)}"
+
+        return IntentMatch(intent=intent, sql=sql + ";", table_name=table.name)
+
+    @staticmethod
+    def _word_refs(table: _Table, word: str) -> Dict[str, Set[int]]:
+        """Get the column name words a question word refers to, remembered per table."""
+        refs = table.word_refs.get(word)
+        if refs is None:
+            refs = {}
+            for column in table.columns:
+                matched = {w for w, name_word in enumerate(column.words) if words_match(name_word, word)}
+                if matched:
+                    refs[column.name] = matched
+            if len(table.word_refs) >= MAX_REMEMBERED_WORDS:
+                table.word_refs.clear()
+            table.word_refs[word] = refs
+        return refs
+
+    @staticmethod
+    def _find_values(table: _Table, question: str,
+                     tokens: List[str]) -> List[Tuple[List[int], List[Tuple[_Column, str]]]]:
+        """Find known values in the question, longest first, as (token positions, holders)."""
+        found = []
+        i = 0
+        while i < len(tokens):
+            for length in range(min(table.max_value_tokens, len(tokens) - i), 0, -1):
+                entries = table.values.get(tuple(tokens[i:i + length]))
+                if entries:
+                    entries = [
+                        (column, value) for column, value in entries
+                        if value.lower() not in AMBIGUOUS_VALUES or re.search(
+                            rf'(?<![A-Za-z0-9]){re.escape(value)}(?![A-Za-z0-9])', question
+                        )
+                    ]
+                if entries:
+                    found.append((list(range(i, i + length)), entries))
+                    i += length
+                    break
+            else:
+                i += 1
+        return found
+
+    @staticmethod
+    def _resolve(columns: List[_Column], refs: List[Dict[str, Set[int]]], stems: List[str],
+                 positions: Set[int]) -> Optional[Tuple[_Column, Set[int]]]:
+        """
+        Find the one column named by the words at some positions.
+
+        Returns:
+            The column and the positions of the words naming it, or None
+            when no column or more than one column fits equally well
+        """
+        best, best_score, best_used, tied = None, 0.0, set(), False
+
+        for column in columns:
+            used = {i for i in positions if column.name in refs[i]}
+            if not used:
+                continue
+            matched = set().union(*(refs[i][column.name] for i in used))
+            score = len(matched) / len(column.words)
+
+            # Words that only mean "rows" do not name a column on their own
+            if all(stems[i] in ROW_WORDS for i in used) or score < MIN_NAME_SCORE:
+                continue
+
+            if score > best_score:
+                best, best_score, best_used, tied = column, score, used, False
+            elif score == best_score:
+                tied = True
+
+        if best is None or tied:
+            return None
+        return best, best_used
+
+    @staticmethod
+    def _identifier(name: str) -> str:
+        """Quote a table or column name when it is not a plain identifier."""
+        if re.fullmatch(r'[A-Za-z_][A-Za-z0-9_]*', name):
+            return name
+        return '"' + name.replace('"', '""') + '"'
+
+    @staticmethod
+    def _alias(name: str) -> str:
+        """Turn a column name into part of a result column name."""
+        return re.sub(r'\W+', '_', name).strip('_')
+
+    @staticmethod
+    def _literal(column: _Column, value: str) -> str:
+        """Render a known value as a SQL literal of the column's type."""
+        if column.numeric:
+            try:
+                number = float(value)
+                return str(int(number)) if number.is_integer() else repr(number)
+            except ValueError:
+                pass
+        return "'" + value.replace("'", "''") + "'"
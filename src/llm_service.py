@@ -6,7 +6,8 @@ Handles communication with OpenAI API for SQL generation.
 import os
 import time
 import logging
-from typing import Dict, Optional
+import threading
+from typing import Dict, Iterator, List, Optional
 from openai import OpenAI
 from dotenv import load_dotenv
 
@@ -17,6 +18,61 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 
+class PromptCacheStats:
+    """
+    Running totals of prompt tokens and of the share served from the
+    provider's prompt cache, read from the usage data of each response.
+    """
+
+    def __init__(self):
+        """Initialize empty statistics."""
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hits = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    def record(self, usage) -> int:
+        """
+        Account for the usage data of one response.
+
+        Args:
+            usage: The response's usage object
+
+        Returns:
+            Number of prompt tokens read from the cache
+        """
+        details = getattr(usage, 'prompt_tokens_details', None)
+        cached = int(getattr(details, 'cached_tokens', None) or 0)
+
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += int(getattr(usage, 'prompt_tokens', None) or 0)
+            self.cached_tokens += cached
+            if cached:
+                self.hits += 1
+
+        return cached
+
+    def stats(self) -> Dict:
+        """
+        Get prompt cache statistics.
+
+        Returns:
+            Dictionary with requests, cache hits, hit rate, prompt and cached
+            token totals, and the share of prompt tokens that were cached
+        """
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.requests if self.requests else 0.0,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "cached_share": self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+            }
+
+
 class LLMService:
     """Service for interacting with OpenAI LLM."""
 
@@ -32,16 +88,21 @@ class LLMService:
         self.max_tokens = int(os.getenv('OPENAI_MAX_TOKENS', '500'))
         self.max_retries = int(os.getenv('MAX_RETRIES', '2'))
         self.timeout = int(os.getenv('REQUEST_TIMEOUT', '30'))
+        self.candidate_temperature = float(os.getenv('CANDIDATE_TEMPERATURE', '0.7'))
+        self.prompt_cache = PromptCacheStats()
 
         logger.info(f"LLM Service initialized with model: {self.model}")
 
-    def generate_sql(self, system_prompt: str, user_prompt: str) -> str:
+    def generate_sql(self, system_prompt: str, user_prompt: str,
+                     cache_key: Optional[str] = None) -> str:
         """
         Generate SQL query from prompts using OpenAI API.
 
         Args:
             system_prompt: System-level instructions for the model
             user_prompt: User's question and context
+            cache_key: Key of the prompt's shared prefix, so that requests
+                sharing it are routed to the same prompt cache
 
         Returns:
             Generated SQL query and explanation from the model
@@ -49,10 +110,44 @@ class LLMService:
         Raises:
             Exception: If API call fails after retries
         """
+        responses = self._complete(system_prompt, user_prompt, cache_key)
+        return responses[0]
+
+    def generate_candidates(self, prompts: Dict[str, str], n: int) -> List[str]:
+        """
+        Generate several alternative responses in a single request.
+
+        The prompt is sent once and the model samples n completions from it.
+        With more than one candidate they are sampled at the candidate
+        temperature, since at temperature 0 they would all be the same.
+
+        Args:
+            prompts: Dictionary with 'system' and 'user' keys (and an
+                optional 'cache_key')
+            n: Number of candidates
+
+        Returns:
+            The candidate responses, in the order the model returned them
+
+        Raises:
+            Exception: If API call fails after retries
+        """
+        return self._complete(
+            prompts['system'], prompts['user'], prompts.get('cache_key'), n=n,
+            temperature=self.candidate_temperature if n > 1 else None
+        )
+
+    def _complete(self, system_prompt: str, user_prompt: str, cache_key: Optional[str],
+                  n: int = 1, temperature: Optional[float] = None) -> List[str]:
+        """Request n completions, retrying failed calls with backoff."""
         messages = [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt}
         ]
+        # Sent as an extra body field so SDKs without the keyword still send it
+        options = {"extra_body": {"prompt_cache_key": cache_key}} if cache_key else {}
+        if n > 1:
+            options["n"] = n
 
         for attempt in range(self.max_retries + 1):
             try:
@@ -61,27 +156,108 @@ class LLMService:
                 response = self.client.chat.completions.create(
                     model=self.model,
                     messages=messages,
-                    temperature=self.temperature,
+                    temperature=self.temperature if temperature is None else temperature,
                     max_tokens=self.max_tokens,
-                    timeout=self.timeout
+                    timeout=self.timeout,
+                    **options
                 )
 
-                # Extract the response content
-                content = response.choices[0].message.content
+                # Extract the response content, one per candidate
+                contents = [choice.message.content for choice in response.choices]
 
                 # Log usage statistics
-                if hasattr(response, 'usage'):
+                if getattr(response, 'usage', None) is not None:
+                    cached = self.prompt_cache.record(response.usage)
                     logger.info(
-                        f"Token usage - Prompt: {response.usage.prompt_tokens}, "
+                        f"Token usage - Prompt: {response.usage.prompt_tokens} ({cached} cached), "
                         f"Completion: {response.usage.completion_tokens}, "
                         f"Total: {response.usage.total_tokens}"
                     )
 
-                return content
+                return contents
+
+            except TypeError:
+                # The client rejected the arguments; retrying cannot help
+                raise
+            except Exception as e:
+                logger.error(f"OpenAI API error on attempt {attempt + 1}: {str(e)}")
+
+                if attempt < self.max_retries:
+                    # Exponential backoff
+                    wait_time = 2 ** attempt
+                    logger.info(f"Retrying in {wait_time} seconds...")
+                    time.sleep(wait_time)
+                else:
+                    # Final attempt failed
+                    raise Exception(f"OpenAI API call failed after {self.max_retries + 1} attempts: {str(e)}")
+
+    def generate_sql_stream(self, system_prompt: str, user_prompt: str,
+                            cache_key: Optional[str] = None) -> Iterator[str]:
+        """
+        Stream the model's response as it is generated.
+
+        Failures before the first chunk arrives are retried like generate_sql();
+        once text has been yielded, errors are raised to the caller.
+
+        Args:
+            system_prompt: System-level instructions for the model
+            user_prompt: User's question and context
+            cache_key: Key of the prompt's shared prefix (see generate_sql())
+
+        Yields:
+            Text deltas of the response, in order
 
+        Raises:
+            Exception: If API call fails after retries
+        """
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+        # Sent as an extra body field so SDKs without the keyword still send it
+        options = {"extra_body": {"prompt_cache_key": cache_key}} if cache_key else {}
+
+        for attempt in range(self.max_retries + 1):
+            started = False
+            try:
+                logger.info(f"Calling OpenAI API with streaming (attempt {attempt + 1}/{self.max_retries + 1})")
+
+                stream = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                    timeout=self.timeout,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    **options
+                )
+
+                for chunk in stream:
+                    # The final chunk carries usage statistics and no choices
+                    if getattr(chunk, 'usage', None) is not None:
+                        cached = self.prompt_cache.record(chunk.usage)
+                        logger.info(
+                            f"Token usage - Prompt: {chunk.usage.prompt_tokens} ({cached} cached), "
+                            f"Completion: {chunk.usage.completion_tokens}, "
+                            f"Total: {chunk.usage.total_tokens}"
+                        )
+
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        started = True
+                        yield chunk.choices[0].delta.content
+
+                return
+
+            except TypeError:
+                # The client rejected the arguments; retrying cannot help
+                raise
             except Exception as e:
                 logger.error(f"OpenAI API error on attempt {attempt + 1}: {str(e)}")
 
+                if started:
+                    raise Exception(f"OpenAI API stream failed: {str(e)}")
+
                 if attempt < self.max_retries:
                     # Exponential backoff
                     wait_time = 2 ** attempt
@@ -91,17 +267,36 @@ class LLMService:
                     # Final attempt failed
                     raise Exception(f"OpenAI API call failed after {self.max_retries + 1} attempts: {str(e)}")
 
+    def stream_sql_with_retry(self, prompts: Dict[str, str]) -> Iterator[str]:
+        """
+        Stream a response with automatic retry before the first chunk.
+
+        Args:
+            prompts: Dictionary with 'system' and 'user' keys (and an
+                optional 'cache_key')
+
+        Returns:
+            Iterator over text deltas of the response
+        """
+        return self.generate_sql_stream(
+            system_prompt=prompts['system'],
+            user_prompt=prompts['user'],
+            cache_key=prompts.get('cache_key')
+        )
+
     def generate_sql_with_retry(self, prompts: Dict[str, str]) -> str:
         """
         Generate SQL with automatic retry on failure.
 
         Args:
-            prompts: Dictionary with 'system' and 'user' keys
+            prompts: Dictionary with 'system' and 'user' keys (and an
+                optional 'cache_key')
 
         Returns:
             Generated response from the model
         """
         return self.generate_sql(
             system_prompt=prompts['system'],
-            user_prompt=prompts['user']
+            user_prompt=prompts['user'],
+            cache_key=prompts.get('cache_key')
         )
@@ -0,0 +1,260 @@
+"""
+Async LLM Service Module
+Non-blocking counterpart of LLMService for running many generations at once.
+"""
+
+import os
+import random
+import asyncio
+import logging
+from typing import Dict, List, Optional
+from openai import AsyncOpenAI
+from dotenv import load_dotenv
+
+from llm_service import PromptCacheStats
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+
+class AsyncLLMService:
+    """
+    Asyncio-native service for interacting with OpenAI LLM.
+
+    All calls share one AsyncOpenAI client, and therefore one HTTP connection
+    pool, and a semaphore caps how many requests are in flight at once.
+    Retries back off with jitter using asyncio.sleep, so a waiting retry
+    never blocks other generations. The service should be used from a
+    single event loop.
+    """
+
+    def __init__(self, client: Optional[AsyncOpenAI] = None,
+                 max_concurrency: Optional[int] = None):
+        """
+        Initialize the async LLM service.
+
+        Args:
+            client: Preconfigured AsyncOpenAI client to share (created when None)
+            max_concurrency: Maximum requests in flight (defaults to LLM_MAX_CONCURRENCY)
+        """
+        self.model = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
+        self.temperature = float(os.getenv('OPENAI_TEMPERATURE', '0.0'))
+        self.max_tokens = int(os.getenv('OPENAI_MAX_TOKENS', '500'))
+        self.max_retries = int(os.getenv('MAX_RETRIES', '2'))
+        self.timeout = int(os.getenv('REQUEST_TIMEOUT', '30'))
+        self.max_concurrency = max_concurrency or int(os.getenv('LLM_MAX_CONCURRENCY', '8'))
+        self.backoff_base = 1.0
+        self.backoff_cap = 30.0
+        self.candidate_temperature = float(os.getenv('CANDIDATE_TEMPERATURE', '0.7'))
+        self.prompt_cache = PromptCacheStats()
+
+        if client is None:
+            api_key = os.getenv('OPENAI_API_KEY')
+            if not api_key:
+                raise ValueError("OPENAI_API_KEY not found in environment variables")
+
+            # Retries are handled here so that backoff stays non-blocking
+            client = AsyncOpenAI(api_key=api_key, max_retries=0)
+
+        self.client = client
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        logger.info(
+            f"Async LLM Service initialized with model: {self.model} "
+            f"(max {self.max_concurrency} concurrent requests)"
+        )
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Get a full-jitter exponential backoff delay for a retry."""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    async def generate_sql(self, system_prompt: str, user_prompt: str,
+                           cache_key: Optional[str] = None) -> str:
+        """
+        Generate SQL query from prompts using OpenAI API.
+
+        Args:
+            system_prompt: System-level instructions for the model
+            user_prompt: User's question and context
+            cache_key: Key of the prompt's shared prefix, so that requests
+                sharing it are routed to the same prompt cache
+
+        Returns:
+            Generated SQL query and explanation from the model
+
+        Raises:
+            Exception: If API call fails after retries
+        """
+        responses = await self._complete(system_prompt, user_prompt, cache_key)
+        return responses[0]
+
+    async def generate_candidates(self, prompts: Dict[str, str], n: int) -> List[str]:
+        """
+        Generate several alternative responses in a single request.
+
+        The prompt is sent once and the model samples n completions from it.
+        With more than one candidate they are sampled at the candidate
+        temperature, since at temperature 0 they would all be the same.
+
+        Args:
+            prompts: Dictionary with 'system' and 'user' keys (and an
+                optional 'cache_key')
+            n: Number of candidates
+
+        Returns:
+            The candidate responses, in the order the model returned them
+
+        Raises:
+            Exception: If API call fails after retries
+        """
+        return await self._complete(
+            prompts['system'], prompts['user'], prompts.get('cache_key'), n=n,
+            temperature=self.candidate_temperature if n > 1 else None
+        )
+
+    async def _complete(self, system_prompt: str, user_prompt: str, cache_key: Optional[str],
+                        n: int = 1, temperature: Optional[float] = None) -> List[str]:
+        """Request n completions, retrying failed calls with backoff."""
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+        # Sent as an extra body field so SDKs without the keyword still send it
+        options = {"extra_body": {"prompt_cache_key": cache_key}} if cache_key else {}
+        if n > 1:
+            options["n"] = n
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                # Only the request itself holds a slot, not the backoff wait
+                async with self._semaphore:
+                    logger.info(f"Calling OpenAI API (attempt {attempt + 1}/{self.max_retries + 1})")
+
+                    response = await self.client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        temperature=self.temperature if temperature is None else temperature,
+                        max_tokens=self.max_tokens,
+                        timeout=self.timeout,
+                        **options
+                    )
+
+                # Extract the response content, one per candidate
+                contents = [choice.message.content for choice in response.choices]
+
+                # Log usage statistics
+                if getattr(response, 'usage', None) is not None:
+                    cached = self.prompt_cache.record(response.usage)
+                    logger.info(
+                        f"Token usage - Prompt: {response.usage.prompt_tokens} ({cached} cached), "
+                        f"Completion: {response.usage.completion_tokens}, "
+                        f"Total: {response.usage.total_tokens}"
+                    )
+
+                return contents
+
+            except asyncio.CancelledError:
+                raise
+            except TypeError:
+                # The client rejected the arguments; retrying cannot help
+                raise
+            except Exception as e:
+                logger.error(f"OpenAI API error on attempt {attempt + 1}: {str(e)}")
+
+                if attempt < self.max_retries:
+                    wait_time = self._backoff_delay(attempt)
+                    logger.info(f"Retrying in {wait_time:.2f} seconds...")
+                    await asyncio.sleep(wait_time)
+                else:
+                    # Final attempt failed
+                    raise Exception(f"OpenAI API call failed after {self.max_retries + 1} attempts: {str(e)}")
+
+    async def generate_sql_with_retry(self, prompts: Dict[str, str]) -> str:
+        """
+        Generate SQL with automatic retry on failure.
+
+        Args:
+            prompts: Dictionary with 'system' and 'user' keys (and an
+                optional 'cache_key')
+
+        Returns:
+            Generated response from the model
+        """
+        return await self.generate_sql(
+            system_prompt=prompts['system'],
+            user_prompt=prompts['user'],
+            cache_key=prompts.get('cache_key')
+        )
+
+    async def generate_many(self, prompt_list: List[Dict[str, str]]) -> List[str]:
+        """
+        Generate responses for many prompts concurrently.
+
+        Args:
+            prompt_list: Prompt dictionaries with 'system' and 'user' keys
+
+        Returns:
+            Responses in the same order as the prompts
+        """
+        return await asyncio.gather(
+            *(self.generate_sql_with_retry(prompts) for prompts in prompt_list)
+        )
+
+    async def close(self) -> None:
+        """Close the shared client and its connection pool."""
+        await self.client.close()
+
+
+class LoopBoundLLMService:
+    """
+    Blocking interface to an AsyncLLMService whose requests run on an event loop.
+
+    Code written against LLMService, such as QueryPipeline, can run in a
+    worker thread while its requests share the async service's client,
+    connection pool and concurrency limit on the loop. The methods must not
+    be called from the loop's own thread.
+    """
+
+    def __init__(self, service, loop: Optional[asyncio.AbstractEventLoop] = None):
+        """
+        Initialize the interface.
+
+        Args:
+            service: AsyncLLMService (or any object with its async generate methods)
+            loop: Loop the requests run on (can be set later, once it is running)
+        """
+        self.service = service
+        self.loop = loop
+
+    @property
+    def model(self) -> Optional[str]:
+        """Model of the wrapped service."""
+        return getattr(self.service, 'model', None)
+
+    @property
+    def temperature(self) -> Optional[float]:
+        """Temperature of the wrapped service."""
+        return getattr(self.service, 'temperature', None)
+
+    @property
+    def prompt_cache(self) -> PromptCacheStats:
+        """Prompt cache statistics of the wrapped service."""
+        return self.service.prompt_cache
+
+    def generate_sql_with_retry(self, prompts: Dict[str, str]) -> str:
+        """Generate SQL on the loop and wait for the response."""
+        return self._call(self.service.generate_sql_with_retry(prompts))
+
+    def generate_candidates(self, prompts: Dict[str, str], n: int) -> List[str]:
+        """Generate n candidate responses on the loop and wait for them."""
+        return self._call(self.service.generate_candidates(prompts, n))
+
+    def _call(self, coroutine):
+        """Run a coroutine on the loop from a worker thread."""
+        if self.loop is None:
+            coroutine.close()
+            raise RuntimeError("No event loop set for the async LLM service")
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
@@ -0,0 +1,678 @@
+"""
+Query Cost Module
+Estimates the cost of a validated query from the schema profile and stops
+runaway queries (cartesian products, unfiltered self-joins) before execution.
+"""
+
+import logging
+import math
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import sqlparse
+from sqlparse import sql as ast
+from sqlparse import tokens as T
+
+from schema_profile import SchemaProfile
+from sql_validator import SQLValidator
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+AGGREGATE_FUNCTIONS = {'COUNT', 'SUM', 'AVG', 'MIN', 'MAX', 'TOTAL', 'GROUP_CONCAT'}
+SET_OPERATORS = {'UNION', 'UNION ALL', 'INTERSECT', 'EXCEPT'}
+
+# Textbook selectivities for predicates the statistics cannot answer
+RANGE_SELECTIVITY = 1 / 3
+LIKE_SELECTIVITY = 0.1
+NULL_SELECTIVITY = 0.1
+DEFAULT_SELECTIVITY = 0.5
+
+
+@dataclass(frozen=True)
+class CostEstimate:
+    """Static estimate of what a query will do."""
+
+    rows: int  # Estimated result rows
+    cost: int  # Estimated rows processed (scans, joins, sorts)
+    cartesian: bool  # A join has no predicate linking its inputs
+    streamable: bool  # Rows can be returned without materializing the whole result
+    limit: Optional[int] = None
+
+
+@dataclass
+class _Source:
+    """A table, CTE or subquery in a FROM clause."""
+
+    rows: float
+    distinct: Dict[str, int] = field(default_factory=dict)
+    cost: float = 0.0  # Work to produce the rows (subqueries and CTEs)
+
+    def distinct_count(self, column: str) -> float:
+        """Distinct values of a column (the row count when unknown)."""
+        return max(1.0, min(self.rows, self.distinct.get(column.lower(), self.rows)))
+
+
+@dataclass
+class _Predicate:
+    """One condition from a WHERE or ON clause."""
+
+    aliases: frozenset
+    selectivity: float
+    equijoin: bool = False
+
+
+@dataclass
+class _Join:
+    """A FROM item and how it is joined to the items before it."""
+
+    keyword: str
+    alias: Optional[str] = None
+    condition: List = field(default_factory=list)
+    using: bool = False
+
+
+@dataclass
+class _Select:
+    """Running estimate for one SELECT while its clauses are read."""
+
+    rows: float = 1.0
+    cost: float = 0.0
+    cartesian: bool = False
+    distinct: bool = False
+    aggregate: bool = False
+    grouped: bool = False
+    ordered: bool = False
+    limit: Optional[int] = None
+    offset: int = 0
+    aliases: set = field(default_factory=set)  # FROM aliases, including those of subqueries
+
+
+class QueryCostEstimator:
+    """
+    Estimates result size and work of a SELECT from table statistics.
+
+    The query is parsed with sqlparse and walked clause by clause. Base
+    tables contribute their profiled row counts; WHERE and ON predicates
+    are applied with 1/distinct_count selectivity for equality, fixed
+    fractions for ranges and LIKE, and 1/max(distinct) for join keys.
+    Joins with an equality predicate are costed as hash joins, any other
+    join as a nested loop over both inputs. Subqueries in the select list
+    and conditions are estimated too: once if uncorrelated, once per outer
+    row if they reference the outer query.
+    """
+
+    def __init__(self, profiles: Iterable[SchemaProfile] = ()):
+        """
+        Initialize the estimator.
+
+        Args:
+            profiles: Profiles of the tables queries can reference
+        """
+        self._tables: Dict[str, _Source] = {}
+        for profile in profiles:
+            self.add_profile(profile)
+
+    def add_profile(self, profile: SchemaProfile) -> None:
+        """
+        Register or replace the statistics of a table.
+
+        Args:
+            profile: Profile of the table, e.g. after the data was reloaded
+        """
+        self._tables[profile.table_name.lower()] = _Source(
+            rows=float(profile.row_count),
+            distinct={c.name.lower(): c.distinct_count for c in profile.columns},
+        )
+
+    def estimate(self, sql: str) -> CostEstimate:
+        """
+        Estimate the cost of a query.
+
+        Args:
+            sql: A query that has passed SQLValidator.validate()
+
+        Returns:
+            Estimate of result rows and work
+        """
+        statement = sqlparse.parse(sql)[0]
+        select = self._estimate_query(self._significant(statement.tokens), {})
+
+        streamable = not (select.grouped or select.aggregate or select.distinct or select.ordered)
+        return CostEstimate(
+            rows=int(math.ceil(select.rows)),
+            cost=int(math.ceil(select.cost)),
+            cartesian=select.cartesian,
+            streamable=streamable,
+            limit=select.limit,
+        )
+
+    # Query structure
+
+    @staticmethod
+    def _significant(tokens) -> List:
+        """Drop whitespace, comments and a trailing semicolon."""
+        return [
+            t for t in tokens
+            if not t.is_whitespace and not isinstance(t, ast.Comment)
+            and t.ttype not in T.Comment and not t.match(T.Punctuation, ';')
+        ]
+
+    def _inner(self, parenthesis: ast.Parenthesis) -> List:
+        """Significant tokens inside a parenthesis."""
+        return self._significant(parenthesis.tokens[1:-1])
+
+    @staticmethod
+    def _is_query(tokens: List) -> bool:
+        """Whether a token list holds a SELECT (or WITH ... SELECT)."""
+        return bool(tokens) and (tokens[0].ttype in T.DML or tokens[0].ttype in T.CTE)
+
+    def _estimate_query(self, tokens: List, ctes: Dict[str, _Source]) -> _Select:
+        """Estimate a query, combining the parts of UNION / INTERSECT / EXCEPT."""
+        parts, current = [], []
+        for token in tokens:
+            if token.ttype in T.Keyword and token.normalized in SET_OPERATORS:
+                parts.append(current)
+                current = []
+            else:
+                current.append(token)
+        parts.append(current)
+
+        ctes = dict(ctes)
+        selects = [self._estimate_select(part, ctes) for part in parts]
+        if len(selects) == 1:
+            return selects[0]
+
+        combined = _Select(
+            rows=sum(s.rows for s in selects),
+            cost=sum(s.cost for s in selects),
+            cartesian=any(s.cartesian for s in selects),
+            distinct=True,
+            aliases=set().union(*(s.aliases for s in selects)),
+        )
+        combined.cost += combined.rows
+        last = selects[-1]
+        combined.ordered, combined.limit, combined.offset = last.ordered, last.limit, last.offset
+        if combined.limit is not None:
+            combined.rows = min(combined.rows, combined.limit)
+        return combined
+
+    def _estimate_select(self, tokens: List, ctes: Dict[str, _Source]) -> _Select:
+        """Walk the clauses of a single SELECT."""
+        select = _Select()
+        scope: Dict[str, _Source] = {}
+        joins: List[_Join] = []
+        where: List = []
+        items, group_by, having = [], [], []
+        clause = None
+
+        for token in tokens:
+            keyword = token.normalized if token.ttype in T.Keyword else None
+
+            if token.ttype in T.CTE:
+                clause = 'with'
+            elif token.ttype in T.DML:
+                clause = 'select'
+            elif isinstance(token, ast.Where):
+                where = self._significant(token.tokens[1:])
+                clause = None
+            elif keyword == 'DISTINCT' and clause == 'select':
+                select.distinct = True
+            elif keyword == 'FROM' or (keyword or '').endswith('JOIN'):
+                clause = 'from'
+                joins.append(_Join(keyword=keyword))
+            elif keyword in ('ON', 'USING') and joins:
+                clause = 'on'
+                joins[-1].using = keyword == 'USING'
+            elif keyword == 'GROUP BY':
+                clause, select.grouped = 'group', True
+            elif keyword == 'ORDER BY':
+                clause, select.ordered = 'order', True
+            elif keyword in ('LIMIT', 'OFFSET', 'HAVING'):
+                clause = keyword.lower()
+            elif clause == 'on':
+                joins[-1].condition.append(token)
+            elif clause == 'with':
+                for identifier in self._identifiers(token):
+                    body = next((t for t in identifier.tokens if isinstance(t, ast.Parenthesis)), None)
+                    if body is not None:
+                        cte = self._estimate_query(self._inner(body), ctes)
+                        ctes[identifier.get_real_name().lower()] = _Source(rows=cte.rows, cost=cte.cost)
+            elif clause == 'select':
+                items.extend(self._identifiers(token))
+            elif clause == 'from':
+                for identifier in self._identifiers(token):
+                    alias, source = self._source(identifier, ctes)
+                    scope[alias] = source
+                    select.cost += source.cost
+                    if joins[-1].alias is not None:
+                        # Comma-separated FROM list: an implicit cross join
+                        joins.append(_Join(keyword='JOIN'))
+                    joins[-1].alias = alias
+            elif clause == 'group':
+                group_by.extend(self._identifiers(token))
+            elif clause == 'having':
+                having.append(token)
+            elif clause in ('limit', 'offset'):
+                numbers = [int(t.value) for t in token.flatten() if t.ttype in T.Number.Integer]
+                if numbers and clause == 'limit':
+                    # SQLite also accepts LIMIT offset, count
+                    select.limit = numbers[-1]
+                    select.offset += numbers[0] if len(numbers) > 1 else 0
+                elif numbers:
+                    select.offset += numbers[0]
+
+        select.aggregate = any(self._is_aggregate(item) for item in items)
+        self._apply_joins(select, scope, joins, self._condition(where, scope))
+        select.aliases |= set(scope)
+
+        # A condition runs a correlated subquery for each row of the outer
+        # tables it references, the select list and HAVING for each joined row
+        once, per_row = 0.0, 0.0
+        conditions = where + [token for join in joins for token in join.condition]
+        for part, outer_rows in ((conditions, None), (items + having, select.rows)):
+            for sub, referenced in self._subqueries(part, scope, ctes):
+                select.cartesian = select.cartesian or sub.cartesian
+                select.aliases |= sub.aliases
+                if not referenced:
+                    once += sub.cost
+                    continue
+                if outer_rows is None:
+                    outer_rows = math.prod(scope[alias].rows for alias in referenced)
+                per_row += sub.cost * max(outer_rows, 1.0)
+        select.cost += per_row
+
+        if select.grouped:
+            groups = self._product(self._distinct_counts(group_by, scope), select.rows)
+            select.cost += select.rows
+            select.rows = min(select.rows, groups)
+        elif select.aggregate:
+            select.rows = 1.0
+
+        if select.distinct:
+            select.cost += select.rows
+            select.rows = min(select.rows, self._product(self._distinct_counts(items, scope), select.rows))
+
+        if select.ordered:
+            select.cost += select.rows * math.log2(max(select.rows, 2.0))
+
+        if select.limit is not None:
+            wanted = select.limit + select.offset
+            if not (select.grouped or select.aggregate or select.distinct or select.ordered) \
+                    and select.rows > wanted:
+                # Execution stops once enough rows have been produced
+                select.cost *= wanted / select.rows
+            select.rows = min(select.rows, select.limit)
+
+        # Uncorrelated subqueries run in full whatever the LIMIT
+        select.cost += once
+        return select
+
+    def _subqueries(self, tokens: List, scope: Dict[str, _Source],
+                    ctes: Dict[str, _Source]) -> List[Tuple[_Select, frozenset]]:
+        """
+        Estimate the subqueries nested in a select list or condition.
+
+        Returns:
+            List of (estimate, outer aliases the subquery references)
+        """
+        found = []
+        for token in tokens:
+            if isinstance(token, ast.Parenthesis) and self._is_query(self._inner(token)):
+                sub = self._estimate_query(self._inner(token), ctes)
+                referenced = {
+                    node.get_parent_name().lower() for node in self._groups(token)
+                    if isinstance(node, ast.Identifier) and node.get_parent_name()
+                }
+                found.append((sub, frozenset(a for a in referenced if a in scope and a not in sub.aliases)))
+            elif token.is_group:
+                found.extend(self._subqueries(token.tokens, scope, ctes))
+        return found
+
+    def _apply_joins(self, select: _Select, scope: Dict[str, _Source],
+                     joins: List["_Join"], where: List[_Predicate]) -> None:
+        """Estimate the FROM clause, pushing single-table predicates down."""
+        joins = [join for join in joins if join.alias is not None]
+        if not joins:
+            # SELECT without FROM produces one row
+            return
+
+        predicates = list(where)
+        for position, join in enumerate(joins):
+            if position and (join.using or join.keyword == 'NATURAL JOIN'):
+                predicates.extend(self._using(join, [j.alias for j in joins[:position]], scope))
+            else:
+                predicates.extend(self._condition(join.condition, scope))
+
+        def filtered(alias: str) -> float:
+            rows = scope[alias].rows
+            for predicate in predicates:
+                if predicate.aliases == frozenset([alias]):
+                    rows *= predicate.selectivity
+            return max(rows, 1.0) if scope[alias].rows else 0.0
+
+        joined = {joins[0].alias}
+        rows = filtered(joins[0].alias)
+
+        for join in joins[1:]:
+            right = filtered(join.alias)
+            linking = [
+                p for p in predicates
+                if join.alias in p.aliases and len(p.aliases) > 1 and p.aliases <= joined | {join.alias}
+            ]
+            output = rows * right * math.prod(p.selectivity for p in linking)
+
+            if any(p.equijoin for p in linking):
+                select.cost += rows + right + output
+            else:
+                # No equality to hash on: every pair of rows is compared
+                select.cost += rows * right
+                if not linking:
+                    select.cartesian = True
+
+            if join.keyword.startswith(('LEFT', 'FULL')):
+                output = max(output, rows)
+            rows = max(output, 1.0) if output else 0.0
+            joined.add(join.alias)
+
+        select.cost += sum(s.rows for s in scope.values())
+        select.rows = rows
+
+    def _using(self, join: _Join, previous: List[str], scope: Dict[str, _Source]) -> List[_Predicate]:
+        """
+        Equijoin predicates of a USING or NATURAL join, one per join column.
+
+        Each column is matched to the first earlier table that has it and
+        gets the same 1/max(distinct) selectivity as the equivalent ON clause.
+        """
+        right = scope[join.alias]
+
+        if join.using:
+            inner = next((self._inner(t) for t in join.condition if isinstance(t, ast.Parenthesis)), [])
+            columns = [
+                (item.get_real_name() if isinstance(item, ast.Identifier) else item.value).strip('"`[]')
+                for token in inner for item in self._identifiers(token)
+                if not item.match(T.Punctuation, ',')
+            ]
+        elif right.distinct and all(scope[alias].distinct for alias in previous):
+            # NATURAL joins on the columns the tables share
+            columns = [c for c in right.distinct if any(c in scope[alias].distinct for alias in previous)]
+        else:
+            # Shared columns are unknown without statistics: assume a key join
+            smallest = min(scope[alias].rows for alias in previous + [join.alias])
+            return [_Predicate(frozenset(previous + [join.alias]), 1 / max(1.0, smallest), True)]
+
+        predicates = []
+        for column in columns:
+            left = next((alias for alias in previous if column.lower() in scope[alias].distinct), previous[0])
+            equal = 1 / max(scope[left].distinct_count(column), right.distinct_count(column))
+            predicates.append(_Predicate(frozenset([left, join.alias]), equal, True))
+        return predicates
+
+    def _source(self, identifier, ctes: Dict[str, _Source]) -> Tuple[str, _Source]:
+        """Resolve a FROM item to its alias and statistics."""
+        first = identifier.token_first() if identifier.is_group else identifier
+        alias = identifier.get_alias() if isinstance(identifier, ast.Identifier) else None
+
+        if isinstance(first, ast.Parenthesis):
+            sub = self._estimate_query(self._inner(first), ctes)
+            return (alias or f"subquery{id(first)}").lower(), _Source(rows=sub.rows, cost=sub.cost)
+
+        name = (identifier.get_real_name() if identifier.is_group else identifier.value) or ""
+        alias = (alias or name).lower()
+        key = name.strip('"`[]').lower()
+
+        if key in ctes:
+            return alias, ctes[key]
+        if key in self._tables:
+            return alias, self._tables[key]
+
+        # Unknown table: assume it is as large as the largest known one
+        rows = max((t.rows for t in self._tables.values()), default=1000.0)
+        logger.info(f"No statistics for table {name}, assuming {int(rows)} rows")
+        return alias, _Source(rows=rows)
+
+    @staticmethod
+    def _identifiers(token) -> List:
+        """Items of an identifier list, or the token itself."""
+        if isinstance(token, ast.IdentifierList):
+            return [t for t in token.get_identifiers()]
+        return [token]
+
+    @staticmethod
+    def _is_aggregate(item) -> bool:
+        """Whether a select item is an aggregate (window functions are not)."""
+        if not item.is_group:
+            return False
+        for node in [item] + list(QueryCostEstimator._walk(item)):
+            if isinstance(node, ast.Function):
+                name = (node.get_name() or '').upper()
+                window = any(isinstance(t, ast.Over) for t in node.tokens)
+                if name in AGGREGATE_FUNCTIONS and not window:
+                    return True
+        return False
+
+    @staticmethod
+    def _groups(token):
+        """All nested groups of a token, including those in subqueries."""
+        for child in token.tokens:
+            if child.is_group:
+                yield child
+                yield from QueryCostEstimator._groups(child)
+
+    @staticmethod
+    def _walk(token):
+        """All nested groups of a token, skipping subqueries."""
+        for child in token.tokens:
+            if child.is_group and not (isinstance(child, ast.Parenthesis)
+                                       and QueryCostEstimator._is_query(
+                                           [t for t in child.tokens[1:] if not t.is_whitespace])):
+                yield child
+                yield from QueryCostEstimator._walk(child)
+
+    # Predicates
+
+    def _condition(self, tokens: List, scope: Dict[str, _Source]) -> List[_Predicate]:
+        """
+        Turn a WHERE / ON condition into predicates.
+
+        AND-ed conditions become separate predicates so they can be pushed
+        down to their tables; an OR combines its branches into one predicate.
+        """
+        branches: List[List[_Predicate]] = []
+        current: List[_Predicate] = []
+        i = 0
+
+        while i < len(tokens):
+            token = tokens[i]
+            nxt = tokens[i + 1] if i + 1 < len(tokens) else None
+
+            if token.match(T.Keyword, 'OR'):
+                branches.append(current)
+                current = []
+            elif isinstance(token, ast.Comparison):
+                current.append(self._comparison(token, scope))
+            elif isinstance(token, ast.Parenthesis):
+                inner = self._inner(token)
+                if self._is_query(inner):
+                    current.append(_Predicate(frozenset(), DEFAULT_SELECTIVITY))
+                else:
+                    current.extend(self._condition(inner, scope))
+            elif isinstance(token, ast.Identifier) and nxt is not None and nxt.ttype in T.Keyword:
+                column = self._column(token, scope)
+                aliases = frozenset([column[0]]) if column else frozenset()
+                keyword = nxt.normalized
+
+                if keyword in ('IN', 'NOT IN') and i + 2 < len(tokens) \
+                        and isinstance(tokens[i + 2], ast.Parenthesis):
+                    inner = self._inner(tokens[i + 2])
+                    if self._is_query(inner) or column is None:
+                        selectivity = DEFAULT_SELECTIVITY
+                    else:
+                        values = len(self._identifiers(inner[0])) if inner else 0
+                        selectivity = min(1.0, values / column[1].distinct_count(column[2]))
+                    if keyword == 'NOT IN':
+                        selectivity = 1 - selectivity
+                    current.append(_Predicate(aliases, selectivity))
+                    i += 2
+                elif keyword in ('BETWEEN', 'NOT BETWEEN'):
+                    current.append(_Predicate(aliases, RANGE_SELECTIVITY))
+                    i += 4  # column BETWEEN low AND high
+                elif keyword == 'IS':
+                    current.append(_Predicate(aliases, NULL_SELECTIVITY))
+                    i += 2
+            i += 1
+
+        if not branches:
+            return current
+
+        branches.append(current)
+        aliases = frozenset().union(*(p.aliases for branch in branches for p in branch))
+        selectivity = min(1.0, sum(
+            math.prod(p.selectivity for p in branch) for branch in branches
+        ))
+        return [_Predicate(aliases, selectivity)]
+
+    def _comparison(self, comparison: ast.Comparison, scope: Dict[str, _Source]) -> _Predicate:
+        """Selectivity of a single comparison."""
+        operator = next(
+            (t.normalized for t in comparison.tokens if t.ttype in T.Operator.Comparison), '='
+        )
+        left = self._column(comparison.left, scope)
+        right = self._column(comparison.right, scope)
+        columns = [c for c in (left, right) if c is not None]
+        aliases = frozenset(c[0] for c in columns)
+
+        if operator in ('LIKE', 'GLOB', 'NOT LIKE'):
+            return _Predicate(aliases, LIKE_SELECTIVITY)
+        if operator not in ('=', '==', '!=', '<>'):
+            return _Predicate(aliases, RANGE_SELECTIVITY)
+
+        if len(columns) == 2:
+            equal = 1 / max(left[1].distinct_count(left[2]), right[1].distinct_count(right[2]))
+            return _Predicate(aliases, equal if operator in ('=', '==') else 1 - equal,
+                              equijoin=operator in ('=', '==') and len(aliases) > 1)
+
+        equal = 1 / columns[0][1].distinct_count(columns[0][2]) if columns else LIKE_SELECTIVITY
+        return _Predicate(aliases, equal if operator in ('=', '==') else 1 - equal)
+
+    @staticmethod
+    def _column(token, scope: Dict[str, _Source]) -> Optional[Tuple[str, _Source, str]]:
+        """Resolve a column reference to (alias, source, column name)."""
+        if not isinstance(token, ast.Identifier) or isinstance(token.token_first(), ast.Parenthesis):
+            return None
+
+        column = token.get_real_name()
+        parent = token.get_parent_name()
+        if not column:
+            return None
+
+        if parent:
+            source = scope.get(parent.lower())
+            return (parent.lower(), source, column) if source is not None else None
+
+        owners = [a for a, s in scope.items() if column.lower() in s.distinct]
+        if len(owners) == 1:
+            return owners[0], scope[owners[0]], column
+        if not owners and len(scope) == 1:
+            alias = next(iter(scope))
+            return alias, scope[alias], column
+        return None
+
+    def _distinct_counts(self, items: List, scope: Dict[str, _Source]) -> Optional[List[float]]:
+        """Distinct counts of plain column items, or None if any item is an expression."""
+        counts = []
+        for item in items:
+            column = self._column(item, scope)
+            if column is None:
+                return None
+            counts.append(column[1].distinct_count(column[2]))
+        return counts
+
+    @staticmethod
+    def _product(counts: Optional[List[float]], rows: float) -> float:
+        """Combinations of distinct values, capped at the row count."""
+        if not counts:
+            return rows
+        return min(rows, math.prod(counts))
+
+
+class QueryCostGuard:
+    """
+    Rejects or rewrites queries whose estimated cost exceeds a budget.
+
+    Over-budget queries that can stream their rows are wrapped in an outer
+    SELECT with a LIMIT when that brings them within budget; all others are
+    rejected with a reason that can be sent back to the LLM in a correction
+    prompt.
+    """
+
+    def __init__(self, estimator: QueryCostEstimator, max_cost: Optional[int] = None,
+                 rewrite_limit: Optional[int] = None,
+                 sql_validator: Optional[SQLValidator] = None):
+        """
+        Initialize the guard.
+
+        Args:
+            estimator: Estimator holding the current table statistics
+            max_cost: Maximum estimated rows processed (defaults to QUERY_COST_BUDGET)
+            rewrite_limit: LIMIT added to over-budget streaming queries
+                (defaults to QUERY_REWRITE_LIMIT; 0 disables rewriting)
+            sql_validator: Validator rewritten queries must pass again (created when None)
+        """
+        self.estimator = estimator
+        self.sql_validator = sql_validator or SQLValidator()
+        self.max_cost = max_cost if max_cost is not None else \
+            int(float(os.getenv('QUERY_COST_BUDGET', '10000000')))
+        self.rewrite_limit = rewrite_limit if rewrite_limit is not None else \
+            int(os.getenv('QUERY_REWRITE_LIMIT', '1000'))
+
+    def check(self, sql: str) -> Tuple[bool, str, str]:
+        """
+        Check a validated query against the cost budget.
+
+        Args:
+            sql: A query that has passed SQLValidator.validate()
+
+        Returns:
+            Tuple of (is_allowed, sql_to_execute, message). The message
+            explains a rejection or a rewrite and is empty otherwise.
+        """
+        try:
+            estimate = self.estimator.estimate(sql)
+        except Exception as e:
+            # The estimate is advisory; validation has already passed
+            logger.warning(f"Could not estimate query cost: {str(e)}")
+            return True, sql, ""
+
+        if estimate.cost <= self.max_cost:
+            return True, sql, ""
+
+        logger.info(f"Query over budget: {estimate}")
+
+        if self.rewrite_limit > 0 and estimate.streamable and \
+                (estimate.limit is None or estimate.limit > self.rewrite_limit):
+            # Wrapped rather than appended to: a trailing comment, an existing
+            # LIMIT or the last part of a UNION cannot absorb the new LIMIT
+            limited = (f"SELECT * FROM (\n{self.sql_validator.strip_terminator(sql)}\n) AS limited\n"
+                       f"LIMIT {self.rewrite_limit}")
+            is_valid, _ = self.sql_validator.validate(limited)
+            try:
+                limited_estimate = self.estimator.estimate(limited) if is_valid else None
+            except Exception:
+                limited_estimate = None
+
+            if limited_estimate is not None and limited_estimate.cost <= self.max_cost:
+                return True, limited, (
+                    f"Query would return about {estimate.rows:,} rows, "
+                    f"so only the first {self.rewrite_limit:,} are shown (LIMIT added)"
+                )
+
+        reason = "the join has no condition linking the tables (cartesian product)" \
+            if estimate.cartesian else f"it would process about {estimate.cost:,} rows"
+        return False, sql, (
+            f"Query too expensive: {reason}; the budget is {self.max_cost:,} rows. "
+            f"Add join conditions, filters or aggregation to reduce the work."
+        )
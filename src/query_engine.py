@@ -0,0 +1,732 @@
+"""
+Query Engine Module
+Executes SQL queries against the loaded data through pluggable backends.
+"""
+
+import os
+import queue
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import logging
+import multiprocessing
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data_cache import read_arrow_file, write_arrow_file
+from table_diff import TableChanges
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Wall-clock seconds a query may run before it is cancelled (0 disables)
+DEFAULT_QUERY_TIMEOUT = float(os.getenv('QUERY_TIMEOUT', '30'))
+
+
+class QueryTimeoutError(Exception):
+    """Raised when a query is cancelled for exceeding its time budget."""
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        super().__init__(
+            f"Query timed out after {timeout:g} seconds and was cancelled. "
+            f"Write a cheaper query: filter rows early, avoid self-joins and "
+            f"cartesian products, and aggregate before joining."
+        )
+
+    def __reduce__(self):
+        # Keep the timeout when the error crosses a process boundary
+        return (type(self), (self.timeout,))
+
+
+class QueryEngine(ABC):
+    """Interface shared by all query execution backends."""
+
+    #: Default time budget per query in seconds (None or 0 for no limit)
+    timeout: Optional[float] = None
+
+    #: Statement prefix that plans a query without running it
+    explain_prefix: str = "EXPLAIN"
+
+    @classmethod
+    def from_loader(cls, data_loader, **kwargs) -> "QueryEngine":
+        """
+        Build an engine holding the tables of an already loaded DataLoader.
+
+        Args:
+            data_loader: DataLoader or DataCatalog whose data has been loaded
+            **kwargs: Passed through to the engine constructor
+
+        Returns:
+            Engine with the loader's tables loaded into it
+        """
+        loaders = getattr(data_loader, "loaders", [data_loader])
+        if any(loader.df is None for loader in loaders):
+            raise ValueError("Data not loaded. Call load_data() first.")
+
+        engine = cls(**kwargs)
+        for loader in loaders:
+            engine.load_table(loader.table_name, loader.df)
+        return engine
+
+    @abstractmethod
+    def load_table(self, table_name: str, df: pd.DataFrame) -> None:
+        """Make a DataFrame queryable under the given table name."""
+
+    def apply_changes(self, table_name: str, df: pd.DataFrame, changes: TableChanges) -> None:
+        """
+        Bring a table up to date with a new version of its data.
+
+        Engines that can apply the row-level changes in place override this;
+        by default the new version replaces the table.
+
+        Args:
+            table_name: Name the table is queried by
+            df: New version of the table
+            changes: Row-level changes from the loaded version to df
+        """
+        self.load_table(table_name, df)
+
+    @abstractmethod
+    def list_tables(self) -> List[str]:
+        """Get the names of all queryable tables."""
+
+    @abstractmethod
+    def execute(self, sql: str, timeout: Optional[float] = None) -> pd.DataFrame:
+        """
+        Execute a query and return the result as a DataFrame.
+
+        Raises QueryTimeoutError when the query runs longer than timeout
+        seconds (defaults to the engine's timeout).
+        """
+
+    def dry_run(self, sql: str, timeout: Optional[float] = None) -> None:
+        """
+        Check that a query compiles against the loaded tables without running it.
+
+        Args:
+            sql: The SQL query to check
+            timeout: Time budget in seconds (defaults to the engine's timeout)
+
+        Raises:
+            Exception: The engine's error for unknown tables or columns,
+                type mismatches and other mistakes found while planning
+        """
+        self.execute(f"{self.explain_prefix} {sql}", timeout=timeout)
+
+    def _budget(self, timeout: Optional[float]) -> Optional[float]:
+        """Resolve the time budget for a query (None when unlimited)."""
+        budget = self.timeout if timeout is None else timeout
+        return budget if budget and budget > 0 else None
+
+    def close(self) -> None:
+        """Release any resources held by the engine."""
+
+
+class SQLiteEngine(QueryEngine):
+    """
+    Long-lived SQLite store for query execution.
+
+    Tables are written into the database once, when the data is loaded.
+    Queries are then served by a fixed pool of read-only connections, so
+    the cost of a query no longer includes copying the DataFrame.
+    """
+
+    # Virtual machine instructions between checks of the query deadline
+    PROGRESS_INTERVAL = 10_000
+
+    # Plain EXPLAIN lists the compiled bytecode; the query plan is enough
+    explain_prefix = "EXPLAIN QUERY PLAN"
+
+    def __init__(self, database_path: Optional[str] = None, pool_size: int = 4,
+                 timeout: Optional[float] = DEFAULT_QUERY_TIMEOUT):
+        """
+        Initialize the engine and open its connection pool.
+
+        Args:
+            database_path: Path of the SQLite file backing the store. When
+                omitted, a temporary file is used and removed on close().
+            pool_size: Number of read-only connections kept open for queries
+            timeout: Default time budget per query in seconds (None or 0 for no limit)
+        """
+        if pool_size < 1:
+            raise ValueError("pool_size must be at least 1")
+
+        self._owns_file = database_path is None
+        if database_path is None:
+            fd, database_path = tempfile.mkstemp(prefix="query_engine_", suffix=".db")
+            os.close(fd)
+
+        self.database_path = database_path
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._write_lock = threading.Lock()
+
+        # SQLite rowid of every row of each table, in the order of the
+        # DataFrame the table was loaded from, for applying row-level changes
+        self._row_ids: Dict[str, np.ndarray] = {}
+
+        # The single writer connection is only used to (re)load tables
+        self._writer = sqlite3.connect(database_path, check_same_thread=False)
+        self._writer.execute("PRAGMA journal_mode = WAL")
+        self._writer.execute("PRAGMA synchronous = OFF")
+
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=pool_size)
+        for _ in range(pool_size):
+            self._pool.put(self._connect_reader())
+
+        logger.info(f"SQLite engine initialized at {database_path} with {pool_size} connections")
+
+    def _connect_reader(self) -> sqlite3.Connection:
+        """Open a read-only connection to the backing database."""
+        conn = sqlite3.connect(
+            f"file:{self.database_path}?mode=ro",
+            uri=True,
+            check_same_thread=False
+        )
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def load_table(self, table_name: str, df: pd.DataFrame) -> None:
+        """
+        Write a DataFrame into the store, replacing any table with that name.
+
+        Args:
+            table_name: Name the table is queried by
+            df: Data to store
+        """
+        with self._write_lock:
+            logger.info(f"Loading {len(df)} rows into table {table_name}")
+            df.to_sql(table_name, self._writer, index=False, if_exists="replace")
+            self._writer.commit()
+            self._row_ids[table_name] = np.arange(1, len(df) + 1)
+
+    def apply_changes(self, table_name: str, df: pd.DataFrame, changes: TableChanges) -> None:
+        """
+        Apply inserts, updates and deletes to a table in one transaction.
+
+        Changed rows are staged with their target rowids, then deleted rows
+        and the old versions of updated rows are removed and the staged rows
+        inserted, so only the changed rows are written.
+
+        Args:
+            table_name: Name the table is queried by
+            df: New version of the table
+            changes: Row-level changes from the loaded version to df
+        """
+        row_ids = self._row_ids.get(table_name)
+        if row_ids is None or len(row_ids) != changes.old_row_count:
+            # Not loaded from a DataFrame this engine knows the order of
+            self.load_table(table_name, df)
+            return
+
+        staging = f"{table_name}__changes"
+
+        with self._write_lock:
+            new_ids = np.empty(len(df), dtype=np.int64)
+            kept = changes.source_positions >= 0
+            new_ids[kept] = row_ids[changes.source_positions[kept]]
+            inserted = changes.inserted
+            new_ids[inserted] = (row_ids.max() if len(row_ids) else 0) + 1 + np.arange(len(inserted))
+
+            written = np.sort(np.concatenate([inserted, changes.updated]))
+            staged = df.iloc[written].copy()
+            staged.insert(0, "__rowid", new_ids[written])
+            staged.to_sql(staging, self._writer, index=False, if_exists="replace")
+
+            columns = ", ".join(f'"{col}"' for col in df.columns)
+            removed = [(int(row_id),) for row_id in row_ids[changes.deleted]]
+            try:
+                self._writer.commit()
+                self._writer.execute("BEGIN")
+                self._writer.executemany(f'DELETE FROM "{table_name}" WHERE rowid = ?', removed)
+                self._writer.execute(
+                    f'DELETE FROM "{table_name}" WHERE rowid IN (SELECT "__rowid" FROM "{staging}")'
+                )
+                self._writer.execute(
+                    f'INSERT INTO "{table_name}" (rowid, {columns}) '
+                    f'SELECT "__rowid", {columns} FROM "{staging}"'
+                )
+                self._writer.execute(f'DROP TABLE "{staging}"')
+                self._writer.commit()
+            except Exception:
+                self._writer.rollback()
+                self._writer.execute(f'DROP TABLE IF EXISTS "{staging}"')
+                self._writer.commit()
+                raise
+
+            self._row_ids[table_name] = new_ids
+
+        logger.info(f"Applied changes to table {table_name}: {changes}")
+
+    def load_table_chunks(self, table_name: str, chunks: Iterable[pd.DataFrame]) -> int:
+        """
+        Write a table chunk by chunk, replacing any table with that name.
+
+        Chunks are appended to a staging table as they arrive, so only one is
+        held in memory at a time. The staging table replaces the live table in
+        a single transaction after the last chunk, so queries never see a
+        partly loaded table.
+
+        Args:
+            table_name: Name the table is queried by
+            chunks: DataFrames with the same columns, in row order
+
+        Returns:
+            Number of rows written
+        """
+        staging = f"{table_name}__staging"
+
+        with self._write_lock:
+            self._writer.execute(f'DROP TABLE IF EXISTS "{staging}"')
+            rows, count = 0, 0
+            try:
+                for chunk in chunks:
+                    # Columns that are empty in the first chunk get no declared
+                    # type, so that later values are stored without conversion
+                    untyped = {col: "" for col in chunk.columns if chunk[col].isna().all()} \
+                        if count == 0 else None
+                    chunk.to_sql(staging, self._writer, index=False, if_exists="append", dtype=untyped)
+                    rows += len(chunk)
+                    count += 1
+
+                if count == 0:
+                    raise ValueError(f"No data to load into table {table_name}")
+
+                self._writer.commit()
+                self._writer.execute("BEGIN")
+                self._writer.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+                self._writer.execute(f'ALTER TABLE "{staging}" RENAME TO "{table_name}"')
+                self._writer.commit()
+                self._row_ids[table_name] = np.arange(1, rows + 1)
+            except Exception:
+                self._writer.rollback()
+                self._writer.execute(f'DROP TABLE IF EXISTS "{staging}"')
+                self._writer.commit()
+                raise
+
+        logger.info(f"Loaded {rows} rows in {count} chunks into table {table_name}")
+        return rows
+
+    def list_tables(self) -> List[str]:
+        """Get the names of all tables in the store."""
+        result = self.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")
+        return result["name"].tolist()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Borrow a read-only connection from the pool.
+
+        Blocks until a connection is free when all of them are in use.
+        """
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def execute(self, sql: str, timeout: Optional[float] = None) -> pd.DataFrame:
+        """
+        Execute a query on a pooled connection.
+
+        A progress handler checks the deadline while SQLite runs the query
+        and aborts it once the budget is spent.
+
+        Args:
+            sql: The SQL query to run
+            timeout: Time budget in seconds (defaults to the engine's timeout)
+
+        Returns:
+            Query result as a DataFrame
+
+        Raises:
+            QueryTimeoutError: If the query ran past its budget
+        """
+        budget = self._budget(timeout)
+
+        with self.connection() as conn:
+            if budget is None:
+                return pd.read_sql_query(sql, conn)
+
+            deadline = time.monotonic() + budget
+            timed_out = False
+
+            def check_deadline() -> int:
+                nonlocal timed_out
+                timed_out = time.monotonic() > deadline
+                return 1 if timed_out else 0  # Non-zero interrupts the query
+
+            conn.set_progress_handler(check_deadline, self.PROGRESS_INTERVAL)
+            try:
+                return pd.read_sql_query(sql, conn)
+            except Exception:
+                if timed_out:
+                    logger.warning(f"Query cancelled after {budget:g}s: {sql}")
+                    raise QueryTimeoutError(budget) from None
+                raise
+            finally:
+                conn.set_progress_handler(None, 0)
+
+    def close(self) -> None:
+        """Close all connections and remove the temporary database file."""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+        self._writer.close()
+
+        if self._owns_file:
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.remove(self.database_path + suffix)
+                except FileNotFoundError:
+                    pass
+
+
+class DuckDBEngine(QueryEngine):
+    """
+    Columnar query backend built on DuckDB.
+
+    DataFrames are registered as views and scanned in place through Arrow,
+    so nothing is copied at load time and aggregations run vectorized
+    across all cores.
+    """
+
+    def __init__(self, pool_size: int = 4, threads: Optional[int] = None,
+                 timeout: Optional[float] = DEFAULT_QUERY_TIMEOUT):
+        """
+        Initialize the engine and its cursor pool.
+
+        Args:
+            pool_size: Number of cursors kept open for queries
+            threads: Worker threads per query (defaults to all cores)
+            timeout: Default time budget per query in seconds (None or 0 for no limit)
+        """
+        try:
+            import duckdb
+        except ImportError as e:
+            raise ImportError("The duckdb backend requires the duckdb package (pip install duckdb)") from e
+
+        if pool_size < 1:
+            raise ValueError("pool_size must be at least 1")
+
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._duckdb = duckdb
+        self._conn = duckdb.connect(":memory:")
+        if threads is not None:
+            self._conn.execute(f"SET threads = {int(threads)}")
+
+        # Queries only see the registered DataFrames: no reading or writing
+        # files (read_csv, COPY ... TO) and no turning that back on. Views
+        # registered later are in-process objects and are not affected.
+        self._conn.execute("SET enable_external_access = false")
+        self._conn.execute("SET lock_configuration = true")
+
+        self._tables: Dict[str, pd.DataFrame] = {}
+        self._version = 0
+        self._lock = threading.Lock()
+
+        # Registered views are local to a cursor, so each pooled cursor
+        # remembers which version of the table set it has registered
+        self._pool: "queue.Queue[Tuple[object, int]]" = queue.Queue(maxsize=pool_size)
+        for _ in range(pool_size):
+            self._pool.put((self._conn.cursor(), -1))
+
+        logger.info(f"DuckDB engine initialized with {pool_size} cursors")
+
+    def load_table(self, table_name: str, df: pd.DataFrame) -> None:
+        """
+        Register a DataFrame as a view, replacing any view with that name.
+
+        Args:
+            table_name: Name the table is queried by
+            df: Data to expose (referenced, not copied)
+        """
+        with self._lock:
+            logger.info(f"Registering {len(df)} rows as view {table_name}")
+            self._tables[table_name] = df
+            self._version += 1
+
+    def list_tables(self) -> List[str]:
+        """Get the names of all registered views."""
+        return sorted(self._tables)
+
+    @contextmanager
+    def connection(self) -> Iterator[object]:
+        """
+        Borrow a cursor from the pool with the current views registered.
+
+        Blocks until a cursor is free when all of them are in use.
+        """
+        cursor, version = self._pool.get()
+        try:
+            with self._lock:
+                tables = dict(self._tables)
+                current = self._version
+
+            if version != current:
+                for name, df in tables.items():
+                    cursor.register(name, df)
+                version = current
+
+            yield cursor
+        finally:
+            self._pool.put((cursor, version))
+
+    def execute(self, sql: str, timeout: Optional[float] = None) -> pd.DataFrame:
+        """
+        Execute a query on a pooled cursor.
+
+        A timer interrupts the cursor once the budget is spent.
+
+        Args:
+            sql: The SQL query to run
+            timeout: Time budget in seconds (defaults to the engine's timeout)
+
+        Returns:
+            Query result as a DataFrame
+
+        Raises:
+            QueryTimeoutError: If the query ran past its budget
+            ValueError: If the SQL holds more than one statement
+        """
+        # DuckDB would run every statement in the string, so do not rely on
+        # the caller having validated it
+        if len(self._duckdb.extract_statements(sql)) != 1:
+            raise ValueError("Only a single SQL statement can be executed")
+
+        budget = self._budget(timeout)
+
+        with self.connection() as cursor:
+            if budget is None:
+                return cursor.execute(sql).df()
+
+            interrupted = threading.Event()
+
+            def interrupt() -> None:
+                interrupted.set()
+                cursor.interrupt()
+
+            timer = threading.Timer(budget, interrupt)
+            timer.daemon = True
+            timer.start()
+            try:
+                return cursor.execute(sql).df()
+            except Exception:
+                if interrupted.is_set():
+                    logger.warning(f"Query cancelled after {budget:g}s: {sql}")
+                    raise QueryTimeoutError(budget) from None
+                raise
+            finally:
+                timer.cancel()
+
+    def close(self) -> None:
+        """Close all cursors and the underlying database."""
+        while True:
+            try:
+                cursor, _ = self._pool.get_nowait()
+                cursor.close()
+            except queue.Empty:
+                break
+
+        self._conn.close()
+
+
+# State of a ProcessPoolEngine worker process
+_worker_engine: Optional[QueryEngine] = None
+_worker_tables: Dict[str, str] = {}
+
+
+def _init_worker(backend: str, options: Dict, data_dir: str) -> None:
+    """
+    Create the in-process engine of a pool worker.
+
+    A SQLite worker keeps its database in the pool's data directory, which
+    is removed with everything in it when the pool is closed.
+    """
+    global _worker_engine
+    if backend == "sqlite":
+        fd, database_path = tempfile.mkstemp(prefix="worker_", suffix=".db", dir=data_dir)
+        os.close(fd)
+        options = {**options, "database_path": database_path}
+    _worker_engine = ENGINES[backend](**options)
+
+
+def _worker_execute(tables: Dict[str, str], sql: str, timeout: Optional[float]) -> pd.DataFrame:
+    """Bring the worker's tables up to date, then run a query in the worker."""
+    for name, path in tables.items():
+        if _worker_tables.get(name) != path:
+            _worker_engine.load_table(name, read_arrow_file(path, memory_map=True))
+            _worker_tables[name] = path
+
+    return _worker_engine.execute(sql, timeout=timeout)
+
+
+class ProcessPoolEngine(QueryEngine):
+    """
+    Runs queries in a pool of worker processes, one query per process.
+
+    Each loaded table is written once to an uncompressed Arrow file, which
+    every worker memory-maps into its own in-process engine the first time
+    it needs it. Queries from different sessions then run on separate
+    cores instead of sharing the GIL of the app process.
+    """
+
+    def __init__(self, workers: Optional[int] = None, backend: str = "sqlite",
+                 timeout: Optional[float] = DEFAULT_QUERY_TIMEOUT):
+        """
+        Initialize the engine and its worker pool.
+
+        Args:
+            workers: Number of worker processes (defaults to QUERY_WORKERS or the CPU count)
+            backend: In-process engine each worker runs ("sqlite" or "duckdb")
+            timeout: Default time budget per query in seconds (None or 0 for no limit)
+        """
+        if backend not in ENGINES or ENGINES[backend] is ProcessPoolEngine:
+            raise ValueError(f"Unsupported worker backend '{backend}'")
+
+        self.workers = workers or int(os.getenv('QUERY_WORKERS', '0')) or os.cpu_count() or 1
+        self.backend = backend
+        self.timeout = timeout
+        self.explain_prefix = ENGINES[backend].explain_prefix
+
+        self._data_dir = Path(tempfile.mkdtemp(prefix="query_engine_"))
+        self._tables: Dict[str, str] = {}
+        self._version = 0
+        self._lock = threading.Lock()
+        # Table files handed to queries that have not finished yet, and
+        # replaced files waiting for those queries before they are removed
+        self._refs: Dict[str, int] = {}
+        self._retired: set = set()
+
+        # Workers are spawned rather than forked, since the app process
+        # may be running other threads
+        worker_options = {"pool_size": 1, "timeout": None}
+        if backend == "duckdb":
+            worker_options["threads"] = 1
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(backend, worker_options, str(self._data_dir)),
+        )
+
+        logger.info(f"Process pool engine initialized with {self.workers} {backend} workers")
+
+    def load_table(self, table_name: str, df: pd.DataFrame) -> None:
+        """
+        Publish a DataFrame to the workers, replacing any table with that name.
+
+        Args:
+            table_name: Name the table is queried by
+            df: Data to publish
+        """
+        with self._lock:
+            self._version += 1
+            path = self._data_dir / f"{table_name}-{self._version}.arrow"
+            write_arrow_file(df, path)
+            logger.info(f"Published {len(df)} rows of table {table_name} to {path}")
+
+            previous = self._tables.get(table_name)
+            self._tables[table_name] = str(path)
+
+            # Queries submitted before the reload may still be queued for the
+            # old file, so it is removed once the last of them finishes
+            if previous and self._refs.get(previous):
+                self._retired.add(previous)
+                previous = None
+
+        if previous:
+            Path(previous).unlink(missing_ok=True)
+
+    def list_tables(self) -> List[str]:
+        """Get the names of all published tables."""
+        return sorted(self._tables)
+
+    def execute(self, sql: str, timeout: Optional[float] = None) -> pd.DataFrame:
+        """
+        Execute a query in a worker process.
+
+        Blocks until a worker is free when all of them are busy.
+
+        Args:
+            sql: The SQL query to run
+            timeout: Time budget in seconds (defaults to the engine's timeout)
+
+        Returns:
+            Query result as a DataFrame
+
+        Raises:
+            QueryTimeoutError: If the query ran past its budget
+        """
+        with self._lock:
+            tables = dict(self._tables)
+            for path in tables.values():
+                self._refs[path] = self._refs.get(path, 0) + 1
+
+        try:
+            future = self._executor.submit(_worker_execute, tables, sql, self._budget(timeout))
+            return future.result()
+        finally:
+            self._release(tables.values())
+
+    def _release(self, paths: Iterable[str]) -> None:
+        """Drop a finished query's references, removing retired files nobody uses any more."""
+        unused = []
+        with self._lock:
+            for path in paths:
+                self._refs[path] -= 1
+                if not self._refs[path]:
+                    del self._refs[path]
+                    if path in self._retired:
+                        self._retired.discard(path)
+                        unused.append(path)
+
+        for path in unused:
+            Path(path).unlink(missing_ok=True)
+
+    def close(self) -> None:
+        """Stop the workers and remove the published table files and worker databases."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(self._data_dir, ignore_errors=True)
+
+
+ENGINES = {
+    "sqlite": SQLiteEngine,
+    "duckdb": DuckDBEngine,
+    "process": ProcessPoolEngine,
+}
+
+
+def create_query_engine(data_loader, backend: Optional[str] = None, **kwargs) -> QueryEngine:
+    """
+    Build the configured query engine for a loaded DataLoader.
+
+    Args:
+        data_loader: DataLoader or DataCatalog whose data has been loaded
+        backend: Engine name from ENGINES (defaults to QUERY_ENGINE or "sqlite")
+        **kwargs: Passed through to the engine constructor
+
+    Returns:
+        Engine with the loader's table loaded into it
+    """
+    backend = (backend or os.getenv('QUERY_ENGINE', 'sqlite')).lower()
+
+    if backend not in ENGINES:
+        raise ValueError(f"Unknown query engine '{backend}'. Choose from: {', '.join(ENGINES)}")
+
+    logger.info(f"Using {backend} query engine")
+    return ENGINES[backend].from_loader(data_loader, **kwargs)
@@ -3,15 +3,37 @@ Query Handler Module
 Builds prompts for the LLM to generate SQL queries from natural language questions.
 """
 
+import hashlib
 import logging
-from typing import Dict
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence, Tuple
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# Prompt layouts: "inline" puts the schema in the user message next to the
+# question; "prefix" keeps everything but the question in a byte-stable
+# system message that LLM providers can serve from their prompt cache
+PROMPT_LAYOUTS = ("inline", "prefix")
+
+# Assembled prefixes kept per schema fingerprint
+MAX_CACHED_PREFIXES = 16
+
+
 class QueryHandler:
-    """Handles building prompts for SQL generation."""
+    """
+    Handles building prompts for SQL generation.
+
+    In the prefix layout the system prompt, the schema and the few-shot
+    examples form one prefix that is assembled once per schema fingerprint
+    and reused byte for byte, with the question alone in the user message.
+    Prompts then share everything up to the question, so the provider's
+    prompt cache can skip re-processing it.
+    """
 
     SYSTEM_PROMPT = """You are an expert SQL assistant specializing in data quality analysis.
 Your task is to convert natural language questions into SQL queries.
@@ -38,21 +60,86 @@ User Question: {question}
 
 Generate a SQL query to answer this question. Remember to use only SELECT statements and exact column names from the schema above."""
 
-    def __init__(self):
-        """Initialize the Query Handler."""
-        pass
+    PREFIX_TEMPLATE = """{system}
+Database Schema:
+{schema}
+{examples}
+Answer the user's question with a SQL query. Use only SELECT statements and exact column names from the schema above."""
+
+    PREFIX_QUESTION_TEMPLATE = """User Question: {question}"""
+
+    PREFIX_CORRECTION_TEMPLATE = """Original Question: {question}
+
+Your previous SQL query failed:
+```sql
+{failed_sql}
+```
+
+Error: {error_message}
+
+Please correct the SQL query to fix this error. Use only the column names from the schema above."""
+
+    # Few-shot examples for the prefix layout; each is only shown when the
+    # tables it queries are in the schema
+    EXAMPLES: Tuple[Tuple[str, str], ...] = (
+        (
+            "How many transactions are in USD currency?",
+            "SELECT COUNT(*) AS transaction_count FROM accrual_accounts WHERE Currency = 'USD';"
+        ),
+        (
+            "What is the total transaction value per fiscal year?",
+            "SELECT Fiscal_Year_2, SUM(Transaction_Value) AS total_value FROM accrual_accounts "
+            "GROUP BY Fiscal_Year_2 ORDER BY Fiscal_Year_2;"
+        ),
+        (
+            "Which posting periods have the most items that are not cleared?",
+            "SELECT Posting_period_1, COUNT(*) AS open_items FROM accrual_accounts "
+            "WHERE Cleared_Item = 'Not Selected' GROUP BY Posting_period_1 ORDER BY open_items DESC;"
+        ),
+    )
+
+    def __init__(self, layout: Optional[str] = None,
+                 examples: Optional[Sequence[Tuple[str, str]]] = None):
+        """
+        Initialize the Query Handler.
+
+        Args:
+            layout: "inline" or "prefix" (defaults to PROMPT_LAYOUT, else "inline")
+            examples: (question, SQL) pairs shown in the prefix layout
+                (defaults to EXAMPLES)
+        """
+        self.layout = (layout or os.getenv('PROMPT_LAYOUT', 'inline')).lower()
+        if self.layout not in PROMPT_LAYOUTS:
+            raise ValueError(f"Unknown prompt layout '{self.layout}', expected one of {PROMPT_LAYOUTS}")
+
+        self.examples = tuple(self.EXAMPLES if examples is None else examples)
+        self._prefixes: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def uses_prefix(self) -> bool:
+        """True when prompts share a cacheable prefix, which needs the same schema for every question."""
+        return self.layout == "prefix"
 
-    def build_prompt(self, question: str, schema: str) -> Dict[str, str]:
+    def build_prompt(self, question: str, schema: str,
+                     schema_fingerprint: Optional[str] = None) -> Dict[str, str]:
         """
         Build a prompt for the LLM.
 
         Args:
             question: The user's natural language question
             schema: The database schema description
+            schema_fingerprint: Key of the schema, for reusing the assembled
+                prefix (derived from the schema when None)
 
         Returns:
-            Dictionary with 'system' and 'user' prompts
+            Dictionary with 'system' and 'user' prompts, plus a 'cache_key'
+            naming the shared prefix in the prefix layout
         """
+        if self.uses_prefix:
+            return self._prefixed(schema, schema_fingerprint,
+                                  self.PREFIX_QUESTION_TEMPLATE.format(question=question))
+
         user_prompt = self.USER_PROMPT_TEMPLATE.format(
             schema=schema,
             question=question
@@ -64,7 +151,8 @@ Generate a SQL query to answer this question. Remember to use only SELECT statem
         }
 
     def build_correction_prompt(self, original_question: str, schema: str,
-                                failed_sql: str, error_message: str) -> Dict[str, str]:
+                                failed_sql: str, error_message: str,
+                                schema_fingerprint: Optional[str] = None) -> Dict[str, str]:
         """
         Build a prompt for correcting a failed SQL query.
 
@@ -73,10 +161,19 @@ Generate a SQL query to answer this question. Remember to use only SELECT statem
             schema: The database schema description
             failed_sql: The SQL that failed
             error_message: The error message from validation/execution
+            schema_fingerprint: Key of the schema (see build_prompt())
 
         Returns:
-            Dictionary with 'system' and 'user' prompts
+            Dictionary with 'system' and 'user' prompts (and 'cache_key'
+            in the prefix layout)
         """
+        if self.uses_prefix:
+            return self._prefixed(schema, schema_fingerprint, self.PREFIX_CORRECTION_TEMPLATE.format(
+                question=original_question,
+                failed_sql=failed_sql,
+                error_message=error_message
+            ))
+
         correction_prompt = f"""Database Schema:
 {schema}
 
@@ -95,3 +192,45 @@ Please correct the SQL query to fix this error. Use only the column names from t
             "system": self.SYSTEM_PROMPT,
             "user": correction_prompt
         }
+
+    def _prefixed(self, schema: str, schema_fingerprint: Optional[str], user_prompt: str) -> Dict[str, str]:
+        """Put a user message after the shared prefix of a schema."""
+        key = schema_fingerprint or hashlib.sha256(schema.encode()).hexdigest()
+
+        return {
+            "system": self._prefix(schema, key),
+            "user": user_prompt,
+            "cache_key": f"sql-{key[:32]}"
+        }
+
+    def _prefix(self, schema: str, key: str) -> str:
+        """Get the prefix for a schema, assembling it on first use."""
+        with self._lock:
+            prefix = self._prefixes.get(key)
+            if prefix is not None:
+                self._prefixes.move_to_end(key)
+                return prefix
+
+        tables = set(re.findall(r'^Table name: (\S+)$', schema, flags=re.MULTILINE))
+        examples = "\n\n".join(
+            f"Question: {question}\n```sql\n{sql}\n```"
+            for question, sql in self.examples
+            if self._tables_of(sql) <= tables
+        )
+
+        prefix = self.PREFIX_TEMPLATE.format(
+            system=self.SYSTEM_PROMPT,
+            schema=schema,
+            examples=f"\nExamples:\n{examples}\n" if examples else ""
+        )
+
+        with self._lock:
+            self._prefixes[key] = prefix
+            while len(self._prefixes) > MAX_CACHED_PREFIXES:
+                self._prefixes.popitem(last=False)
+        return prefix
+
+    @staticmethod
+    def _tables_of(sql: str) -> set:
+        """Names of the tables an example query reads from."""
+        return set(re.findall(r'\b(?:FROM|JOIN)\s+"?(\w+)', sql, flags=re.IGNORECASE))
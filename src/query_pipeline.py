@@ -0,0 +1,531 @@
+"""
+Query Pipeline Module
+Turns a question into a query result: generate SQL, validate it, execute it
+and ask for a correction on failure, within an attempt budget and a deadline.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from candidate_selector import CandidateSelector
+from data_catalog import DataCatalog
+from data_loader import DataLoader
+from intent_matcher import IntentMatcher
+from llm_service import LLMService
+from query_cost import QueryCostEstimator, QueryCostGuard
+from query_engine import QueryEngine, QueryTimeoutError, SQLiteEngine, create_query_engine
+from query_handler import QueryHandler
+from question_index import QuestionIndex, QuestionMatch
+from response_cache import ResponseCache
+from result_cache import ResultCache
+from schema_selector import SchemaSelector
+from sql_validator import SQLValidator, StreamingSQLExtractor
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Tables loaded when DATA_TABLES is not set (name=path[#sheet]; ...)
+DEFAULT_TABLES = "accrual_accounts=Data Dump - Accrual Accounts.xlsx"
+
+
+@dataclass
+class Attempt:
+    """A query that was tried for a question and failed."""
+
+    sql: str
+    error: str
+    executed: bool = False  # Whether the query reached the engine (now or in an earlier run)
+
+
+@dataclass
+class PipelineResult:
+    """Outcome of answering one question."""
+
+    question: str
+    status: str = "failed"  # "ok" or "failed"
+    sql: Optional[str] = None
+    df: Optional[pd.DataFrame] = None
+    source: str = "llm"  # Where the first query came from: "intent", "cache", "similar" or "llm"
+    similar: Optional[QuestionMatch] = None
+    attempts: List[Attempt] = field(default_factory=list)  # Failed queries, in order
+    notes: List[str] = field(default_factory=list)  # Cost guard rewrites
+    error: Optional[str] = None
+    llm_response: Optional[str] = None
+    elapsed_seconds: float = 0.0
+    _finish: Optional[Callable[[], None]] = field(default=None, repr=False)
+
+    @property
+    def explanation(self) -> Optional[str]:
+        """The explanation part of the LLM response, if there is one."""
+        if self.llm_response and "Explanation:" in self.llm_response:
+            return self.llm_response.split("Explanation:")[1].strip()
+        return None
+
+    def finish(self) -> Optional[str]:
+        """
+        Read the rest of a streamed response and cache it.
+
+        Only needed after QueryPipeline.run() with wait_for_explanation=False;
+        calling it again has no effect.
+
+        Returns:
+            The explanation, if the response had one
+        """
+        if self._finish is not None:
+            finish, self._finish = self._finish, None
+            finish()
+        return self.explanation
+
+
+class FailedSQLCache:
+    """
+    Remembers queries that failed for a question, with their errors.
+
+    Entries are keyed on the normalized question, the normalized SQL and
+    the schema fingerprint, so a schema change gives every query a fresh
+    chance. The least recently used entries are dropped first.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of failures remembered
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    @staticmethod
+    def make_key(question: str, sql: str, schema_fingerprint: str) -> Tuple[str, str, str]:
+        """Build the key of a (question, SQL) pair."""
+        return (ResponseCache.normalize_question(question), ResultCache.normalize_sql(sql),
+                schema_fingerprint)
+
+    def get(self, question: str, sql: str, schema_fingerprint: str) -> Optional[str]:
+        """
+        Look up an earlier failure.
+
+        Args:
+            question: The user's question
+            sql: Query generated for it
+            schema_fingerprint: Fingerprint of the schema the query ran against
+
+        Returns:
+            The error the query failed with, or None when it has not failed
+        """
+        key = self.make_key(question, sql, schema_fingerprint)
+
+        with self._lock:
+            error = self._entries.get(key)
+            if error is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return error
+
+    def put(self, question: str, sql: str, schema_fingerprint: str, error: str) -> None:
+        """
+        Remember a failure.
+
+        Args:
+            question: The user's question
+            sql: Query that failed
+            schema_fingerprint: Fingerprint of the schema the query ran against
+            error: Why it failed
+        """
+        key = self.make_key(question, sql, schema_fingerprint)
+
+        with self._lock:
+            self._entries[key] = error
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Forget all failures."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+
+    def __len__(self) -> int:
+        """Number of remembered failures."""
+        return len(self._entries)
+
+
+class QueryPipeline:
+    """
+    Answers questions with the shared services of the app.
+
+    The first query comes from the intent matcher, the response cache, a
+    similar earlier question or the LLM, in that order. Each query is
+    validated, checked against the cost budget and executed; when any of
+    these fails, the LLM is asked for a corrected query with the error,
+    until a query succeeds, the attempt budget is spent or the deadline
+    passes. Queries that failed to execute are remembered per question and
+    never executed again.
+    """
+
+    def __init__(self, data_catalog, llm_service, query_engine: QueryEngine,
+                 query_handler: Optional[QueryHandler] = None,
+                 sql_validator: Optional[SQLValidator] = None,
+                 cost_guard: Optional[QueryCostGuard] = None,
+                 schema_selector: Optional[SchemaSelector] = None,
+                 intent_matcher: Optional[IntentMatcher] = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 question_index: Optional[QuestionIndex] = None,
+                 result_cache: Optional[ResultCache] = None,
+                 failed_sql_cache: Optional[FailedSQLCache] = None,
+                 candidate_selector: Optional[CandidateSelector] = None,
+                 candidates: Optional[int] = None,
+                 stream: Optional[bool] = None,
+                 max_attempts: Optional[int] = None,
+                 deadline: Optional[float] = None):
+        """
+        Initialize the pipeline.
+
+        Args:
+            data_catalog: DataLoader or DataCatalog whose data has been loaded
+            llm_service: LLMService (or any object with its generate methods)
+            query_engine: Engine holding the catalog's tables
+            query_handler: Prompt builder (created when None)
+            sql_validator: SQL validator (created when None)
+            cost_guard: Query cost guard (created from the catalog's profiles when None)
+            schema_selector: Picks the columns described per question (created when None)
+            intent_matcher: Answers common question patterns without the LLM
+            response_cache: Cache of LLM responses per question
+            question_index: Index of answered questions whose SQL can be reused
+            result_cache: Cache of query results
+            failed_sql_cache: Failed queries per question (created when None)
+            candidate_selector: Checks several candidates at once (created when
+                more than one candidate is requested)
+            candidates: SQL candidates requested per generation (defaults to
+                SQL_CANDIDATES; 1 disables)
+            stream: Stream the first response so its SQL runs before the
+                explanation is complete (defaults to STREAM_RESPONSES)
+            max_attempts: Queries tried per question, including corrections
+                (defaults to PIPELINE_MAX_ATTEMPTS)
+            deadline: Seconds a question may take in total (defaults to
+                PIPELINE_DEADLINE; 0 for no limit)
+        """
+        self.data_catalog = data_catalog
+        self.llm_service = llm_service
+        self.query_engine = query_engine
+        self.query_handler = query_handler or QueryHandler()
+        self.sql_validator = sql_validator or SQLValidator()
+        self.cost_guard = cost_guard or QueryCostGuard(
+            QueryCostEstimator(data_catalog.schema_profiles)
+        )
+        self.schema_selector = schema_selector or SchemaSelector()
+        self.intent_matcher = intent_matcher
+        self.response_cache = response_cache
+        self.question_index = question_index
+        self.result_cache = result_cache
+        self.failed_sql_cache = failed_sql_cache or FailedSQLCache(
+            int(os.getenv('FAILED_SQL_CACHE_SIZE', '1024'))
+        )
+        self.candidates = candidates or int(os.getenv('SQL_CANDIDATES', '1'))
+        self.candidate_selector = candidate_selector
+        if self.candidate_selector is None and self.candidates > 1:
+            self.candidate_selector = CandidateSelector(self.sql_validator, query_engine, self.cost_guard)
+        self.stream = stream if stream is not None else \
+            os.getenv('STREAM_RESPONSES', 'true').lower() == 'true'
+        self.max_attempts = max_attempts or int(os.getenv('PIPELINE_MAX_ATTEMPTS', '3'))
+        self.deadline = deadline if deadline is not None else float(os.getenv('PIPELINE_DEADLINE', '90'))
+
+    def run(self, question: str, wait_for_explanation: bool = True) -> PipelineResult:
+        """
+        Answer a question.
+
+        Args:
+            question: User's natural language question
+            wait_for_explanation: Read a streamed response to the end before
+                returning; when False the result's finish() does that, so
+                the result can be shown first
+
+        Returns:
+            The result, with status "ok" and the data, or "failed" and the
+            error of the last query tried
+
+        Raises:
+            Exception: If the LLM could not be reached
+        """
+        start = time.perf_counter()
+        deadline = time.monotonic() + self.deadline if self.deadline and self.deadline > 0 else None
+        result = PipelineResult(question=question)
+
+        profiles = self.data_catalog.schema_profiles
+        fingerprint = self.data_catalog.schema_fingerprint
+        cache_args = (question, fingerprint, self.llm_service.model, self.llm_service.temperature)
+
+        def describe(failed_sql: Optional[str] = None) -> str:
+            if self.query_handler.uses_prefix:
+                # The full schema is part of the cacheable prefix shared by all questions
+                return self.data_catalog.get_schema_description()
+            return self.schema_selector.describe(question, profiles, failed_sql=failed_sql)
+
+        stream = None
+        extractor = None
+        sql, error = self._reuse(question, fingerprint, cache_args, result)
+
+        try:
+            if sql is None:
+                prompts = self.query_handler.build_prompt(question, describe(), fingerprint)
+                if self.stream and self.candidates <= 1:
+                    # Execution starts as soon as the SQL block closes
+                    stream = self.llm_service.stream_sql_with_retry(prompts)
+                    extractor = StreamingSQLExtractor(self.sql_validator)
+                    sql = extractor.read_sql(stream)
+                else:
+                    sql, error = self._generate(prompts, result)
+
+            while True:
+                failed = Attempt(sql=sql, error=error) if error is not None else \
+                    self._attempt(question, sql, fingerprint, deadline, result)
+                if failed is None:
+                    break
+
+                error = failed.error
+                result.attempts.append(failed)
+                logger.info(f"Attempt {len(result.attempts)} failed: {error}")
+
+                if len(result.attempts) >= self.max_attempts:
+                    result.error = f"No working query after {len(result.attempts)} attempts: {error}"
+                    break
+                if deadline is not None and time.monotonic() >= deadline:
+                    result.error = f"No working query within {self.deadline:g} seconds: {error}"
+                    break
+
+                if stream is not None:
+                    stream.close()
+                    stream = None
+
+                correction_prompts = self.query_handler.build_correction_prompt(
+                    question, describe(sql), sql, error, fingerprint
+                )
+                result.source, result.similar = "llm", None
+                sql, error = self._generate(correction_prompts, result)
+
+        except BaseException:
+            if stream is not None:
+                stream.close()
+            raise
+
+        if result.status == "ok" and result.source in ("llm", "cache") and self.question_index is not None:
+            # Only SQL that ran successfully is offered for reuse
+            self.question_index.add(question, result.sql, fingerprint)
+
+        if result.status != "ok" and stream is not None:
+            stream.close()
+            stream = None
+
+        def finish() -> None:
+            if stream is not None:
+                result.llm_response = extractor.drain(stream)
+            if result.status == "ok" and result.source == "llm" and result.llm_response \
+                    and self.response_cache is not None:
+                self.response_cache.put(*cache_args, result.llm_response)
+
+        result._finish = finish
+        if wait_for_explanation:
+            result.finish()
+
+        result.elapsed_seconds = round(time.perf_counter() - start, 4)
+        return result
+
+    def close(self) -> None:
+        """Stop watching the data and release the candidate checks and the query engine."""
+        if hasattr(self.data_catalog, 'stop_watching'):
+            self.data_catalog.stop_watching()
+        if self.candidate_selector is not None:
+            self.candidate_selector.close()
+        self.query_engine.close()
+
+    def _reuse(self, question: str, fingerprint: str, cache_args: Tuple,
+               result: PipelineResult) -> Tuple[Optional[str], Optional[str]]:
+        """Find a query without generating one: a matched pattern, a cached response or a similar question."""
+        match = self.intent_matcher.match(question) if self.intent_matcher is not None else None
+        if match is not None:
+            result.source = "intent"
+            return match.sql, None
+
+        if self.response_cache is not None:
+            llm_response = self.response_cache.get(*cache_args)
+            if llm_response is not None:
+                result.source, result.llm_response = "cache", llm_response
+                return self.sql_validator.extract_sql_from_response(llm_response), None
+
+        if self.question_index is not None:
+            similar = self.question_index.best_match(question, fingerprint)
+            if similar is not None:
+                result.source, result.similar = "similar", similar
+                return similar.sql, None
+
+        return None, None
+
+    def _generate(self, prompts: Dict[str, str], result: PipelineResult) -> Tuple[str, Optional[str]]:
+        """
+        Ask the LLM for a query.
+
+        Returns:
+            Tuple of (sql, error). The error is set when several candidates
+            were requested and none of them passed its checks.
+        """
+        if self.candidate_selector is None or self.candidates <= 1:
+            result.llm_response = self.llm_service.generate_sql_with_retry(prompts)
+            return self.sql_validator.extract_sql_from_response(result.llm_response), None
+
+        responses = self.llm_service.generate_candidates(prompts, self.candidates)
+        candidates = [self.sql_validator.extract_sql_from_response(r) for r in responses]
+        selection = self.candidate_selector.select(candidates)
+        if selection.found:
+            result.llm_response = responses[selection.index]
+            return candidates[selection.index], None
+
+        index, error = selection.first_error()
+        result.llm_response = responses[index]
+        return candidates[index], error
+
+    def _attempt(self, question: str, sql: str, fingerprint: str, deadline: Optional[float],
+                 result: PipelineResult) -> Optional[Attempt]:
+        """
+        Validate and execute one query, storing the data in the result on success.
+
+        Returns:
+            None on success, otherwise the failed attempt
+        """
+        known_error = self.failed_sql_cache.get(question, sql, fingerprint)
+        if known_error is not None:
+            return Attempt(sql=sql, error=f"This query already failed: {known_error}", executed=True)
+
+        is_valid, error_message = self.sql_validator.validate(sql)
+        if not is_valid:
+            return Attempt(sql=sql, error=error_message)
+
+        is_allowed, guarded_sql, message = self.cost_guard.check(sql)
+        if not is_allowed:
+            return Attempt(sql=sql, error=message)
+        if message:
+            result.notes.append(message)
+
+        data_fingerprint = self.data_catalog.data_fingerprint
+        result_df = self.result_cache.get(guarded_sql, data_fingerprint) if self.result_cache is not None else None
+
+        if result_df is None:
+            timeout, cut_by_deadline = self._execution_budget(deadline)
+            try:
+                result_df = self.query_engine.execute(guarded_sql, timeout=timeout)
+            except QueryTimeoutError as e:
+                # A query stopped early by the deadline may still be fine
+                if not cut_by_deadline:
+                    self.failed_sql_cache.put(question, sql, fingerprint, str(e))
+                return Attempt(sql=sql, error=str(e), executed=True)
+            except Exception as e:
+                error = f"Query execution error: {str(e)}"
+                self.failed_sql_cache.put(question, sql, fingerprint, error)
+                return Attempt(sql=sql, error=error, executed=True)
+
+            if self.result_cache is not None:
+                self.result_cache.put(guarded_sql, data_fingerprint, result_df)
+
+        result.status, result.sql, result.df, result.error = "ok", guarded_sql, result_df, None
+        return None
+
+    def _execution_budget(self, deadline: Optional[float]) -> Tuple[Optional[float], bool]:
+        """Get the time budget for a query, and whether the deadline shortened it."""
+        engine_budget = self.query_engine.timeout if self.query_engine.timeout else None
+        if deadline is None:
+            return engine_budget, False
+
+        remaining = max(deadline - time.monotonic(), 0.001)
+        if engine_budget is None or remaining < engine_budget:
+            return remaining, True
+        return engine_budget, False
+
+
+def create_pipeline(tables: Optional[str] = None, llm_service=None, **kwargs) -> QueryPipeline:
+    """
+    Load the configured tables and build a pipeline with the configured services.
+
+    The engine, cost statistics, intents and cached results follow reloaded
+    data, and updated workbooks are picked up when DATA_WATCH_INTERVAL is set.
+
+    Args:
+        tables: Tables to load as name=path[#sheet]; ... (defaults to
+            DATA_TABLES, or the accrual accounts workbook)
+        llm_service: Service the SQL is generated with (an LLMService when None)
+        **kwargs: Passed through to the QueryPipeline constructor
+
+    Returns:
+        Pipeline over the loaded tables
+    """
+    streaming = os.getenv('DATA_STREAMING', 'false').lower() == 'true'
+    data_catalog = DataCatalog.from_spec(
+        tables or os.getenv('DATA_TABLES') or DEFAULT_TABLES,
+        cache_dir=os.getenv('DATA_CACHE_DIR', '.cache')
+    )
+    if streaming:
+        # Workbooks too large for memory go straight into a SQLite store
+        query_engine = SQLiteEngine(database_path=os.getenv('DATA_STORE_PATH') or None)
+        data_catalog.load_streaming(query_engine)
+    else:
+        data_catalog.load_data()
+        query_engine = create_query_engine(data_catalog)
+
+    response_cache = ResponseCache(
+        max_entries=int(os.getenv('RESPONSE_CACHE_SIZE', '512')),
+        ttl_seconds=float(os.getenv('RESPONSE_CACHE_TTL', '3600')),
+        db_path=os.getenv('RESPONSE_CACHE_PATH') or None
+    )
+    question_index = QuestionIndex(
+        threshold=float(os.getenv('SIMILARITY_THRESHOLD', '0.65'))
+    )
+    result_cache = ResultCache(
+        max_bytes=int(float(os.getenv('RESULT_CACHE_MAX_MB', '64')) * 1024 * 1024)
+    )
+    cost_estimator = QueryCostEstimator(data_catalog.schema_profiles)
+    intent_matcher = None
+    if os.getenv('INTENT_MATCHING', 'true').lower() == 'true':
+        intent_matcher = IntentMatcher(data_catalog.schema_profiles)
+
+    # Keep the engine, cost statistics and cached results in step with reloaded data
+    def on_reload(loader: DataLoader) -> None:
+        if loader.last_changes is not None:
+            # Refreshed workbook: write only the changed rows
+            query_engine.apply_changes(loader.table_name, loader.df, loader.last_changes)
+        elif loader.df is not None:  # Streamed data is already in the store
+            query_engine.load_table(loader.table_name, loader.df)
+        cost_estimator.add_profile(loader.schema_profile)
+        if intent_matcher is not None:
+            intent_matcher.add_profile(loader.schema_profile)
+        result_cache.invalidate(keep_fingerprint=data_catalog.data_fingerprint)
+
+    data_catalog.add_reload_listener(on_reload)
+
+    # Pick up updated workbooks without a restart
+    watch_interval = float(os.getenv('DATA_WATCH_INTERVAL', '0'))
+    if watch_interval > 0 and not streaming:
+        data_catalog.start_watching(watch_interval)
+
+    return QueryPipeline(
+        data_catalog, llm_service or LLMService(), query_engine,
+        cost_guard=QueryCostGuard(cost_estimator),
+        intent_matcher=intent_matcher,
+        response_cache=response_cache,
+        question_index=question_index,
+        result_cache=result_cache,
+        **kwargs
+    )
@@ -0,0 +1,271 @@
+"""
+Question Index Module
+Finds previously answered questions that are near-duplicates of a new one.
+"""
+
+import logging
+import re
+import threading
+import zlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Words that carry no meaning for deciding whether two questions differ
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'by', 'do', 'does', 'for', 'from', 'give', 'how',
+    'in', 'is', 'list', 'me', 'of', 'on', 'show', 'the', 'there', 'to', 'what',
+    'which', 'with'
+}
+
+# Phrases that ask for the same thing, rewritten to one canonical word so
+# paraphrases share n-grams and pass the operator-word check. Plural row
+# nouns are counted entities; singular ones usually name a column
+# ("transaction value") and are left alone.
+SYNONYMS = [
+    (r'\b(?:how many|(?:total )?number of|count of)\b', 'count'),
+    (r'\b(?:avg|mean)\b', 'average'),
+    (r'\b(?:sum of|total)\b', 'sum'),
+    (r'\b(?:maximum|highest|largest|biggest)\b', 'max'),
+    (r'\b(?:minimum|lowest|smallest)\b', 'min'),
+    (r'\bunique\b', 'distinct'),
+    (r'\b(?:records|entries|transactions|lines|items)\b', 'rows'),
+]
+
+# Words that change which aggregation or ordering the SQL must use
+OPERATOR_WORDS = {
+    'average', 'avg', 'biggest', 'bottom', 'count', 'distinct', 'first', 'highest',
+    'largest', 'last', 'least', 'lowest', 'max', 'maximum', 'mean', 'median', 'min',
+    'minimum', 'most', 'number', 'smallest', 'sum', 'top', 'total', 'unique'
+}
+
+
+@dataclass(frozen=True)
+class QuestionMatch:
+    """A previously answered question similar to the one being asked."""
+
+    question: str
+    sql: str
+    score: float
+
+
+class QuestionIndex:
+    """
+    Offline similarity index over answered questions.
+
+    Questions are embedded as TF-IDF weighted character n-grams, hashed into
+    a fixed number of features so the index can grow one question at a time
+    without refitting a vocabulary. Search is a vectorized cosine similarity
+    over all stored questions.
+    """
+
+    def __init__(self, threshold: float = 0.65, ngram_sizes: Tuple[int, ...] = (3, 4),
+                 n_features: int = 1 << 16):
+        """
+        Initialize an empty index.
+
+        Args:
+            threshold: Minimum cosine similarity for best_match() to reuse SQL
+            ngram_sizes: Character n-gram lengths to extract
+            n_features: Size of the hashed feature space
+        """
+        self.threshold = threshold
+        self.ngram_sizes = ngram_sizes
+        self.n_features = n_features
+
+        self._lock = threading.Lock()
+        self._questions: List[str] = []
+        self._sql: List[str] = []
+        self._fingerprints: List[str] = []
+        self._positions: Dict[Tuple[str, str], int] = {}
+
+        # Per-question sparse term counts, flattened lazily for search
+        self._doc_features: List[np.ndarray] = []
+        self._doc_counts: List[np.ndarray] = []
+        self._doc_freq = np.zeros(n_features, dtype=np.float64)
+        self._flat: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return len(self._questions)
+
+    @staticmethod
+    def normalize(question: str) -> str:
+        """Lowercase a question and reduce it to words separated by single spaces."""
+        return " ".join(re.findall(r'[a-z0-9_]+', question.lower()))
+
+    @classmethod
+    def canonicalize(cls, question: str) -> str:
+        """
+        Reduce a question to its content words, with synonyms rewritten.
+
+        "How many transactions are in USD?" and "count of USD rows" both
+        become sets of the words count, rows and usd.
+        """
+        text = cls.normalize(question)
+        for pattern, canonical in SYNONYMS:
+            text = re.sub(pattern, canonical, text)
+        return " ".join(word for word in text.split() if word not in STOPWORDS)
+
+    def _vectorize(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Hash the character n-grams of a canonical question.
+
+        Words are sorted first, so the score does not depend on word order.
+
+        Returns:
+            Tuple of (feature indices, sublinear term frequencies)
+        """
+        padded = f" {' '.join(sorted(text.split()))} "
+        grams = [
+            padded[i:i + n]
+            for n in self.ngram_sizes
+            for i in range(len(padded) - n + 1)
+        ]
+        hashed = np.fromiter(
+            (zlib.crc32(g.encode()) % self.n_features for g in grams),
+            dtype=np.int64,
+            count=len(grams)
+        )
+        features, counts = np.unique(hashed, return_counts=True)
+        return features, 1.0 + np.log(counts)
+
+    def add(self, question: str, sql: str, schema_fingerprint: str = "") -> None:
+        """
+        Add a question whose SQL passed validation.
+
+        Adding the same question again for the same schema replaces its SQL.
+
+        Args:
+            question: The user's question
+            sql: The validated SQL that answered it
+            schema_fingerprint: Fingerprint of the schema the SQL was written for
+        """
+        text = self.canonicalize(question)
+        if not text:
+            return
+
+        key = (text, schema_fingerprint)
+
+        with self._lock:
+            if key in self._positions:
+                self._sql[self._positions[key]] = sql
+                return
+
+            features, counts = self._vectorize(text)
+
+            self._positions[key] = len(self._questions)
+            self._questions.append(question)
+            self._sql.append(sql)
+            self._fingerprints.append(schema_fingerprint)
+            self._doc_features.append(features)
+            self._doc_counts.append(counts)
+            self._doc_freq[features] += 1
+            self._flat = None
+
+    def _flatten(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Concatenate per-question vectors into flat arrays (cached until the next add)."""
+        if self._flat is None:
+            lengths = [len(f) for f in self._doc_features]
+            self._flat = (
+                np.repeat(np.arange(len(lengths)), lengths),
+                np.concatenate(self._doc_features),
+                np.concatenate(self._doc_counts)
+            )
+        return self._flat
+
+    def search(self, question: str, schema_fingerprint: Optional[str] = None,
+               k: int = 5) -> List[QuestionMatch]:
+        """
+        Find the stored questions most similar to a question.
+
+        Args:
+            question: The question to look up
+            schema_fingerprint: Only consider questions answered for this schema
+            k: Maximum number of matches to return
+
+        Returns:
+            Matches ordered by decreasing cosine similarity
+        """
+        text = self.canonicalize(question)
+
+        with self._lock:
+            if not text or not self._questions:
+                return []
+
+            rows, features, counts = self._flatten()
+            n_docs = len(self._questions)
+
+            idf = np.log((1 + n_docs) / (1 + self._doc_freq)) + 1.0
+            weights = counts * idf[features]
+            doc_norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=n_docs))
+
+            query_features, query_counts = self._vectorize(text)
+            query = np.zeros(self.n_features)
+            query[query_features] = query_counts * idf[query_features]
+            query_norm = np.linalg.norm(query)
+
+            dots = np.bincount(rows, weights=weights * query[features], minlength=n_docs)
+            scores = dots / (doc_norms * query_norm)
+
+            if schema_fingerprint is not None:
+                scores[np.asarray(self._fingerprints) != schema_fingerprint] = -1.0
+
+            k = min(k, n_docs)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+
+            return [
+                QuestionMatch(self._questions[i], self._sql[i], float(scores[i]))
+                for i in top
+                if scores[i] > 0
+            ]
+
+    def best_match(self, question: str, schema_fingerprint: Optional[str] = None) -> Optional[QuestionMatch]:
+        """
+        Find a stored question close enough to reuse its SQL.
+
+        A candidate above the threshold is still rejected when the two
+        questions differ in a number, an aggregation word, or a value the
+        stored SQL depends on (e.g. "USD" vs "CAD"), since the SQL would then
+        answer a different question.
+
+        Args:
+            question: The question to look up
+            schema_fingerprint: Only consider questions answered for this schema
+
+        Returns:
+            The reusable match, or None
+        """
+        for match in self.search(question, schema_fingerprint, k=3):
+            if match.score < self.threshold:
+                break
+            if not self._answers_differ(question, match):
+                return match
+        return None
+
+    def _answers_differ(self, question: str, match: QuestionMatch) -> bool:
+        """
+        Check whether two questions differ in something the SQL depends on.
+
+        A word only the stored question has matters if the SQL uses it; a
+        word only the new question has matters unless the SQL already uses it.
+        """
+        new_words = self._content_words(question)
+        old_words = self._content_words(match.question)
+        sql_words = set(re.findall(r'[a-z0-9]+', match.sql.lower().replace('_', ' ')))
+
+        for word in new_words ^ old_words:
+            if word.isdigit() or word in OPERATOR_WORDS:
+                return True
+            if (word in old_words) == (word in sql_words):
+                return True
+        return False
+
+    def _content_words(self, question: str) -> Set[str]:
+        """Get the meaningful words of a question, with synonyms rewritten."""
+        return set(self.canonicalize(question).split())
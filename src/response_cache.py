@@ -0,0 +1,206 @@
+"""
+Response Cache Module
+Caches LLM responses for repeated questions so they skip the API round-trip.
+"""
+
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    LRU cache of LLM responses with a time-to-live.
+
+    Entries are keyed on the normalized question, the schema fingerprint,
+    the model and the temperature, so a response is only reused when the
+    LLM would have been asked exactly the same thing. An optional SQLite
+    file keeps entries across restarts.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 3600,
+                 db_path: Optional[str] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of entries kept in memory
+            ttl_seconds: Age after which an entry is no longer served
+            db_path: SQLite file for persistence (memory only when None)
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "DELETE FROM responses WHERE created_at < ?",
+                (time.time() - self.ttl_seconds,)
+            )
+            self._db.commit()
+            logger.info(f"Response cache persisted to {db_path}")
+
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        """
+        Normalize a question so trivial variations share a cache entry.
+
+        Args:
+            question: The user's question
+
+        Returns:
+            Lowercased question with collapsed whitespace and no trailing punctuation
+        """
+        normalized = re.sub(r'\s+', ' ', question.strip().lower())
+        return normalized.rstrip('?.! ')
+
+    def make_key(self, question: str, schema_fingerprint: str,
+                 model: str, temperature: float) -> str:
+        """
+        Build the cache key for a request.
+
+        Args:
+            question: The user's question
+            schema_fingerprint: Fingerprint of the schema shown to the LLM
+            model: Model name
+            temperature: Sampling temperature
+
+        Returns:
+            Hex digest identifying the request
+        """
+        parts = [self.normalize_question(question), schema_fingerprint, model, repr(float(temperature))]
+        return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+    def get(self, question: str, schema_fingerprint: str,
+            model: str, temperature: float) -> Optional[str]:
+        """
+        Look up a cached response.
+
+        Args:
+            question: The user's question
+            schema_fingerprint: Fingerprint of the schema shown to the LLM
+            model: Model name
+            temperature: Sampling temperature
+
+        Returns:
+            Cached response, or None on a miss
+        """
+        key = self.make_key(question, schema_fingerprint, model, temperature)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    entry = (row[0], row[1])
+                    self._remember(key, entry)
+
+            if entry is not None and now - entry[1] > self.ttl_seconds:
+                self._forget(key)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, question: str, schema_fingerprint: str, model: str,
+            temperature: float, response: str) -> None:
+        """
+        Store a response.
+
+        Args:
+            question: The user's question
+            schema_fingerprint: Fingerprint of the schema shown to the LLM
+            model: Model name
+            temperature: Sampling temperature
+            response: The LLM response to cache
+        """
+        key = self.make_key(question, schema_fingerprint, model, temperature)
+        entry = (response, time.time())
+
+        with self._lock:
+            self._remember(key, entry)
+
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, created_at) VALUES (?, ?, ?)",
+                    (key, entry[0], entry[1])
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, entry: Tuple[str, float]) -> None:
+        """Insert an entry in memory, evicting the least recently used ones."""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _forget(self, key: str) -> None:
+        """Remove an entry from memory and disk."""
+        self._entries.pop(key, None)
+
+        if self._db is not None:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._db.commit()
+
+    def clear(self) -> None:
+        """Remove all entries and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self) -> Dict:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dictionary with hits, misses, hit rate and current size
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries)
+            }
+
+    def close(self) -> None:
+        """Close the persistence backend, if any."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,163 @@
+"""
+Result Cache Module
+Caches query result frames so repeated SQL skips the execution engine.
+"""
+
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """
+    LRU cache of query results bounded by memory size.
+
+    Entries are keyed on the normalized SQL text and the fingerprint of the
+    data it ran against, so a result is only reused while the loaded data is
+    unchanged. The total size of the cached frames (deep memory usage) is
+    kept under max_bytes by evicting the least recently used results.
+    """
+
+    # String literals and quoted identifiers, whose whitespace must be kept
+    _QUOTED = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            max_bytes: Maximum total size of cached result frames
+        """
+        if max_bytes < 1:
+            raise ValueError("max_bytes must be at least 1")
+
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[pd.DataFrame, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def normalize_sql(cls, sql: str) -> str:
+        """
+        Normalize SQL so formatting differences share a cache entry.
+
+        Whitespace runs outside quotes are collapsed and a trailing semicolon
+        is dropped. Case is kept, since it is significant inside literals.
+
+        Args:
+            sql: Validated SQL query
+
+        Returns:
+            Normalized SQL text
+        """
+        parts = cls._QUOTED.split(sql.strip().rstrip(';').strip())
+        for i in range(0, len(parts), 2):
+            parts[i] = re.sub(r'\s+', ' ', parts[i])
+        return ''.join(parts).strip()
+
+    def get(self, sql: str, data_fingerprint: str) -> Optional[pd.DataFrame]:
+        """
+        Look up the result of a query.
+
+        Args:
+            sql: Validated SQL query
+            data_fingerprint: Fingerprint of the currently loaded data
+
+        Returns:
+            Cached result frame, or None on a miss
+        """
+        key = (self.normalize_sql(sql), data_fingerprint)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, sql: str, data_fingerprint: str, result: pd.DataFrame) -> None:
+        """
+        Store the result of a query.
+
+        Results larger than the whole cache are not stored. Callers must
+        not modify a frame after storing it, or one returned by get().
+
+        Args:
+            sql: Validated SQL query
+            data_fingerprint: Fingerprint of the data the query ran against
+            result: Result frame
+        """
+        key = (self.normalize_sql(sql), data_fingerprint)
+        size = int(result.memory_usage(index=True, deep=True).sum())
+
+        if size > self.max_bytes:
+            logger.info(f"Result of {size} bytes exceeds cache size, not cached")
+            return
+
+        with self._lock:
+            self._forget(key)
+            while self._entries and self.size_bytes + size > self.max_bytes:
+                self._forget(next(iter(self._entries)))
+            self._entries[key] = (result, size)
+            self.size_bytes += size
+
+    def _forget(self, key: Tuple[str, str]) -> None:
+        """Remove an entry (lock must be held)."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size_bytes -= entry[1]
+
+    def invalidate(self, keep_fingerprint: Optional[str] = None) -> int:
+        """
+        Drop cached results, e.g. after new data has been loaded.
+
+        Args:
+            keep_fingerprint: Keep results computed against this data fingerprint
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            stale = [key for key in self._entries if key[1] != keep_fingerprint]
+            for key in stale:
+                self._forget(key)
+
+        if stale:
+            logger.info(f"Invalidated {len(stale)} cached results")
+        return len(stale)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        self.invalidate()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dictionary with hits, misses, hit rate, entry count and size in bytes
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'size': len(self._entries),
+                'size_bytes': self.size_bytes,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
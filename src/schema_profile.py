@@ -0,0 +1,375 @@
+"""
+Schema Profile Module
+Precomputes the per-column statistics used to describe a table to the LLM.
+"""
+
+import hashlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from table_diff import column_hashes
+
+
+# Bump when the profile contents or description format change, so that
+# fingerprints computed by older code are never mistaken for current ones
+PROFILE_VERSION = 1
+
+# Number of distinct example values shown per column
+SAMPLE_VALUES = 3
+
+# Columns with at most this many distinct values keep all of them, so a
+# question can be matched against every value (e.g. each currency code)
+KNOWN_VALUES_MAX = 50
+
+
+@dataclass(frozen=True)
+class ColumnProfile:
+    """Statistics for a single column."""
+
+    name: str
+    dtype: str
+    sample_values: List[str]
+    null_count: int
+    distinct_count: int
+    known_values: Tuple[str, ...] = field(default=(), repr=False)  # Not part of the description
+
+    def describe(self, row_count: int) -> str:
+        """
+        Render the column as one line of the schema description.
+
+        Args:
+            row_count: Number of rows in the table, for the null percentage
+
+        Returns:
+            Description line for this column
+        """
+        null_pct = (self.null_count / row_count) * 100 if row_count else 0.0
+        sample_str = ", ".join(self.sample_values)
+
+        return (
+            f"  - {self.name} ({self.dtype})"
+            f" | Sample values: [{sample_str}]"
+            f" | Nulls: {self.null_count} ({null_pct:.1f}%)"
+        )
+
+
+@dataclass(frozen=True)
+class SchemaProfile:
+    """
+    Profile of a loaded table, computed once per load.
+
+    The description is rendered up front and the fingerprint is derived from
+    it, so two profiles share a fingerprint exactly when the LLM would see
+    the same schema text.
+    """
+
+    table_name: str
+    row_count: int
+    columns: List[ColumnProfile]
+    description: str = field(repr=False)
+    fingerprint: str
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame, table_name: str) -> "SchemaProfile":
+        """
+        Profile every column of a DataFrame.
+
+        Args:
+            df: The loaded data
+            table_name: Name the table is queried by
+
+        Returns:
+            Profile of the table
+        """
+        columns = []
+
+        for col in df.columns:
+            series = df[col]
+            non_null = series.dropna()
+
+            # Get sample values (non-null)
+            unique = non_null.unique()
+            sample_values = [str(v) for v in unique[:SAMPLE_VALUES]]
+
+            columns.append(ColumnProfile(
+                name=str(col),
+                dtype=str(series.dtype),
+                sample_values=sample_values,
+                null_count=int(len(series) - len(non_null)),
+                distinct_count=len(unique),
+                known_values=cls._known_values(unique)
+            ))
+
+        description = cls._render(table_name, len(df), columns)
+
+        return cls(
+            table_name=table_name,
+            row_count=len(df),
+            columns=columns,
+            description=description,
+            fingerprint=cls._fingerprint(description)
+        )
+
+    def updated(self, df: pd.DataFrame, removed: pd.DataFrame, added: pd.DataFrame) -> "SchemaProfile":
+        """
+        Profile a new version of the table from this profile and the changed rows.
+
+        Null counts are adjusted by the removed and added rows. Distinct
+        counts are only recomputed for columns whose values changed, so the
+        result equals from_dataframe(df) without rescanning unchanged columns.
+
+        Args:
+            df: New version of the table, with the same columns
+            removed: Rows of the old version that were deleted or replaced
+            added: Rows of the new version that were inserted or replaced them
+
+        Returns:
+            Profile of the new version
+        """
+        columns = []
+
+        for column in self.columns:
+            series = df[column.name]
+            gone, new = removed[column.name], added[column.name]
+
+            unchanged = str(series.dtype) == column.dtype and np.array_equal(
+                np.sort(column_hashes(gone)), np.sort(column_hashes(new))
+            )
+            if unchanged:
+                distinct_count, known_values = column.distinct_count, column.known_values
+            else:
+                unique = series.dropna().unique()
+                distinct_count, known_values = len(unique), self._known_values(unique)
+
+            columns.append(ColumnProfile(
+                name=column.name,
+                dtype=str(series.dtype),
+                sample_values=[str(v) for v in self._first_unique(series)],
+                null_count=column.null_count - int(gone.isna().sum()) + int(new.isna().sum()),
+                distinct_count=distinct_count,
+                known_values=known_values
+            ))
+
+        description = self._render(self.table_name, len(df), columns)
+
+        return SchemaProfile(
+            table_name=self.table_name,
+            row_count=len(df),
+            columns=columns,
+            description=description,
+            fingerprint=self._fingerprint(description)
+        )
+
+    @staticmethod
+    def _first_unique(series: pd.Series) -> list:
+        """Get the first SAMPLE_VALUES distinct non-null values, reading as few rows as possible."""
+        size = SAMPLE_VALUES * 16
+        while True:
+            values = series.iloc[:size].dropna().unique()
+            if len(values) >= SAMPLE_VALUES or size >= len(series):
+                return list(values[:SAMPLE_VALUES])
+            size *= 16
+
+    @staticmethod
+    def _known_values(unique) -> Tuple[str, ...]:
+        """Keep every distinct value of a low-cardinality column, as sorted strings."""
+        if len(unique) > KNOWN_VALUES_MAX:
+            return ()
+        return tuple(sorted({str(v) for v in unique}))
+
+    def describe_columns(self, names: Sequence[str], list_omitted: bool = True) -> str:
+        """
+        Render the schema description with only some of the columns.
+
+        Args:
+            names: Columns to describe; the table's column order is kept
+            list_omitted: Name the other columns on one line (otherwise
+                only their number is given)
+
+        Returns:
+            Schema description of the selected columns
+        """
+        selected = set(names)
+        columns = [column for column in self.columns if column.name in selected]
+        omitted = [column.name for column in self.columns if column.name not in selected]
+
+        note = None
+        if omitted:
+            note = (f"  (Other columns: {', '.join(omitted)})" if list_omitted
+                    else f"  ({len(omitted)} other columns not shown)")
+
+        return self._render(self.table_name, self.row_count, columns, note)
+
+    @staticmethod
+    def _render(table_name: str, row_count: int, columns: List[ColumnProfile],
+                note: Optional[str] = None) -> str:
+        """Render the natural language schema description."""
+        schema_parts = []
+        schema_parts.append(f"Table name: {table_name}")
+        schema_parts.append("\nColumns:")
+
+        for column in columns:
+            schema_parts.append(column.describe(row_count))
+
+        if note:
+            schema_parts.append(note)
+
+        schema_parts.append(f"\nTotal rows: {row_count}")
+
+        return "\n".join(schema_parts)
+
+    @staticmethod
+    def _fingerprint(description: str) -> str:
+        """Hash the profile version and description into a stable key."""
+        digest = hashlib.sha256(f"v{PROFILE_VERSION}\n".encode())
+        digest.update(description.encode())
+        return digest.hexdigest()
+
+    def get_column(self, name: str) -> ColumnProfile:
+        """
+        Look up a column profile by name.
+
+        Args:
+            name: Column name
+
+        Returns:
+            Profile of the column
+
+        Raises:
+            KeyError: If the table has no such column
+        """
+        for column in self.columns:
+            if column.name == name:
+                return column
+        raise KeyError(name)
+
+
+class SchemaProfileBuilder:
+    """
+    Builds a SchemaProfile from data that arrives in chunks.
+
+    Only per-column counters, the first few distinct values and the values
+    of low-cardinality columns are kept, so memory does not grow with the
+    number of rows. Distinct counts need the
+    whole column; the caller supplies them once every chunk has been seen,
+    usually by asking the store the chunks were written to.
+    """
+
+    def __init__(self, table_name: str):
+        """
+        Initialize an empty builder.
+
+        Args:
+            table_name: Name the table is queried by
+        """
+        self.table_name = table_name
+        self.row_count = 0
+        self.columns: List[str] = []
+        self._dtypes: Dict[str, Optional[np.dtype]] = {}
+        self._null_counts: Dict[str, int] = {}
+        self._samples: Dict[str, list] = {}
+        self._known: Dict[str, Optional[set]] = {}
+
+    def add_chunk(self, df: pd.DataFrame) -> None:
+        """
+        Account for the next chunk of rows.
+
+        Args:
+            df: Chunk with the same columns as the previous ones
+        """
+        if not self.columns:
+            self.columns = [str(col) for col in df.columns]
+            self._dtypes = {col: None for col in self.columns}
+            self._null_counts = {col: 0 for col in self.columns}
+            self._samples = {col: [] for col in self.columns}
+            self._known = {col: set() for col in self.columns}
+
+        self.row_count += len(df)
+
+        for col, name in zip(df.columns, self.columns):
+            series = df[col]
+            non_null = series.dropna()
+            self._null_counts[name] += len(series) - len(non_null)
+
+            # All-null chunks say nothing about the column's type
+            if not non_null.empty:
+                self._dtypes[name] = self._merge_dtypes(self._dtypes[name], series.dtype)
+
+            samples = self._samples[name]
+            for value in non_null.unique()[:SAMPLE_VALUES]:
+                if len(samples) == SAMPLE_VALUES:
+                    break
+                if value not in samples:
+                    samples.append(value)
+
+            # Stop collecting once the column is no longer low-cardinality
+            known = self._known[name]
+            if known is not None:
+                known.update(non_null.unique())
+                if len(known) > KNOWN_VALUES_MAX:
+                    self._known[name] = None
+
+    @staticmethod
+    def _merge_dtypes(current: Optional[np.dtype], dtype: np.dtype) -> np.dtype:
+        """Get the dtype pandas would infer for two chunks read as one."""
+        if current is None or current == dtype:
+            return dtype
+        if all(pd.api.types.is_numeric_dtype(d) and not pd.api.types.is_bool_dtype(d)
+               for d in (current, dtype)):
+            return np.result_type(current, dtype)
+        return np.dtype(object)
+
+    def build(self, distinct_counts: Dict[str, int]) -> SchemaProfile:
+        """
+        Finish the profile.
+
+        Args:
+            distinct_counts: Number of distinct non-null values per column
+
+        Returns:
+            Profile of all chunks added so far
+        """
+        columns = []
+
+        for name in self.columns:
+            dtype = self._dtypes[name]
+            null_count = self._null_counts[name]
+
+            # Match the dtype of a single read: missing values turn integer
+            # columns into floats and boolean columns into objects
+            if dtype is None:
+                dtype = np.dtype("float64")
+            elif null_count and pd.api.types.is_integer_dtype(dtype):
+                dtype = np.dtype("float64")
+            elif null_count and pd.api.types.is_bool_dtype(dtype):
+                dtype = np.dtype(object)
+
+            samples = pd.Series(self._samples[name], dtype=object)
+            known = pd.Series(list(self._known[name] or ()), dtype=object)
+            try:
+                samples = samples.astype(dtype)
+                known = known.astype(dtype)
+            except (TypeError, ValueError):
+                pass
+
+            columns.append(ColumnProfile(
+                name=name,
+                dtype=str(dtype),
+                sample_values=[str(v) for v in samples.unique()[:SAMPLE_VALUES]],
+                null_count=null_count,
+                distinct_count=int(distinct_counts[name]),
+                known_values=() if self._known[name] is None else SchemaProfile._known_values(known.unique())
+            ))
+
+        description = SchemaProfile._render(self.table_name, self.row_count, columns)
+
+        return SchemaProfile(
+            table_name=self.table_name,
+            row_count=self.row_count,
+            columns=columns,
+            description=description,
+            fingerprint=SchemaProfile._fingerprint(description)
+        )
@@ -0,0 +1,273 @@
+"""
+Schema Selector Module
+Prunes the schema description to the columns relevant to a question, so
+prompts stay small as tables grow wider.
+"""
+
+import logging
+import math
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from question_index import STOPWORDS
+from schema_profile import ColumnProfile, SchemaProfile
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Rough size of a token for English text and identifiers; close enough to
+# keep a prompt within budget without shipping a tokenizer
+CHARS_PER_TOKEN = 4
+
+# Question words that call for a numeric column to aggregate or compare
+NUMERIC_WORDS = {
+    'amount', 'average', 'avg', 'balance', 'biggest', 'highest', 'largest', 'lowest',
+    'max', 'maximum', 'mean', 'median', 'min', 'minimum', 'smallest', 'sum', 'total',
+    'value'
+}
+
+# Question words that call for a date column
+DATE_WORDS = {
+    'after', 'before', 'date', 'day', 'earliest', 'latest', 'month', 'oldest',
+    'recent', 'since', 'week', 'when'
+}
+
+# Score weights: a column named in the question counts most, then a column
+# holding a value the question mentions, then a column of the right type
+NAME_WEIGHT = 2.0
+VALUE_WEIGHT = 1.5
+TYPE_WEIGHT = 0.5
+TABLE_WEIGHT = 0.5
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of prompt tokens a text takes.
+
+    Args:
+        text: Prompt text
+
+    Returns:
+        Approximate token count
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def stem(word: str) -> str:
+    """
+    Strip plural endings so that "currencies" matches "currency".
+
+    Args:
+        word: Lowercase word
+
+    Returns:
+        The word without its plural ending
+    """
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith(('ses', 'xes')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def split_words(text: str) -> List[str]:
+    """
+    Split text or an identifier into meaningful words.
+
+    Args:
+        text: Question text or a name in snake_case or CamelCase
+
+    Returns:
+        Lowercase, stemmed words without stopwords or digits
+    """
+    text = re.sub(r'([a-z])([A-Z])', r'\1 \2', text).lower()
+    return [stem(word) for word in re.findall(r'[a-z]+', text) if word not in STOPWORDS]
+
+
+def words_match(name_word: str, question_word: str) -> bool:
+    """
+    Check whether a question word refers to a word of a name.
+
+    Args:
+        name_word: Word of a table or column name (see split_words())
+        question_word: Stemmed word of the question
+
+    Returns:
+        True for equal words and for abbreviations either way
+        ("transac" for "transaction")
+    """
+    if name_word == question_word:
+        return True
+    if len(name_word) >= 3 and len(question_word) >= 4 and question_word.startswith(name_word):
+        return True
+    return len(question_word) >= 4 and name_word.startswith(question_word)
+
+
+class SchemaSelector:
+    """
+    Picks the columns of the loaded tables that a question is likely to need.
+
+    Columns are ranked by how many words of their name appear in the
+    question, whether one of their values is mentioned and whether their
+    type fits the question (amounts, dates). The top columns are described
+    in full up to a token budget; the remaining ones are only listed by
+    name, so the LLM still knows they exist. Columns referenced by SQL that
+    failed are always kept, so a correction prompt never loses them.
+    """
+
+    def __init__(self, top_k: Optional[int] = None, token_budget: Optional[int] = None):
+        """
+        Initialize the selector.
+
+        Args:
+            top_k: Columns described in full (defaults to SCHEMA_TOP_K;
+                0 disables pruning)
+            token_budget: Approximate tokens the description may take
+                (defaults to SCHEMA_TOKEN_BUDGET; 0 for no limit)
+        """
+        self.top_k = top_k if top_k is not None else int(os.getenv('SCHEMA_TOP_K', '10'))
+        self.token_budget = token_budget if token_budget is not None else \
+            int(os.getenv('SCHEMA_TOKEN_BUDGET', '400'))
+
+    def rank(self, question: str,
+             profiles: Iterable[SchemaProfile]) -> List[Tuple[float, SchemaProfile, ColumnProfile]]:
+        """
+        Score every column for a question.
+
+        Args:
+            question: User's natural language question
+            profiles: Profiles of the tables the question is asked over
+
+        Returns:
+            (score, table profile, column profile) tuples, best first; ties
+            keep the table and column order
+        """
+        question_lower = question.lower()
+        question_words = set(split_words(question))
+        wants_number = bool(question_words & NUMERIC_WORDS)
+        wants_date = bool(question_words & DATE_WORDS)
+
+        scored = []
+        for profile in profiles:
+            table_words = split_words(profile.table_name)
+            table_named = bool(table_words) and all(
+                any(words_match(word, q) for q in question_words) for word in table_words
+            )
+
+            for column in profile.columns:
+                score = TABLE_WEIGHT if table_named else 0.0
+
+                name_words = split_words(column.name)
+                if name_words:
+                    matched = sum(any(words_match(word, q) for q in question_words)
+                                  for word in name_words)
+                    score += NAME_WEIGHT * matched / len(name_words)
+
+                if self._mentions_value(question_lower, column):
+                    score += VALUE_WEIGHT
+
+                if wants_number and self._is_numeric(column.dtype):
+                    score += TYPE_WEIGHT
+                if wants_date and column.dtype.startswith('datetime'):
+                    score += TYPE_WEIGHT
+
+                scored.append((score, profile, column))
+
+        # sorted() is stable, so equal scores keep the schema order
+        return sorted(scored, key=lambda item: -item[0])
+
+    def describe(self, question: str, profiles: Iterable[SchemaProfile],
+                 failed_sql: Optional[str] = None) -> str:
+        """
+        Render the schema description for a question.
+
+        Args:
+            question: User's natural language question
+            profiles: Profiles of the tables the question is asked over
+            failed_sql: SQL that failed for this question; every column it
+                references is described, even beyond the budget
+
+        Returns:
+            Schema description of the relevant columns, one block per table
+        """
+        profiles = list(profiles)
+        if self.top_k <= 0:
+            return "\n\n".join(profile.description for profile in profiles)
+
+        selected: Dict[str, Set[str]] = {profile.table_name: set() for profile in profiles}
+        for table_name, column_name in self._referenced_columns(failed_sql, profiles):
+            selected[table_name].add(column_name)
+        count = sum(len(names) for names in selected.values())
+
+        for _, profile, column in self.rank(question, profiles):
+            if count >= self.top_k:
+                break
+            names = selected[profile.table_name]
+            if column.name in names:
+                continue
+
+            names.add(column.name)
+            if not self._within_budget(self._render(profiles, selected, list_omitted=False)):
+                names.discard(column.name)
+                break
+            count += 1
+
+        # Name the omitted columns when that still fits, otherwise count them
+        description = self._render(profiles, selected, list_omitted=True)
+        if not self._within_budget(description):
+            description = self._render(profiles, selected, list_omitted=False)
+
+        total = sum(len(profile.columns) for profile in profiles)
+        logger.debug(f"Described {count} of {total} columns (~{estimate_tokens(description)} tokens)")
+        return description
+
+    def _within_budget(self, description: str) -> bool:
+        """Check a description against the token budget."""
+        return self.token_budget <= 0 or estimate_tokens(description) <= self.token_budget
+
+    @staticmethod
+    def _render(profiles: List[SchemaProfile], selected: Dict[str, Set[str]],
+                list_omitted: bool) -> str:
+        """Describe the selected columns of every table."""
+        return "\n\n".join(
+            profile.describe_columns(selected[profile.table_name], list_omitted=list_omitted)
+            for profile in profiles
+        )
+
+    @staticmethod
+    def _referenced_columns(sql: Optional[str],
+                            profiles: List[SchemaProfile]) -> List[Tuple[str, str]]:
+        """Find the (table, column) pairs whose column name appears in SQL."""
+        if not sql:
+            return []
+
+        identifiers = {word.lower() for word in re.findall(r'[A-Za-z_][A-Za-z0-9_]*', sql)}
+        return [
+            (profile.table_name, column.name)
+            for profile in profiles
+            for column in profile.columns
+            if column.name.lower() in identifiers
+        ]
+
+    @staticmethod
+    def _mentions_value(question_lower: str, column: ColumnProfile) -> bool:
+        """Check whether the question mentions one of the column's values."""
+        for value in column.known_values or column.sample_values:
+            value = value.lower().strip()
+            if value.endswith('.0'):
+                value = value[:-2]
+            # Single characters (flags like "X") would match almost anything
+            if len(value) < 2 or value not in question_lower:
+                continue
+            if re.search(rf'(?<![a-z0-9]){re.escape(value)}(?![a-z0-9])', question_lower):
+                return True
+        return False
+
+    @staticmethod
+    def _is_numeric(dtype: str) -> bool:
+        """Check whether a dtype name is an integer or float type."""
+        return dtype.lower().startswith(('int', 'uint', 'float'))
@@ -3,10 +3,9 @@ SQL Validator Module
 Validates and sanitizes SQL queries to prevent dangerous operations.
 """
 
-import sqlparse
 import re
 import logging
-from typing import Tuple, List
+from typing import Iterable, Optional, Tuple, List
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -21,9 +20,29 @@ class SQLValidator:
         'ALTER', 'CREATE', 'REPLACE', 'EXEC', 'EXECUTE'
     ]
 
+    # Keywords a query may start with
+    STATEMENT_STARTS = ('SELECT', 'WITH')
+
+    # One token per match, tried in order, most frequent first. Comments
+    # and quoted text are matched whole so keywords inside them are never
+    # seen as words. Quoting this scanner cannot follow exactly is rejected
+    # rather than guessed at: dollar-quoted strings ($$...$$, $tag$...$tag$),
+    # escape strings (E'...' with backslash escapes, found as the word E
+    # directly followed by a quote) and anything unterminated.
+    TOKEN_PATTERN = re.compile(r"""
+        (?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+      | (?P<quoted>'(?:[^']|'')*'|"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\])
+      | (?P<comment>--[^\n]*|/\*.*?\*/)
+      | (?P<number>[0-9][A-Za-z0-9_.]*)
+      | (?P<semicolon>;)
+      | (?P<dollar_quote>\$(?:[A-Za-z_][A-Za-z0-9_]*)?\$)
+      | (?P<unterminated>/\*|['"`\[])
+      | (?P<other>\S)
+    """, re.VERBOSE | re.DOTALL)
+
     def __init__(self):
         """Initialize the SQL validator."""
-        pass
+        self._forbidden = frozenset(self.FORBIDDEN_KEYWORDS)
 
     def validate(self, sql: str) -> Tuple[bool, str]:
         """
@@ -40,96 +59,90 @@ class SQLValidator:
         if not sql or not sql.strip():
             return False, "Empty SQL query"
 
-        # Check for forbidden keywords
-        is_safe, error = self._check_forbidden_keywords(sql)
-        if not is_safe:
-            return False, error
-
-        # Check SQL syntax
-        is_valid_syntax, syntax_error = self._check_syntax(sql)
-        if not is_valid_syntax:
-            return False, syntax_error
+        # Forbidden keywords, statement count and statement type in one pass
+        is_valid, error_message = self._scan(sql)
+        if not is_valid:
+            return False, error_message
 
-        # All checks passed
         return True, ""
 
-    def _check_forbidden_keywords(self, sql: str) -> Tuple[bool, str]:
+    def _scan(self, sql: str) -> Tuple[bool, str]:
         """
-        Check if SQL contains any forbidden keywords.
+        Check a SQL query in a single pass over its tokens.
+
+        Keywords inside string literals, quoted identifiers and comments are
+        ignored. Forbidden keywords are reported first, wherever they occur;
+        then the query must hold exactly one statement starting with SELECT
+        or WITH.
 
         Args:
             sql: SQL query string
 
         Returns:
-            Tuple of (is_safe, error_message)
+            Tuple of (is_valid, error_message)
         """
-        sql_upper = sql.upper()
+        statements = 0
+        first_word = None
+        in_statement = False
 
-        for keyword in self.FORBIDDEN_KEYWORDS:
-            # Use word boundaries to avoid false positives
-            # (e.g., "DELETED" column name shouldn't trigger "DELETE")
-            pattern = r'\b' + keyword + r'\b'
-            if re.search(pattern, sql_upper):
-                return False, f"Forbidden SQL keyword detected: {keyword}"
+        for match in self.TOKEN_PATTERN.finditer(sql):
+            kind = match.lastgroup
 
-        return True, ""
+            if kind == 'comment':
+                continue
 
-    def _check_syntax(self, sql: str) -> Tuple[bool, str]:
-        """
-        Check if SQL has valid syntax using sqlparse.
+            if kind == 'semicolon':
+                in_statement = False
+                continue
 
-        Args:
-            sql: SQL query string
+            if kind == 'dollar_quote':
+                return False, "Dollar-quoted and escape strings are not allowed"
 
-        Returns:
-            Tuple of (is_valid, error_message)
-        """
-        try:
-            # Parse the SQL
-            parsed = sqlparse.parse(sql)
+            if kind == 'unterminated':
+                return False, "Unterminated string, identifier or comment"
 
-            if not parsed:
-                return False, "Could not parse SQL query"
+            if kind == 'word':
+                word = match.group().upper()
+                # Whole tokens only, so e.g. a "DELETED" column is allowed
+                if word in self._forbidden:
+                    return False, f"Forbidden SQL keyword detected: {word}"
+                if word == 'E' and sql.startswith("'", match.end()):
+                    return False, "Dollar-quoted and escape strings are not allowed"
+            else:
+                word = None
 
-            # Check that we have exactly one statement
-            if len(parsed) > 1:
-                return False, "Multiple SQL statements detected. Only single SELECT queries are allowed."
+            if not in_statement:
+                in_statement = True
+                statements += 1
+                if statements == 1:
+                    first_word = word
 
-            # Get the first statement
-            statement = parsed[0]
+        if statements == 0:
+            return False, "Could not parse SQL query"
 
-            # Check that it's a SELECT statement
-            if not self._is_select_statement(statement):
-                return False, "Only SELECT queries are allowed"
+        if statements > 1:
+            return False, "Multiple SQL statements detected. Only single SELECT queries are allowed."
 
-            return True, ""
+        if first_word not in self.STATEMENT_STARTS:
+            return False, "Only SELECT queries are allowed"
 
-        except Exception as e:
-            return False, f"SQL syntax error: {str(e)}"
+        return True, ""
 
-    def _is_select_statement(self, statement) -> bool:
+    def strip_terminator(self, sql: str) -> str:
         """
-        Check if a parsed statement is a SELECT query.
+        Remove trailing semicolons, comments and whitespace from a query.
 
         Args:
-            statement: Parsed SQL statement from sqlparse
+            sql: SQL query string
 
         Returns:
-            True if it's a SELECT statement
+            The query up to the end of its last token
         """
-        # Get the first meaningful token
-        first_token = None
-        for token in statement.tokens:
-            if not token.is_whitespace:
-                first_token = token
-                break
-
-        if first_token is None:
-            return False
-
-        # Check if it's SELECT or WITH (for CTEs)
-        token_value = str(first_token).upper().strip()
-        return token_value in ['SELECT', 'WITH']
+        end = 0
+        for match in self.TOKEN_PATTERN.finditer(sql):
+            if match.lastgroup not in ('comment', 'semicolon'):
+                end = match.end()
+        return sql[:end]
 
     def extract_sql_from_response(self, llm_response: str) -> str:
         """
@@ -177,3 +190,105 @@ class SQLValidator:
 
         # Last resort: return the whole response
         return llm_response.strip()
+
+
+class StreamingSQLExtractor:
+    """
+    Extracts SQL from an LLM response while it is still being streamed.
+
+    The SQL is available as soon as the closing ``` of the first code block
+    arrives, so validation and execution can start while the model is still
+    writing its explanation.
+    """
+
+    SQL_BLOCK = re.compile(r'```sql\s*(.*?)\s*```', re.DOTALL | re.IGNORECASE)
+    CODE_BLOCK = re.compile(r'```\s*(.*?)\s*```', re.DOTALL)
+
+    def __init__(self, validator: Optional[SQLValidator] = None):
+        """
+        Initialize the extractor.
+
+        Args:
+            validator: Validator used for the fallback extraction when the
+                response contains no code block
+        """
+        self.validator = validator or SQLValidator()
+        self.sql: Optional[str] = None
+        self._chunks: List[str] = []
+
+    @property
+    def text(self) -> str:
+        """The response received so far."""
+        return "".join(self._chunks)
+
+    def feed(self, chunk: str) -> Optional[str]:
+        """
+        Add a chunk of the response.
+
+        Args:
+            chunk: Next text delta from the stream
+
+        Returns:
+            The SQL if this chunk completed the first code block, else None
+        """
+        self._chunks.append(chunk)
+
+        if self.sql is not None or '`' not in chunk:
+            return None
+
+        text = self.text
+        if text.count('```') < 2:
+            return None
+
+        match = self.SQL_BLOCK.search(text) or self.CODE_BLOCK.search(text)
+        if match:
+            self.sql = match.group(1).strip()
+            return self.sql
+
+        return None
+
+    def read_sql(self, chunks: Iterable[str]) -> str:
+        """
+        Consume chunks until the SQL is available.
+
+        Chunks after the closing fence are left in the iterator for drain().
+
+        Args:
+            chunks: Iterator over text deltas
+
+        Returns:
+            The extracted SQL
+        """
+        for chunk in chunks:
+            if self.feed(chunk) is not None:
+                return self.sql
+        return self.finish()
+
+    def drain(self, chunks: Iterable[str]) -> str:
+        """
+        Consume the rest of the stream.
+
+        Args:
+            chunks: Iterator over the remaining text deltas
+
+        Returns:
+            The complete response
+        """
+        for chunk in chunks:
+            self.feed(chunk)
+        self.finish()
+        return self.text
+
+    def finish(self) -> str:
+        """
+        Get the SQL once the stream has ended.
+
+        Falls back to SQLValidator.extract_sql_from_response() on the full
+        text when no code block was found.
+
+        Returns:
+            The extracted SQL
+        """
+        if self.sql is None:
+            self.sql = self.validator.extract_sql_from_response(self.text)
+        return self.sql
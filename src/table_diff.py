@@ -0,0 +1,152 @@
+"""
+Table Diff Module
+Computes row-level changes between two versions of a table.
+"""
+
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+def column_hashes(series: pd.Series) -> np.ndarray:
+    """
+    Hash every value of a column independently of how the column was typed.
+
+    The same workbook can be read with different dtypes (a missing value
+    turns integers into floats, an all-empty text column reads as float), so
+    integers are hashed as floats and missing values as zero.
+
+    Args:
+        series: Column to hash
+
+    Returns:
+        uint64 hash per value
+    """
+    if pd.api.types.is_integer_dtype(series):
+        series = series.astype("float64")
+    hashes = pd.util.hash_pandas_object(series, index=False).to_numpy().copy()
+    hashes[series.isna().to_numpy()] = 0
+    return hashes
+
+
+def row_hashes(df: pd.DataFrame, columns: Optional[Sequence[str]] = None) -> np.ndarray:
+    """
+    Hash every row of a DataFrame.
+
+    Args:
+        df: Data to hash
+        columns: Columns to include (all when None)
+
+    Returns:
+        uint64 hash per row
+    """
+    hashes = np.zeros(len(df), dtype=np.uint64)
+    for col in (df.columns if columns is None else columns):
+        # Wrapping multiply-and-add keeps the column order significant
+        hashes = hashes * np.uint64(0x100000001B3) + column_hashes(df[col])
+    return hashes
+
+
+@dataclass(frozen=True)
+class TableChanges:
+    """
+    Row-level changes that turn one version of a table into the next.
+
+    Rows are referred to by position: source_positions maps every row of the
+    new version to the position of the same row in the old version, or -1
+    for inserted rows.
+    """
+
+    old_row_count: int
+    source_positions: np.ndarray
+    deleted: np.ndarray
+    updated: np.ndarray
+
+    @property
+    def inserted(self) -> np.ndarray:
+        """Positions of inserted rows in the new version."""
+        return np.flatnonzero(self.source_positions < 0)
+
+    @property
+    def is_empty(self) -> bool:
+        """True when both versions hold the same rows."""
+        return not (len(self.deleted) or len(self.updated) or len(self.inserted))
+
+    def removed_rows(self, old: pd.DataFrame) -> pd.DataFrame:
+        """Old rows that are deleted or replaced by an update."""
+        positions = np.concatenate([self.deleted, self.source_positions[self.updated]])
+        return old.iloc[np.sort(positions)]
+
+    def added_rows(self, new: pd.DataFrame) -> pd.DataFrame:
+        """New rows that are inserted or replace an old row."""
+        return new.iloc[np.sort(np.concatenate([self.inserted, self.updated]))]
+
+    def __str__(self) -> str:
+        return (f"{len(self.inserted)} inserted, {len(self.updated)} updated, "
+                f"{len(self.deleted)} deleted")
+
+
+def diff_tables(old: pd.DataFrame, new: pd.DataFrame,
+                key_columns: Optional[Sequence[str]] = None) -> TableChanges:
+    """
+    Compute the row-level changes between two versions of a table.
+
+    Without key columns, rows are matched on their full contents, so a
+    changed row shows up as a delete plus an insert. With key columns, rows
+    are matched on the key and rows whose other values differ are updates.
+
+    Args:
+        old: Previous version of the table
+        new: New version with the same columns
+        key_columns: Columns that uniquely identify a row
+
+    Returns:
+        Changes from old to new
+
+    Raises:
+        ValueError: If the columns differ or the key is not unique
+    """
+    if list(old.columns) != list(new.columns):
+        raise ValueError("Cannot diff tables with different columns")
+
+    old_rows, new_rows = row_hashes(old), row_hashes(new)
+
+    if key_columns:
+        old_keys, new_keys = row_hashes(old, key_columns), row_hashes(new, key_columns)
+        for keys, version in ((old_keys, "old"), (new_keys, "new")):
+            if len(np.unique(keys)) != len(keys):
+                raise ValueError(f"Key {list(key_columns)} is not unique in the {version} data")
+    else:
+        old_keys, new_keys = old_rows, new_rows
+
+    # Number repeated keys so that duplicate rows are matched one to one
+    old_index = pd.DataFrame({
+        "key": old_keys,
+        "n": pd.Series(old_keys).groupby(old_keys).cumcount().to_numpy(),
+        "old": np.arange(len(old)),
+    })
+    new_index = pd.DataFrame({
+        "key": new_keys,
+        "n": pd.Series(new_keys).groupby(new_keys).cumcount().to_numpy(),
+        "new": np.arange(len(new)),
+    })
+    matched = new_index.merge(old_index, on=["key", "n"], how="left")
+
+    source = np.full(len(new), -1, dtype=np.int64)
+    found = matched["old"].notna().to_numpy()
+    source[matched["new"].to_numpy()[found]] = matched["old"].to_numpy()[found].astype(np.int64)
+
+    kept = np.zeros(len(old), dtype=bool)
+    kept[source[source >= 0]] = True
+
+    matched_new = np.flatnonzero(source >= 0)
+    updated = matched_new[old_rows[source[matched_new]] != new_rows[matched_new]]
+
+    return TableChanges(
+        old_row_count=len(old),
+        source_positions=source,
+        deleted=np.flatnonzero(~kept),
+        updated=updated,
+    )
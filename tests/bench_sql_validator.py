@@ -0,0 +1,118 @@
+"""
+SQL Validator Benchmark
+Compares the single-pass scanner against the previous per-keyword regex +
+sqlparse validation on a few thousand LLM-style outputs.
+
+Run:
+    python tests/bench_sql_validator.py [count]
+"""
+
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+import sqlparse
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from sql_validator import SQLValidator
+
+
+QUERY_TEMPLATES = [
+    "SELECT COUNT(*) FROM accrual_accounts WHERE Currency = '{currency}';",
+    "SELECT Country_Key, SUM(Transaction_Value) AS total\nFROM accrual_accounts\n"
+    "WHERE Fiscal_Year_1 = {year}\nGROUP BY Country_Key\nORDER BY total DESC\nLIMIT {limit};",
+    "WITH yearly AS (\n  SELECT Fiscal_Year_1, AVG(Transaction_Value) AS avg_value\n"
+    "  FROM accrual_accounts\n  GROUP BY Fiscal_Year_1\n)\nSELECT * FROM yearly ORDER BY Fiscal_Year_1;",
+    "-- top transactions\nSELECT * FROM accrual_accounts ORDER BY Transaction_Value DESC LIMIT {limit};",
+    "SELECT DISTINCT Currency FROM accrual_accounts /* currencies in use */;",
+    "SELECT * FROM accrual_accounts WHERE Authorization_Group = 'UPDATE {limit}';",
+    "DELETE FROM accrual_accounts WHERE Fiscal_Year_1 = {year};",
+    "SELECT * FROM accrual_accounts; DROP TABLE accrual_accounts;",
+    "UPDATE accrual_accounts SET Currency = '{currency}';",
+]
+
+
+class LegacyValidator:
+    """The validation path used before the single-pass scanner."""
+
+    FORBIDDEN_KEYWORDS = SQLValidator.FORBIDDEN_KEYWORDS
+
+    def validate(self, sql):
+        if not sql or not sql.strip():
+            return False, "Empty SQL query"
+
+        sql_upper = sql.upper()
+        for keyword in self.FORBIDDEN_KEYWORDS:
+            if re.search(r'\b' + keyword + r'\b', sql_upper):
+                return False, f"Forbidden SQL keyword detected: {keyword}"
+
+        parsed = sqlparse.parse(sql)
+        if not parsed:
+            return False, "Could not parse SQL query"
+        if len(parsed) > 1:
+            return False, "Multiple SQL statements detected. Only single SELECT queries are allowed."
+
+        first_token = next((t for t in parsed[0].tokens if not t.is_whitespace), None)
+        if first_token is None or str(first_token).upper().strip() not in ('SELECT', 'WITH'):
+            return False, "Only SELECT queries are allowed"
+
+        return True, ""
+
+
+def make_outputs(count: int, seed: int = 7):
+    """Build SQL strings as extracted from LLM responses."""
+    rng = random.Random(seed)
+    return [
+        rng.choice(QUERY_TEMPLATES).format(
+            currency=rng.choice(['USD', 'CAD']),
+            year=rng.randint(2010, 2020),
+            limit=rng.randint(1, 50),
+        )
+        for _ in range(count)
+    ]
+
+
+def time_validator(validator, outputs, repeat: int = 3) -> float:
+    """Best wall time of validating every output."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for sql in outputs:
+            validator.validate(sql)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(count: int = 5000) -> int:
+    outputs = make_outputs(count)
+    legacy, scanner = LegacyValidator(), SQLValidator()
+
+    # Both paths must agree on which queries are allowed
+    mismatches = [sql for sql in outputs
+                  if legacy.validate(sql)[0] != scanner.validate(sql)[0]]
+    # Intended differences: keywords inside literals and leading comments
+    # no longer cause safe queries to be rejected
+    mismatches = [sql for sql in mismatches
+                  if "'UPDATE" not in sql and not sql.startswith("--")]
+    if mismatches:
+        print(f"❌ Validators disagree on {len(mismatches)} queries, e.g.: {mismatches[0]}")
+        return 1
+
+    legacy_time = time_validator(legacy, outputs)
+    scanner_time = time_validator(scanner, outputs)
+
+    print(f"Validated {count} LLM outputs")
+    print(f"  per-keyword regex + sqlparse: {legacy_time * 1000:8.1f} ms "
+          f"({legacy_time / count * 1e6:.1f} µs/query)")
+    print(f"  single-pass scanner:          {scanner_time * 1000:8.1f} ms "
+          f"({scanner_time / count * 1e6:.1f} µs/query)")
+    print(f"  speedup: {legacy_time / scanner_time:.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
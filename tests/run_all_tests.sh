@@ -51,6 +51,19 @@ echo ""
 
 run_test "tests/test_modules.py" "Module Unit Tests" || true
 run_test "tests/test_security.py" "Security Tests" || true
+run_test "tests/test_query_engine.py" "Query Engine Tests" || true
+run_test "tests/test_engine_parity.py" "Query Engine Parity Tests" || true
+run_test "tests/test_caches.py" "Cache Tests" || true
+run_test "tests/test_llm_async.py" "Async LLM Service Tests" || true
+run_test "tests/test_batch_runner.py" "Batch Runner Tests" || true
+run_test "tests/test_query_cost.py" "Query Cost Tests" || true
+run_test "tests/test_data_catalog.py" "Data Catalog Tests" || true
+run_test "tests/test_incremental_reload.py" "Incremental Reload Tests" || true
+run_test "tests/test_schema_selector.py" "Schema Selector Tests" || true
+run_test "tests/test_intent_matcher.py" "Intent Matcher Tests" || true
+run_test "tests/test_candidate_selector.py" "Candidate Selector Tests" || true
+run_test "tests/test_query_pipeline.py" "Query Pipeline Tests" || true
+run_test "tests/test_api_server.py" "API Server Tests" || true
 
 echo ""
 echo "🔹 Phase 2: Integration Tests (Requires OpenAI API)"
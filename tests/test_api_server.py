@@ -0,0 +1,252 @@
+"""
+API Server Tests
+Tests the HTTP API on a local server with a scripted LLM (no API calls):
+response formats, keep-alive connections and the concurrency limit.
+"""
+
+import http.client
+import json
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pyarrow as pa
+import uvicorn
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from api_server import create_app
+from data_loader import DataLoader
+from intent_matcher import IntentMatcher
+from query_engine import SQLiteEngine
+from query_pipeline import QueryPipeline
+
+
+VALID = "SELECT Currency, COUNT(*) AS n FROM accrual_accounts GROUP BY Currency ORDER BY Currency"
+ALL_ROWS = "SELECT * FROM accrual_accounts"
+UNKNOWN_COLUMN = "SELECT Currency_Code FROM accrual_accounts"
+MIXED_TYPES = "SELECT 'USD' AS value UNION ALL SELECT 1"
+
+
+class ScriptedLLM:
+    """Answers with the SQL registered for a question, after an optional delay."""
+
+    model = "scripted"
+    temperature = 0.0
+
+    def __init__(self, answers, delay: float = 0.0):
+        self.answers = answers
+        self.delay = delay
+        self.calls = 0
+
+    def generate_sql_with_retry(self, prompts):
+        self.calls += 1
+        time.sleep(self.delay)
+        sql = next(sql for question, sql in self.answers.items() if question in prompts['user'])
+        return f"```sql\n{sql}\n```\n\nExplanation: scripted."
+
+
+class LocalServer:
+    """Runs the app with uvicorn on a free local port in a background thread."""
+
+    def __init__(self, app):
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            self.port = probe.getsockname()[1]
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning",
+                                timeout_keep_alive=30)
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        deadline = time.time() + 10
+        while not self.server.started:
+            assert time.time() < deadline, "Server did not start"
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+    def connect(self) -> http.client.HTTPConnection:
+        return http.client.HTTPConnection("127.0.0.1", self.port, timeout=10)
+
+
+def post(connection, body, headers=None):
+    """POST /query and read the whole response."""
+    connection.request("POST", "/query", body=json.dumps(body),
+                       headers={"Content-Type": "application/json", **(headers or {})})
+    response = connection.getresponse()
+    return response, response.read()
+
+
+def make_pipeline(llm):
+    """Build a pipeline over the accrual accounts workbook."""
+    loader = DataLoader('Data Dump - Accrual Accounts.xlsx')
+    loader.load_data()
+    engine = SQLiteEngine.from_loader(loader)
+    pipeline = QueryPipeline(loader, llm, engine, intent_matcher=IntentMatcher(loader.schema_profiles),
+                             stream=False, candidates=1, deadline=0)
+    return loader, pipeline
+
+
+def test_formats():
+    """Test JSON, NDJSON and Arrow responses over one keep-alive connection"""
+
+    print("=== TESTING RESPONSE FORMATS ===\n")
+
+    llm = ScriptedLLM({"currency mix": VALID, "every row": ALL_ROWS, "broken": UNKNOWN_COLUMN,
+                       "mixed values": MIXED_TYPES})
+    loader, pipeline = make_pipeline(llm)
+
+    try:
+        with LocalServer(create_app(pipeline, max_concurrency=2)) as server:
+            connection = server.connect()
+
+            print("1. Testing JSON...")
+            response, body = post(connection, {"question": "What does the currency mix look like?"})
+            result = json.loads(body)
+            assert response.status == 200, f"Status {response.status}: {body[:200]}"
+            assert result["sql"] == VALID and result["source"] == "llm", f"Wrong result: {result}"
+            assert result["rows"] == [{"Currency": "CAD", "n": result["rows"][0]["n"]},
+                                      {"Currency": "USD", "n": result["rows"][1]["n"]}], \
+                f"Wrong rows: {result['rows']}"
+            assert result["explanation"] == "scripted." and not result["truncated"], "Wrong metadata"
+            sock = connection.sock
+
+            response, body = post(connection, {"question": "How many USD transactions?"})
+            result = json.loads(body)
+            assert response.status == 200 and result["source"] == "intent", f"Wrong result: {result}"
+            assert connection.sock is sock, "Connection not kept alive"
+            print("   ✓ LLM and intent answers over one connection\n")
+
+            print("2. Testing the JSON row limit...")
+            response, body = post(connection, {"question": "Show every row", "max_rows": 10})
+            result = json.loads(body)
+            assert len(result["rows"]) == 10 and result["truncated"], "Row limit ignored"
+            assert result["row_count"] == len(loader.df), f"Wrong row count: {result['row_count']}"
+            print(f"   ✓ 10 of {result['row_count']} rows returned\n")
+
+            print("3. Testing NDJSON...")
+            response, body = post(connection, {"question": "Show every row", "format": "ndjson"})
+            lines = body.decode().splitlines()
+            metadata = json.loads(lines[0])
+            assert response.getheader("Content-Type").startswith("application/x-ndjson"), "Wrong media type"
+            assert metadata["sql"] == ALL_ROWS and len(lines) == 1 + len(loader.df), \
+                f"Wrong line count: {len(lines)}"
+            assert set(json.loads(lines[1])) == set(loader.df.columns), "Wrong row keys"
+            print(f"   ✓ Metadata line and {len(lines) - 1} rows\n")
+
+            print("4. Testing Arrow...")
+            response, body = post(connection, {"question": "Show every row"},
+                                  headers={"Accept": "application/vnd.apache.arrow.stream"})
+            reader = pa.ipc.open_stream(body)
+            table = reader.read_all()
+            metadata = json.loads(reader.schema.metadata[b"result"])
+            assert table.num_rows == len(loader.df) and metadata["sql"] == ALL_ROWS, "Wrong Arrow result"
+            assert table.num_columns == len(loader.df.columns), "Wrong Arrow columns"
+            assert connection.sock is sock, "Connection not kept alive after streaming"
+            print(f"   ✓ {table.num_rows} rows in {len(table.to_batches())} record batch(es)")
+
+            # A column Arrow cannot type is reported before the response starts
+            response, body = post(connection, {"question": "Show the mixed values", "format": "arrow"})
+            result = json.loads(body)
+            assert response.status == 500 and "cannot be converted to Arrow" in result["error"], \
+                f"Status {response.status}: {body[:200]}"
+            response, body = post(connection, {"question": "Show the mixed values"})
+            assert response.status == 200 and len(json.loads(body)["rows"]) == 2, "Mixed values lost in JSON"
+            print("   ✓ Unconvertible column reported as a 500 with a JSON error\n")
+
+            print("5. Testing errors...")
+            response, body = post(connection, {"question": "Show the broken column"})
+            result = json.loads(body)
+            assert response.status == 422 and result["status"] == "failed", f"Status {response.status}"
+            assert len(result["attempts"]) == pipeline.max_attempts, f"Wrong attempts: {result['attempts']}"
+            for bad_body in ({}, {"question": "  "}, {"question": "Rows?", "format": "xml"},
+                             {"question": "Rows?", "max_rows": -1}):
+                response, body = post(connection, bad_body)
+                assert response.status == 400, f"{bad_body} accepted: {response.status}"
+            print("   ✓ 422 for a failed question, 400 for bad requests\n")
+
+            print("6. Testing health and stats...")
+            connection.request("GET", "/health")
+            health = json.loads(connection.getresponse().read())
+            assert health["status"] == "ok" and health["tables"] == ["accrual_accounts"], f"Wrong health: {health}"
+            connection.request("GET", "/stats")
+            stats = json.loads(connection.getresponse().read())
+            assert stats["requests"]["completed"] == 8 and stats["requests"]["in_flight"] == 0, \
+                f"Wrong request stats: {stats['requests']}"
+            assert stats["failed_queries"]["remembered"] >= 1, f"Wrong stats: {stats}"
+            print(f"   ✓ {stats['requests']}\n")
+            connection.close()
+    finally:
+        pipeline.query_engine.close()
+
+    print("✅ RESPONSE FORMAT TESTS PASSED\n")
+    return True
+
+
+def test_concurrency_limit():
+    """Test that requests beyond the limit wait, then get 503"""
+
+    print("=== TESTING CONCURRENCY LIMIT ===\n")
+
+    llm = ScriptedLLM({"currency mix": VALID}, delay=0.5)
+    _, pipeline = make_pipeline(llm)
+    statuses = []
+
+    def ask(number):
+        connection = server.connect()
+        response, _ = post(connection, {"question": f"What does the currency mix look like? ({number})"})
+        statuses.append((response.status, response.getheader("Retry-After")))
+        connection.close()
+
+    try:
+        with LocalServer(create_app(pipeline, max_concurrency=1, queue_timeout=0.1)) as server:
+            print("1. Testing three requests at once with one slot...")
+            threads = [threading.Thread(target=ask, args=(number,)) for number in range(3)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+
+            assert sorted(status for status, _ in statuses) == [200, 503, 503], f"Wrong statuses: {statuses}"
+            assert all(retry == "1" for status, retry in statuses if status == 503), "Retry-After missing"
+            assert llm.calls == 1 and elapsed < 1.0, f"{llm.calls} LLM calls in {elapsed:.2f}s"
+            print(f"   ✓ One answered, two turned away in {elapsed:.2f}s\n")
+
+            # The slot is free again once the request finishes
+            print("2. Testing the next request...")
+            response, _ = post(server.connect(), {"question": "What does the currency mix look like?"})
+            assert response.status == 200, f"Status {response.status}"
+            print("   ✓ Answered\n")
+    finally:
+        pipeline.query_engine.close()
+
+    print("✅ CONCURRENCY LIMIT TESTS PASSED\n")
+    return True
+
+
+if __name__ == '__main__':
+    try:
+        test_formats()
+        test_concurrency_limit()
+        print("="*50)
+        print("✅ ALL API SERVER TESTS PASSED")
+        print("="*50)
+        sys.exit(0)
+    except AssertionError as e:
+        print(f'\n❌ API SERVER TEST FAILED: {e}')
+        sys.exit(1)
+    except Exception as e:
+        print(f'\n❌ ERROR: {e}')
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
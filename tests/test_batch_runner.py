@@ -0,0 +1,148 @@
+"""
+Batch Runner Tests
+Tests bulk question answering with a fake LLM service (no API calls).
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pyarrow.parquet as pq
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from batch_runner import BatchRunner, read_questions, run_batch
+from data_loader import DataLoader
+from query_engine import SQLiteEngine
+
+
+ANSWERS = {
+    "How many rows are in the dataset?": "SELECT COUNT(*) AS total FROM accrual_accounts",
+    "What are the unique currencies?": "SELECT DISTINCT Currency FROM accrual_accounts ORDER BY Currency",
+    "How many USD transactions?": "SELECT COUNT(*) AS n FROM accrual_accounts WHERE Currency = 'USD'",
+    "Delete everything": "DELETE FROM accrual_accounts",
+    "Use a missing column": "SELECT Missing_Column FROM accrual_accounts",
+}
+
+
+class FakeAsyncLLM:
+    """Answers from a fixed table and records how many calls overlap."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def generate_sql_with_retry(self, prompts):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.02)
+            question = prompts['user'].split("Question: ")[1].split("\n")[0]
+            return f"```sql\n{ANSWERS[question]}\n```\n\nExplanation: test."
+        finally:
+            self.in_flight -= 1
+
+
+class CorrectingAsyncLLM:
+    """Answers with a query that fails to execute, then with its correction."""
+
+    def __init__(self, first_sql, corrected_sql):
+        self.first_sql = first_sql
+        self.corrected_sql = corrected_sql
+        self.calls = 0
+
+    async def generate_sql_with_retry(self, prompts):
+        self.calls += 1
+        corrected = "previous SQL query failed" in prompts['user']
+        return f"```sql\n{self.corrected_sql if corrected else self.first_sql}\n```"
+
+
+def test_batch_runner():
+    """Test running a file of questions through the shared pipeline"""
+
+    print("=== TESTING BATCH RUNNER ===\n")
+
+    loader = DataLoader('Data Dump - Accrual Accounts.xlsx')
+    loader.load_data()
+    engine = SQLiteEngine.from_loader(loader)
+    llm = FakeAsyncLLM()
+    runner = BatchRunner(loader, llm, engine, max_parallel=2)
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            questions_path = os.path.join(tmp, 'questions.txt')
+            with open(questions_path, 'w') as f:
+                f.write("# nightly checks\n\n" + "\n".join(ANSWERS) + "\n")
+
+            # Question file parsing
+            print("1. Testing question file parsing...")
+            questions = read_questions(questions_path)
+            assert questions == list(ANSWERS), f"Unexpected questions: {questions}"
+            print(f"   ✓ Read {len(questions)} questions\n")
+
+            # JSONL output
+            print("2. Testing JSONL output...")
+            output_path = os.path.join(tmp, 'results.jsonl')
+            counts = asyncio.run(run_batch(questions, runner, output_path))
+
+            with open(output_path) as f:
+                results = {r['question']: r for r in map(json.loads, f)}
+
+            assert counts == {'ok': 3, 'invalid': 1, 'error': 1}, f"Unexpected counts: {counts}"
+            assert results["How many rows are in the dataset?"]['rows'] == [{'total': 13152}], \
+                "Wrong COUNT result"
+            assert results["What are the unique currencies?"]['row_count'] == 2, "Wrong DISTINCT result"
+            assert 'DELETE' in results["Delete everything"]['error'], "DELETE not rejected"
+            assert results["Use a missing column"]['status'] == 'error', "Execution error not reported"
+            assert llm.max_in_flight <= 2, f"Parallelism bound exceeded: {llm.max_in_flight}"
+            print(f"   ✓ Results: {counts}, max {llm.max_in_flight} in flight\n")
+
+            # Parquet output
+            print("3. Testing Parquet output...")
+            parquet_path = os.path.join(tmp, 'results.parquet')
+            asyncio.run(run_batch(questions, runner, parquet_path))
+            table = pq.read_table(parquet_path)
+            assert table.num_rows == len(questions), "Missing rows in Parquet output"
+            assert 'rows_json' in table.column_names, "Result rows not stored"
+            print(f"   ✓ Wrote {table.num_rows} results to Parquet\n")
+
+        # Same correction loop as the app: execution errors are corrected too
+        print("4. Testing corrections and the attempt budget...")
+        question = "Count the rows for each currency"
+        corrected_sql = "SELECT Currency, COUNT(*) AS n FROM accrual_accounts GROUP BY Currency"
+        llm = CorrectingAsyncLLM(ANSWERS["Use a missing column"], corrected_sql)
+        result = asyncio.run(anext(BatchRunner(loader, llm, engine, deadline=0).run([question])))
+        assert result.status == "ok" and result.sql == corrected_sql, f"Not corrected: {result}"
+        assert llm.calls == 2, f"{llm.calls} LLM calls"
+
+        llm = CorrectingAsyncLLM(ANSWERS["Use a missing column"], ANSWERS["Use a missing column"] + " LIMIT 1")
+        result = asyncio.run(anext(BatchRunner(loader, llm, engine, max_attempts=2, deadline=0).run([question])))
+        assert result.status == "error" and "after 2 attempts" in result.error, f"Wrong result: {result}"
+        assert llm.calls == 2, f"Attempt budget ignored: {llm.calls} LLM calls"
+        print(f"   ✓ Execution error corrected; {result.error[:50]}...\n")
+    finally:
+        engine.close()
+
+    print("✅ BATCH RUNNER TESTS PASSED\n")
+    return True
+
+
+if __name__ == '__main__':
+    try:
+        test_batch_runner()
+        print("="*50)
+        print("✅ ALL BATCH RUNNER TESTS PASSED")
+        print("="*50)
+        sys.exit(0)
+    except AssertionError as e:
+        print(f'\n❌ BATCH RUNNER TEST FAILED: {e}')
+        sys.exit(1)
+    except Exception as e:
+        print(f'\n❌ ERROR: {e}')
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
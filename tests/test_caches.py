@@ -0,0 +1,231 @@
+"""
+Cache Tests
+Tests the caches that let repeated questions skip work.
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from question_index import QuestionIndex
+from response_cache import ResponseCache
+from result_cache import ResultCache
+from data_loader import DataLoader
+
+
+FINGERPRINT = "schema-v1"
+MODEL = "gpt-4o-mini"
+RESPONSE = "```sql\nSELECT COUNT(*) FROM accrual_accounts WHERE Currency = 'USD';\n```"
+
+
+def test_response_cache():
+    """Test the question -> response cache"""
+
+    print("=== TESTING RESPONSE CACHE ===\n")
+
+    cache = ResponseCache(max_entries=2, ttl_seconds=60)
+
+    # Miss then hit, with question normalization
+    print("1. Testing hits and misses...")
+    question = "How many USD transactions?"
+    assert cache.get(question, FINGERPRINT, MODEL, 0.0) is None, "Empty cache returned a value"
+
+    cache.put(question, FINGERPRINT, MODEL, 0.0, RESPONSE)
+    assert cache.get("  how many USD   transactions ", FINGERPRINT, MODEL, 0.0) == RESPONSE, \
+        "Normalized question not found"
+
+    stats = cache.stats()
+    assert stats['hits'] == 1 and stats['misses'] == 1, f"Unexpected stats: {stats}"
+    print(f"   ✓ Stats: {stats}\n")
+
+    # Every key component matters
+    print("2. Testing key components...")
+    assert cache.get(question, "schema-v2", MODEL, 0.0) is None, "Schema fingerprint ignored"
+    assert cache.get(question, FINGERPRINT, "gpt-4o", 0.0) is None, "Model ignored"
+    assert cache.get(question, FINGERPRINT, MODEL, 0.7) is None, "Temperature ignored"
+    print("   ✓ Fingerprint, model and temperature are part of the key\n")
+
+    # LRU eviction
+    print("3. Testing LRU eviction...")
+    cache.put("question a", FINGERPRINT, MODEL, 0.0, "a")
+    cache.get(question, FINGERPRINT, MODEL, 0.0)
+    cache.put("question b", FINGERPRINT, MODEL, 0.0, "b")
+    assert cache.get("question a", FINGERPRINT, MODEL, 0.0) is None, "LRU entry not evicted"
+    assert cache.get(question, FINGERPRINT, MODEL, 0.0) == RESPONSE, "Recently used entry evicted"
+    print("   ✓ Least recently used entry evicted\n")
+
+    # TTL expiry
+    print("4. Testing TTL expiry...")
+    short = ResponseCache(ttl_seconds=0.05)
+    short.put(question, FINGERPRINT, MODEL, 0.0, RESPONSE)
+    time.sleep(0.1)
+    assert short.get(question, FINGERPRINT, MODEL, 0.0) is None, "Expired entry served"
+    print("   ✓ Expired entry not served\n")
+
+    # Persistence across instances
+    print("5. Testing SQLite persistence...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'responses.db')
+
+        first = ResponseCache(db_path=db_path)
+        first.put(question, FINGERPRINT, MODEL, 0.0, RESPONSE)
+        first.close()
+
+        second = ResponseCache(db_path=db_path)
+        assert second.get(question, FINGERPRINT, MODEL, 0.0) == RESPONSE, "Entry lost on restart"
+        second.close()
+    print("   ✓ Entry survived a restart\n")
+
+    print("✅ RESPONSE CACHE TESTS PASSED\n")
+    return True
+
+
+def test_question_index():
+    """Test reuse of SQL for near-duplicate questions"""
+
+    print("=== TESTING QUESTION INDEX ===\n")
+
+    index = QuestionIndex(threshold=0.65)
+    index.add("How many USD transactions?",
+              "SELECT COUNT(*) FROM accrual_accounts WHERE Currency = 'USD'", FINGERPRINT)
+    index.add("What is the total value by country?",
+              "SELECT Country_Key, SUM(Transaction_Value) FROM accrual_accounts GROUP BY Country_Key",
+              FINGERPRINT)
+    index.add("How many transactions in fiscal year 2015?",
+              "SELECT COUNT(*) FROM accrual_accounts WHERE Fiscal_Year_1 = 2015", FINGERPRINT)
+
+    # Ranking
+    print("1. Testing top-k search...")
+    matches = index.search("what is the total transaction value by country", FINGERPRINT, k=2)
+    assert len(matches) == 2, f"Expected 2 matches, got {len(matches)}"
+    assert matches[0].question == "What is the total value by country?", "Wrong top match"
+    assert matches[0].score >= matches[1].score, "Matches not ordered by score"
+    print(f"   ✓ Top match: {matches[0].question} ({matches[0].score:.2f})\n")
+
+    # Paraphrases reuse SQL
+    print("2. Testing reuse for close paraphrases...")
+    match = index.best_match("how many usd transactions are there", FINGERPRINT)
+    assert match is not None and "'USD'" in match.sql, "Paraphrase not matched"
+    print(f"   ✓ Reused SQL at similarity {match.score:.2f}")
+
+    # Synonyms of the same aggregation and of "rows" are equivalent
+    for question in ["count of USD rows", "What is the number of USD records?"]:
+        match = index.best_match(question, FINGERPRINT)
+        assert match is not None and "'USD'" in match.sql, f"Synonym paraphrase not matched: {question}"
+    index.add("count of USD rows", "SELECT COUNT(*) FROM accrual_accounts WHERE Currency = 'USD'", "synonyms")
+    match = index.best_match("how many transactions are in USD", "synonyms")
+    assert match is not None and match.score > index.threshold, "Paraphrase with synonyms not matched"
+    assert index.best_match("sum of USD rows", "synonyms") is None, "Different aggregation reused"
+    print(f"   ✓ 'how many transactions are in USD' matched 'count of USD rows' at {match.score:.2f}\n")
+
+    # Similar wording with a different meaning is rejected
+    print("3. Testing rejection of different values...")
+    for question in ["How many CAD transactions?",
+                     "How many transactions in fiscal year 2016?",
+                     "What is the average value by country?"]:
+        assert index.best_match(question, FINGERPRINT) is None, f"Wrongly reused SQL for: {question}"
+    print("   ✓ Different currency, year and aggregation not reused\n")
+
+    # Other schemas are ignored and the index grows incrementally
+    print("4. Testing schema filter and incremental add...")
+    assert index.best_match("How many USD transactions?", "other-schema") is None, "Schema filter ignored"
+    index.add("How many CAD transactions?",
+              "SELECT COUNT(*) FROM accrual_accounts WHERE Currency = 'CAD'", FINGERPRINT)
+    match = index.best_match("how many CAD transactions", FINGERPRINT)
+    assert match is not None and "'CAD'" in match.sql, "New entry not searchable"
+    assert len(index) == 5, f"Expected 5 entries, got {len(index)}"
+    print("   ✓ New entry searchable immediately\n")
+
+    print("✅ QUESTION INDEX TESTS PASSED\n")
+    return True
+
+
+def test_result_cache():
+    """Test the SQL -> result frame cache and its invalidation on reload"""
+
+    print("=== TESTING RESULT CACHE ===\n")
+
+    # SQL normalization keeps literals intact
+    print("1. Testing SQL normalization...")
+    sql = "SELECT COUNT(*) FROM accrual_accounts WHERE Currency = 'USD'"
+    assert ResultCache.normalize_sql("SELECT  COUNT(*)\n  FROM accrual_accounts\nWHERE Currency = 'USD';") == sql, \
+        "Formatting not normalized"
+    assert ResultCache.normalize_sql("SELECT 'a  b'") != ResultCache.normalize_sql("SELECT 'a b'"), \
+        "Whitespace inside a literal collapsed"
+    print("   ✓ Whitespace and semicolons normalized outside literals\n")
+
+    # Hits are keyed on the data fingerprint
+    print("2. Testing hits and data fingerprint...")
+    cache = ResultCache()
+    result = pd.DataFrame({'n': [42]})
+    assert cache.get(sql, "data-v1") is None, "Empty cache returned a value"
+    cache.put(sql, "data-v1", result)
+    assert cache.get(sql + ";", "data-v1") is result, "Cached result not returned"
+    assert cache.get(sql, "data-v2") is None, "Data fingerprint ignored"
+    print(f"   ✓ Stats: {cache.stats()}\n")
+
+    # Byte-bounded LRU eviction
+    print("3. Testing byte-bounded eviction...")
+    frame = pd.DataFrame({'x': range(1000)})
+    size = int(frame.memory_usage(index=True, deep=True).sum())
+    small = ResultCache(max_bytes=size * 2)
+    small.put("SELECT 1", "d", frame)
+    small.put("SELECT 2", "d", frame)
+    small.get("SELECT 1", "d")
+    small.put("SELECT 3", "d", frame)
+    assert small.get("SELECT 2", "d") is None, "LRU result not evicted"
+    assert small.get("SELECT 1", "d") is not None, "Recently used result evicted"
+    assert small.stats()['size_bytes'] <= small.max_bytes, "Byte budget exceeded"
+    small.put("SELECT 4", "d", pd.DataFrame({'x': range(10000)}))
+    assert small.get("SELECT 4", "d") is None, "Oversized result cached"
+    print(f"   ✓ Kept {len(small)} results within {small.max_bytes} bytes\n")
+
+    # Reloading data invalidates results through the loader's listener
+    print("4. Testing invalidation on data reload...")
+    loader = DataLoader('Data Dump - Accrual Accounts.xlsx')
+    cache = ResultCache()
+    loader.add_reload_listener(
+        lambda l: cache.invalidate(keep_fingerprint=l.data_fingerprint)
+    )
+    loader.load_data()
+    fingerprint = loader.data_fingerprint
+    cache.put(sql, fingerprint, result)
+
+    loader.load_data()
+    assert loader.data_fingerprint == fingerprint, "Same data gave a different fingerprint"
+    assert cache.get(sql, fingerprint) is result, "Unchanged reload dropped results"
+
+    loader.df = loader.df.head(10)
+    assert loader._fingerprint_data(loader.df) != fingerprint, "Changed data kept its fingerprint"
+    cache.invalidate(keep_fingerprint=loader._fingerprint_data(loader.df))
+    assert len(cache) == 0, "Stale results not invalidated"
+    print("   ✓ Results kept for identical data and dropped for new data\n")
+
+    print("✅ RESULT CACHE TESTS PASSED\n")
+    return True
+
+
+if __name__ == '__main__':
+    try:
+        test_response_cache()
+        test_question_index()
+        test_result_cache()
+        print("="*50)
+        print("✅ ALL CACHE TESTS PASSED")
+        print("="*50)
+        sys.exit(0)
+    except AssertionError as e:
+        print(f'\n❌ CACHE TEST FAILED: {e}')
+        sys.exit(1)
+    except Exception as e:
+        print(f'\n❌ ERROR: {e}')
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
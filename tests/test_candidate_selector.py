@@ -0,0 +1,280 @@
+"""
+Candidate Selector Tests
+Tests generating several SQL candidates and keeping the first that validates
+and compiles, with a fake OpenAI client (no API calls).
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import pandas as pd
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from batch_runner import BatchRunner
+from candidate_selector import CandidateSelector
+from data_loader import DataLoader
+from llm_service_async import AsyncLLMService
+from query_engine import DuckDBEngine, SQLiteEngine
+from sql_validator import SQLValidator
+
+
+VALID = "SELECT Currency, COUNT(*) AS n FROM accrual_accounts GROUP BY Currency"
+UNKNOWN_COLUMN = "SELECT Currency_Code, COUNT(*) AS n FROM accrual_accounts GROUP BY Currency_Code"
+UNSAFE = "DELETE FROM accrual_accounts"
+
+
+class CountingEngine(SQLiteEngine):
+    """SQLite engine that counts dry runs and can slow them down."""
+
+    def __init__(self, delay: float = 0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.delay = delay
+        self.dry_runs = 0
+        self._count_lock = threading.Lock()
+
+    def dry_run(self, sql, timeout=None):
+        with self._count_lock:
+            self.dry_runs += 1
+        time.sleep(self.delay)
+        super().dry_run(sql, timeout=timeout)
+
+
+class RejectedCandidatesLLM:
+    """Returns candidates that never compile and fails every correction request."""
+
+    async def generate_candidates(self, prompts, n):
+        if "previous SQL query failed" in prompts['user']:
+            raise RuntimeError("correction unavailable")
+        return [f"```sql\n{UNKNOWN_COLUMN}\n```"] * n
+
+
+class RecordingHandler(logging.Handler):
+    """Keeps the messages of the records it handles."""
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class FakeCompletions:
+    """Stands in for client.chat.completions, returning one choice per candidate."""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.requests = []
+
+    async def create(self, **kwargs):
+        self.requests.append(kwargs)
+        choices = [
+            SimpleNamespace(message=SimpleNamespace(content=f"```sql\n{sql}\n```\n\nExplanation: test."))
+            for sql in self.answers[:kwargs.get('n', 1)]
+        ]
+        return SimpleNamespace(choices=choices, usage=None)
+
+
+def load_data():
+    """Load the accrual accounts workbook."""
+    loader = DataLoader('Data Dump - Accrual Accounts.xlsx')
+    loader.load_data()
+    return loader
+
+
+def test_dry_run():
+    """Test that dry runs catch mistakes without running the query"""
+
+    print("=== TESTING DRY RUNS ===\n")
+
+    df = pd.DataFrame({'Currency': ['USD', 'CAD'], 'Amount': [1.0, 2.0]})
+    for engine_class in (SQLiteEngine, DuckDBEngine):
+        engine = engine_class()
+        engine.load_table('orders', df)
+        try:
+            engine.dry_run("SELECT Currency, SUM(Amount) FROM orders GROUP BY Currency;")
+            for bad_sql in ("SELECT Region FROM orders", "SELECT * FROM returns", "SELECT FROM WHERE"):
+                try:
+                    engine.dry_run(bad_sql)
+                    raise AssertionError(f"{engine_class.__name__} accepted: {bad_sql}")
+                except AssertionError:
+                    raise
+                except Exception:
+                    pass
+        finally:
+            engine.close()
+        print(f"✓ {engine_class.__name__}: unknown columns, tables and syntax errors rejected")
+
+    print("\n✅ DRY RUN TESTS PASSED\n")
+    return True
+
+
+def test_selection():
+    """Test parallel checks, first-valid-wins and cancellation"""
+
+    print("=== TESTING CANDIDATE SELECTION ===\n")
+
+    loader = load_data()
+    engine = CountingEngine.from_loader(loader)
+    selector = CandidateSelector(SQLValidator(), engine)
+
+    try:
+        # Unsafe and uncompilable candidates lose to a valid one
+        print("1. Testing selection...")
+        selection = selector.select([UNSAFE, UNKNOWN_COLUMN, VALID])
+        assert selection.found and selection.index == 2, f"Wrong candidate: {selection}"
+        is_valid, error = selector.check(UNKNOWN_COLUMN)
+        assert not is_valid and "does not compile" in error, f"Dry run error missing: {error}"
+        assert not selector.check(UNSAFE)[0], "Unsafe SQL passed"
+        print(f"   ✓ Candidate 3 selected; rejected: {error[:60]}...\n")
+
+        # Without a valid candidate the earliest error is kept for the correction
+        print("2. Testing all candidates rejected...")
+        selection = selector.select([UNKNOWN_COLUMN, UNSAFE])
+        assert not selection.found, "Invalid candidate selected"
+        index, error = selection.first_error()
+        assert index == 0 and "Currency_Code" in error, f"Wrong first error: {index} {error}"
+        print(f"   ✓ First error: {error[:60]}...\n")
+
+        # Duplicates are checked once
+        print("3. Testing duplicates...")
+        engine.dry_runs = 0
+        selection = selector.select([VALID, VALID + ";", "  " + VALID.lower()])
+        assert selection.index == 0 and engine.dry_runs == 1, f"Duplicates checked: {engine.dry_runs}"
+        print("   ✓ Three identical candidates, one dry run\n")
+
+        # Checks that have not started are cancelled once one passes
+        print("4. Testing cancellation...")
+        slow_engine = CountingEngine.from_loader(loader, delay=0.2)
+        one_worker = CandidateSelector(SQLValidator(), slow_engine, max_workers=1)
+        try:
+            candidates = [VALID + f" ORDER BY n LIMIT {limit}" for limit in range(1, 7)]
+            start = time.perf_counter()
+            selection = one_worker.select(candidates)
+            elapsed = time.perf_counter() - start
+            assert selection.index == 0, f"Wrong candidate: {selection}"
+            # The worker may pick up the next check before it is cancelled
+            assert slow_engine.dry_runs <= 2, f"{slow_engine.dry_runs} of 6 candidates checked"
+            print(f"   ✓ {slow_engine.dry_runs} of 6 candidates checked in {elapsed:.2f}s\n")
+
+            slow_engine.dry_runs = 0
+            selection = asyncio.run(one_worker.select_async(candidates))
+            assert selection.index == 0 and slow_engine.dry_runs <= 2, \
+                f"Async selection checked {slow_engine.dry_runs} candidates"
+            print("   ✓ Same from the event loop\n")
+        finally:
+            one_worker.close()
+            slow_engine.close()
+
+        # Parallel checks take about as long as the slowest one
+        print("5. Testing parallel checks...")
+        slow_engine = CountingEngine.from_loader(loader, delay=0.2)
+        parallel = CandidateSelector(SQLValidator(), slow_engine, max_workers=4)
+        try:
+            start = time.perf_counter()
+            selection = parallel.select([UNKNOWN_COLUMN + " -- 1", UNKNOWN_COLUMN + " -- 2",
+                                         UNKNOWN_COLUMN + " -- 3", UNKNOWN_COLUMN + " -- 4"])
+            elapsed = time.perf_counter() - start
+            assert len(selection.errors) == 4, f"Not all candidates checked: {selection}"
+            assert elapsed < 4 * 0.2, f"Candidates checked serially ({elapsed:.2f}s)"
+            print(f"   ✓ 4 dry runs in {elapsed:.2f}s\n")
+        finally:
+            parallel.close()
+            slow_engine.close()
+    finally:
+        selector.close()
+        engine.close()
+
+    print("✅ CANDIDATE SELECTION TESTS PASSED\n")
+    return True
+
+
+def test_candidate_generation():
+    """Test requesting candidates in one call and using them in the batch runner"""
+
+    print("=== TESTING CANDIDATE GENERATION ===\n")
+
+    # One request with n choices, sampled above temperature 0
+    print("1. Testing the n parameter...")
+    completions = FakeCompletions([UNKNOWN_COLUMN, VALID, VALID])
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    service = AsyncLLMService(client=client, max_concurrency=2)
+    responses = asyncio.run(service.generate_candidates({'system': 'sys', 'user': 'q'}, 3))
+    request = completions.requests[-1]
+    assert len(responses) == 3 and len(completions.requests) == 1, "Candidates not from one request"
+    assert request['n'] == 3 and request['temperature'] == service.candidate_temperature, \
+        f"Wrong request options: n={request.get('n')}, temperature={request['temperature']}"
+    asyncio.run(service.generate_sql('sys', 'q'))
+    assert 'n' not in completions.requests[-1] and \
+        completions.requests[-1]['temperature'] == service.temperature, "Single answers changed"
+    print(f"   ✓ 3 candidates from one request at temperature {service.candidate_temperature}\n")
+
+    # The batch runner answers from the first candidate that compiles
+    print("2. Testing the batch runner...")
+    loader = load_data()
+    engine = SQLiteEngine.from_loader(loader)
+    runner = BatchRunner(loader, service, engine, candidates=3)
+    requests_before = len(completions.requests)
+    try:
+        async def answer():
+            return [result async for result in runner.run(["How many rows per currency?"])]
+
+        result = asyncio.run(answer())[0]
+        assert result.status == "ok", f"Question failed: {result.error}"
+        assert result.sql == VALID and result.row_count == 2, f"Wrong answer: {result.sql}"
+        assert len(completions.requests) == requests_before + 1, "A correction was requested"
+        print(f"   ✓ Answered with candidate 2 and no correction: {result.sql}\n")
+    finally:
+        runner.candidate_selector.close()
+
+    # A rejected candidate's position must not replace the question's position
+    print("3. Testing failures on later questions...")
+    runner = BatchRunner(loader, RejectedCandidatesLLM(), engine, candidates=2)
+    handler = RecordingHandler()
+    logging.getLogger("batch_runner").addHandler(handler)
+    questions = ["Rows per currency?", "Rows per company code?", "Rows per account?"]
+    try:
+        async def answer_all():
+            return [result async for result in runner.run(questions)]
+
+        results = asyncio.run(answer_all())
+        assert sorted(r.index for r in results) == [0, 1, 2], f"Wrong indexes: {[r.index for r in results]}"
+        assert all(r.status == "error" and questions[r.index] == r.question for r in results), \
+            "Result not matched to its question"
+        failures = sorted(m for m in handler.messages if "failed" in m)
+        assert failures == [f"Question {i} failed: correction unavailable" for i in range(3)], \
+            f"Wrong failure log: {failures}"
+        print("   ✓ Failures logged for questions 0, 1 and 2\n")
+    finally:
+        logging.getLogger("batch_runner").removeHandler(handler)
+        runner.candidate_selector.close()
+        engine.close()
+
+    print("✅ CANDIDATE GENERATION TESTS PASSED\n")
+    return True
+
+
+if __name__ == '__main__':
+    try:
+        test_dry_run()
+        test_selection()
+        test_candidate_generation()
+        print("="*50)
+        print("✅ ALL CANDIDATE SELECTOR TESTS PASSED")
+        print("="*50)
+        sys.exit(0)
+    except AssertionError as e:
+        print(f'\n❌ CANDIDATE SELECTOR TEST FAILED: {e}')
+        sys.exit(1)
+    except Exception as e:
+        print(f'\n❌ ERROR: {e}')
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,154 @@
+"""
+Data Catalog Tests
+Tests loading several sheets and files into tables that are queried together.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from data_catalog import DataCatalog
+from data_loader import DataLoader
+from query_engine import create_query_engine
+
+
+def write_workbooks(tmp: str):
+    """Write a two-sheet workbook and a single-sheet workbook of related data."""
+    accruals = pd.read_excel('Data Dump - Accrual Accounts.xlsx', nrows=500)
+    line_items = sorted(accruals['Ref. Doc. Line Item'].unique())
+
+    master_path = os.path.join(tmp, 'master.xlsx')
+    with pd.ExcelWriter(master_path) as writer:
+        accruals.to_excel(writer, sheet_name='Accruals', index=False)
+        pd.DataFrame({
+            'Line Item': line_items,
+            'Vendor Name': [f'Vendor {i % 7}' for i in range(len(line_items))],
+        }).to_excel(writer, sheet_name='Vendor List', index=False)
+
+    gl_path = os.path.join(tmp, 'gl.xlsx')
+    pd.DataFrame({
+        'Currency': ['USD', 'CAD'],
+        'GL Account': [210000, 210100],
+    }).to_excel(gl_path, index=False)
+
+    return master_path, gl_path
+
+
+def test_catalog_loading():
+    """Test loading sheets and files in parallel into one execution store"""
+
+    print("=== TESTING DATA CATALOG LOADING ===\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        master_path, gl_path = write_workbooks(tmp)
+        cache_dir = os.path.join(tmp, 'cache')
+        spec = (f"accruals={master_path}#Accruals; vendors={master_path}#Vendor List; "
+                f"gl_mapping={gl_path}")
+
+        # Every table gets its own loader, cache entry and profile
+        print("1. Testing parallel load...")
+        catalog = DataCatalog.from_spec(spec, cache_dir=cache_dir)
+        catalog.max_workers = 2  # Parse the uncached workbooks in worker processes
+        frames = catalog.load_data()
+
+        assert list(frames) == ['accruals', 'vendors', 'gl_mapping'], f"Unexpected tables: {list(frames)}"
+        assert len(frames['accruals']) == 500 and len(frames['gl_mapping']) == 2, "Wrong row counts"
+        assert [p.table_name for p in catalog.schema_profiles] == catalog.table_names, "Profiles out of order"
+        assert len(os.listdir(cache_dir)) == 3, f"Expected one cache entry per table: {os.listdir(cache_dir)}"
+        print(f"   ✓ Loaded {', '.join(catalog.table_names)} with {len(os.listdir(cache_dir))} cache entries\n")
+
+        # Tables can be joined in the same store
+        print("2. Testing joins across tables...")
+        engine = create_query_engine(catalog, backend="sqlite")
+        try:
+            assert engine.list_tables() == ['accruals', 'gl_mapping', 'vendors'], \
+                f"Unexpected store tables: {engine.list_tables()}"
+            joined = engine.execute(
+                "SELECT v.Vendor_Name, g.GL_Account, COUNT(*) AS n "
+                "FROM accruals a "
+                "JOIN vendors v ON a.Ref__Doc__Line_Item = v.Line_Item "
+                "JOIN gl_mapping g ON a.Currency = g.Currency "
+                "GROUP BY v.Vendor_Name, g.GL_Account"
+            )
+            assert joined['n'].sum() == 500, f"Join lost rows: {joined['n'].sum()}"
+        finally:
+            engine.close()
+        print(f"   ✓ Three-way join returned {len(joined)} groups covering all 500 rows\n")
+
+        # Warm loads come from the per-table cache entries
+        print("3. Testing warm load...")
+        warm = DataCatalog.from_spec(spec, cache_dir=cache_dir)
+        warm.load_data()
+        assert warm.data_fingerprint == catalog.data_fingerprint, "Warm load changed the data"
+        assert warm.schema_fingerprint == catalog.schema_fingerprint, "Warm load changed the schema"
+        print("   ✓ Same data and schema fingerprints from the cache\n")
+
+    print("✅ DATA CATALOG LOADING TESTS PASSED\n")
+    return True
+
+
+def test_combined_schema():
+    """Test the combined schema description and catalog configuration"""
+
+    print("=== TESTING COMBINED SCHEMA ===\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        master_path, gl_path = write_workbooks(tmp)
+
+        # One table per worksheet, named after the sheet
+        print("1. Testing combined description...")
+        catalog = DataCatalog.from_workbook(master_path)
+        catalog.load_data()
+        assert catalog.table_names == ['accruals', 'vendor_list'], f"Unexpected names: {catalog.table_names}"
+
+        description = catalog.get_schema_description()
+        for profile in catalog.schema_profiles:
+            assert profile.description in description, f"{profile.table_name} missing from schema"
+        subset = catalog.get_schema_description(tables=['VENDOR_LIST'])
+        assert subset == catalog.get_loader('vendor_list').get_schema_description(), "Subset not rendered alone"
+        print(f"   ✓ {len(catalog.table_names)} tables described, subsets on request\n")
+
+        # A single-table catalog keeps the cache keys of a plain loader
+        print("2. Testing single-table compatibility...")
+        single = DataCatalog.from_spec(f"accrual_accounts={master_path}#Accruals")
+        single.load_data()
+        loader = DataLoader(master_path, sheet_name='Accruals')
+        loader.load_data()
+        assert single.schema_fingerprint == loader.schema_fingerprint, "Single-table schema key changed"
+        print("   ✓ Same schema fingerprint as a DataLoader\n")
+
+        # Invalid configurations are rejected
+        print("3. Testing configuration errors...")
+        for spec in [f"a={gl_path}; A={master_path}", "no_path=", f"{gl_path}"]:
+            try:
+                DataCatalog.from_spec(spec)
+                raise AssertionError(f"Invalid spec accepted: {spec}")
+            except ValueError as e:
+                print(f"   ✓ Rejected: {e}")
+
+    print("\n✅ COMBINED SCHEMA TESTS PASSED\n")
+    return True
+
+
+if __name__ == '__main__':
+    try:
+        test_catalog_loading()
+        test_combined_schema()
+        print("="*50)
+        print("✅ ALL DATA CATALOG TESTS PASSED")
+        print("="*50)
+        sys.exit(0)
+    except AssertionError as e:
+        print(f'\n❌ DATA CATALOG TEST FAILED: {e}')
+        sys.exit(1)
+    except Exception as e:
+        print(f'\n❌ ERROR: {e}')
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
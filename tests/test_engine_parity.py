@@ -0,0 +1,126 @@
+"""
+Query Engine Parity Tests
+Checks that the SQLite and DuckDB backends return the same results
+for the example questions shown in the app.
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from data_loader import DataLoader
+from query_engine import SQLiteEngine, DuckDBEngine
+
+
+# Example questions from the app sidebar with the SQL they should produce
+EXAMPLE_QUERIES = [
+    ("How many rows are in the dataset?",
+     "SELECT COUNT(*) AS row_count FROM accrual_accounts"),
+    ("What are the unique currencies?",
+     "SELECT DISTINCT Currency FROM accrual_accounts ORDER BY Currency"),
+    ("How many USD transactions?",
+     "SELECT COUNT(*) AS usd_count FROM accrual_accounts WHERE Currency = 'USD'"),
+    ("Show me top 5 rows by transaction value",
+     "SELECT * FROM accrual_accounts ORDER BY Transaction_Value DESC LIMIT 5"),
+    ("What is the average transaction value?",
+     "SELECT AVG(Transaction_Value) AS avg_value FROM accrual_accounts"),
+    ("Show me transaction count by currency",
+     "SELECT Currency, COUNT(*) AS n FROM accrual_accounts GROUP BY Currency ORDER BY Currency"),
+    ("What countries are in the dataset?",
+     "SELECT DISTINCT Country_Key FROM accrual_accounts ORDER BY Country_Key"),
+    ("How many transactions in fiscal year 2015?",
+     "SELECT COUNT(*) AS n FROM accrual_accounts WHERE Fiscal_Year_1 = 2015"),
+    ("What is the total value by country?",
+     "SELECT Country_Key, SUM(Transaction_Value) AS total FROM accrual_accounts "
+     "GROUP BY Country_Key ORDER BY Country_Key"),
+]
+
+
+def normalize_result(df: pd.DataFrame) -> list:
+    """
+    Convert a result frame into plain comparable rows.
+
+    SQLite has no boolean or timestamp types, so booleans come back as
+    integers and timestamps as text; DuckDB keeps the native types.
+    """
+    rows = []
+    for record in df.to_dict(orient='records'):
+        row = []
+        for value in record.values():
+            if value is None or (not isinstance(value, str) and pd.isna(value)):
+                row.append(None)
+            elif isinstance(value, pd.Timestamp):
+                row.append(value.strftime('%Y-%m-%d %H:%M:%S'))
+            elif isinstance(value, (bool, int, float)) or hasattr(value, 'item'):
+                row.append(round(float(value), 4))
+            else:
+                row.append(str(value))
+        rows.append(row)
+    return rows
+
+
+def test_engine_parity():
+    """Test that both backends agree on every example question"""
+
+    print("=== TESTING QUERY ENGINE PARITY ===\n")
+
+    try:
+        import duckdb  # noqa: F401
+    except ImportError:
+        print("⚠️  duckdb not installed, skipping parity tests\n")
+        return True
+
+    loader = DataLoader('Data Dump - Accrual Accounts.xlsx')
+    loader.load_data()
+
+    sqlite_engine = SQLiteEngine.from_loader(loader)
+    duckdb_engine = DuckDBEngine.from_loader(loader)
+
+    mismatches = []
+
+    try:
+        for i, (question, sql) in enumerate(EXAMPLE_QUERIES, 1):
+            sqlite_result = sqlite_engine.execute(sql)
+            duckdb_result = duckdb_engine.execute(sql)
+
+            same_columns = list(sqlite_result.columns) == list(duckdb_result.columns)
+            same_rows = normalize_result(sqlite_result) == normalize_result(duckdb_result)
+
+            if same_columns and same_rows:
+                print(f"✓ {i}. {question} ({len(sqlite_result)} rows)")
+            else:
+                print(f"✗ {i}. {question}")
+                print(f"  SQLite:\n{sqlite_result}")
+                print(f"  DuckDB:\n{duckdb_result}")
+                mismatches.append(question)
+    finally:
+        sqlite_engine.close()
+        duckdb_engine.close()
+
+    print(f"\nMatching results: {len(EXAMPLE_QUERIES) - len(mismatches)}/{len(EXAMPLE_QUERIES)}")
+
+    assert not mismatches, f"Backends disagree on: {mismatches}"
+
+    print("✅ QUERY ENGINE PARITY TESTS PASSED\n")
+    return True
+
+
+if __name__ == '__main__':
+    try:
+        test_engine_parity()
+        print("="*50)
+        print("✅ ALL PARITY TESTS PASSED")
+        print("="*50)
+        sys.exit(0)
+    except AssertionError as e:
+        print(f'\n❌ PARITY TEST FAILED: {e}')
+        sys.exit(1)
+    except Exception as e:
+        print(f'\n❌ ERROR: {e}')
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,179 @@
+"""
+Incremental Reload Tests
+Tests row-level diffs and refreshing changed workbooks without a full reload.
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from data_loader import DataLoader
+from query_engine import DuckDBEngine, SQLiteEngine
+from schema_profile import SchemaProfile
+from table_diff import diff_tables
+
+
+def write_workbook(df: pd.DataFrame, path: str) -> None:
+    """Save a workbook the way Excel does (write aside, then replace) with a new mtime."""
+    previous = os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+    df.to_excel(path + '.tmp.xlsx', index=False)
+    os.utime(path + '.tmp.xlsx', ns=(previous + 10**9, previous + 10**9))
+    os.replace(path + '.tmp.xlsx', path)
+
+
+def sorted_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """Rows in a canonical order, for comparing tables without ORDER BY."""
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+def test_table_diff():
+    """Test row-level diffs with and without key columns"""
+
+    print("=== TESTING TABLE DIFF ===\n")
+
+    old = pd.DataFrame({'id': [1, 2, 3, 4, 4], 'value': [10.0, 20.0, 30.0, 40.0, 40.0]})
+    new = pd.DataFrame({'id': [2, 3, 4, 5], 'value': [20.0, 33.0, 40.0, 50.0]})
+
+    # Without a key, a changed row is a delete plus an insert
+    print("1. Testing content matching...")
+    changes = diff_tables(old, new)
+    assert changes.deleted.tolist() == [0, 2, 4], f"Wrong deletes: {changes.deleted}"
+    assert changes.inserted.tolist() == [1, 3], f"Wrong inserts: {changes.inserted}"
+    assert changes.source_positions.tolist() == [1, -1, 3, -1], f"Wrong matches: {changes.source_positions}"
+    assert len(changes.updated) == 0, "Updates reported without a key"
+    print(f"   ✓ {changes} (duplicate rows matched one to one)\n")
+
+    # With a key, changed rows are updates
+    print("2. Testing key matching...")
+    keyed_old = old.drop_duplicates().reset_index(drop=True)
+    changes = diff_tables(keyed_old, new, key_columns=['id'])
+    assert changes.updated.tolist() == [1], f"Wrong updates: {changes.updated}"
+    assert changes.deleted.tolist() == [0] and changes.inserted.tolist() == [3], f"Wrong changes: {changes}"
+    assert changes.removed_rows(keyed_old)['id'].tolist() == [1, 3], "Wrong removed rows"
+    assert changes.added_rows(new)['id'].tolist() == [3, 5], "Wrong added rows"
+    print(f"   ✓ {changes}\n")
+
+    # Type drift between reads is not a change
+    print("3. Testing dtype independence...")
+    drifted = pd.DataFrame({'id': [2.0, 3.0, 4.0, 5.0], 'value': [20.0, 33.0, 40.0, 50.0]})
+    assert diff_tables(new, drifted).is_empty, "Integers read as floats reported as changes"
+    try:
+        diff_tables(old, new, key_columns=['id'])
+        raise AssertionError("Duplicate key accepted")
+    except ValueError as e:
+        print(f"   ✓ Same rows across dtypes; rejected: {e}\n")
+
+    print("✅ TABLE DIFF TESTS PASSED\n")
+    return True
+
+
+def test_refresh():
+    """Test applying a changed workbook to the loader, profile and store"""
+
+    print("=== TESTING INCREMENTAL REFRESH ===\n")
+
+    original = pd.read_excel('Data Dump - Accrual Accounts.xlsx', nrows=2000).drop(columns='Unnamed: 0')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'data.xlsx')
+        write_workbook(original, path)
+
+        loader = DataLoader(path, cache_dir=os.path.join(tmp, 'cache'))
+        loader.load_data()
+        sqlite = SQLiteEngine.from_loader(loader)
+        duckdb = DuckDBEngine.from_loader(loader)
+
+        # Same listener as the app: apply changes when there are any
+        def on_reload(reloaded):
+            for engine in (sqlite, duckdb):
+                if reloaded.last_changes is not None:
+                    engine.apply_changes(reloaded.table_name, reloaded.df, reloaded.last_changes)
+                else:
+                    engine.load_table(reloaded.table_name, reloaded.df)
+
+        loader.add_reload_listener(on_reload)
+
+        try:
+            print("1. Testing unchanged workbook...")
+            assert loader.refresh() is None, "Unchanged workbook reloaded"
+            print("   ✓ No reload without a change\n")
+
+            # Delete, edit and append rows
+            print("2. Testing refresh with changes...")
+            updated = original.drop(index=range(100, 150)).copy()
+            updated.loc[500:509, 'Transaction Value'] = updated.loc[500:509, 'Transaction Value'] * 2 + 1
+            extra = original.iloc[:25].assign(**{'Fiscal Year.2': 2030})
+            updated = pd.concat([updated, extra], ignore_index=True)
+            write_workbook(updated, path)
+
+            changes = loader.refresh()
+            assert len(changes.deleted) == 60 and len(changes.inserted) == 35, f"Unexpected changes: {changes}"
+
+            fresh = DataLoader(path)
+            fresh.load_data()
+            assert loader.df.equals(fresh.df), "Refreshed data differs from the workbook"
+            assert loader.schema_fingerprint == fresh.schema_fingerprint, "Incremental profile differs"
+            assert loader.schema_profile == SchemaProfile.from_dataframe(fresh.df, fresh.table_name), \
+                "Incremental profile differs from a rebuilt one"
+            assert loader.data_fingerprint == fresh.data_fingerprint, "Data fingerprint not updated"
+            print(f"   ✓ {changes}; profile and fingerprints match a fresh load\n")
+
+            # The store received only the changed rows
+            print("3. Testing the query stores...")
+            for engine in (sqlite, duckdb):
+                reference = type(engine).from_loader(fresh)
+                try:
+                    expected = reference.execute("SELECT * FROM accrual_accounts")
+                finally:
+                    reference.close()
+                stored = engine.execute("SELECT * FROM accrual_accounts")
+                assert sorted_rows(stored).equals(sorted_rows(expected)), f"{type(engine).__name__} out of date"
+            max_rowid = sqlite.execute("SELECT MAX(rowid) AS id FROM accrual_accounts")['id'][0]
+            assert max_rowid == len(original) + 35, f"Table was rewritten (max rowid {max_rowid})"
+            print("   ✓ Both stores match the workbook; SQLite kept the rowids of unchanged rows\n")
+
+            # The watcher picks up the next change on its own
+            print("4. Testing the watcher...")
+            fingerprint = loader.data_fingerprint
+            loader.start_watching(interval=0.1)
+            write_workbook(updated.iloc[:-5], path)
+            deadline = time.monotonic() + 30
+            while loader.data_fingerprint == fingerprint and time.monotonic() < deadline:
+                time.sleep(0.1)
+            loader.stop_watching()
+            assert len(loader.df) == len(updated) - 5, "Watcher did not refresh the data"
+            count = sqlite.execute("SELECT COUNT(*) AS n FROM accrual_accounts")['n'][0]
+            assert count == len(updated) - 5, f"Watcher did not update the store: {count}"
+            print("   ✓ Deleted rows applied in the background\n")
+        finally:
+            loader.stop_watching()
+            sqlite.close()
+            duckdb.close()
+
+    print("✅ INCREMENTAL REFRESH TESTS PASSED\n")
+    return True
+
+
+if __name__ == '__main__':
+    try:
+        test_table_diff()
+        test_refresh()
+        print("="*50)
+        print("✅ ALL INCREMENTAL RELOAD TESTS PASSED")
+        print("="*50)
+        sys.exit(0)
+    except AssertionError as e:
+        print(f'\n❌ INCREMENTAL RELOAD TEST FAILED: {e}')
+        sys.exit(1)
+    except Exception as e:
+        print(f'\n❌ ERROR: {e}')
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
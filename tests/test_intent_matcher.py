@@ -0,0 +1,149 @@
+"""
+Intent Matcher Tests
+Tests answering common question patterns without the LLM.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from data_loader import DataLoader
+from intent_matcher import IntentMatcher
+from query_engine import SQLiteEngine
+from schema_profile import SchemaProfile
+
+
+def load_data():
+    """Load the accrual accounts workbook."""
+    loader = DataLoader('Data Dump - Accrual Accounts.xlsx')
+    loader.load_data()
+    return loader
+
+
+def test_patterns():
+    """Test that matched questions return the same results as hand-written SQL"""
+
+    print("=== TESTING INTENT PATTERNS ===\n")
+
+    loader = load_data()
+    matcher = IntentMatcher(loader.schema_profiles)
+    engine = SQLiteEngine.from_loader(loader)
+
+    cases = [
+        ("How many rows are there?", 'row_count',
+         "SELECT COUNT(*) FROM accrual_accounts"),
+        ("How many USD transactions?", 'row_count',
+         "SELECT COUNT(*) FROM accrual_accounts WHERE Currency = 'USD'"),
+        ("How many CAD rows with business transaction type RFBU?", 'row_count',
+         "SELECT COUNT(*) FROM accrual_accounts WHERE Currency = 'CAD' AND Bus__Transac__Type = 'RFBU'"),
+        ("How many transactions per currency?", 'row_count',
+         "SELECT Currency, COUNT(*) FROM accrual_accounts GROUP BY Currency ORDER BY Currency"),
+        ("How many distinct currencies are there?", 'distinct_count',
+         "SELECT COUNT(DISTINCT Currency) FROM accrual_accounts"),
+        ("List the distinct currencies", 'distinct_values',
+         "SELECT DISTINCT Currency FROM accrual_accounts ORDER BY Currency"),
+        ("What is the average exchange rate?", 'aggregate',
+         "SELECT AVG(Exchange_rate) FROM accrual_accounts"),
+        ("What is the total value by country?", 'aggregate',
+         "SELECT Country_Key, SUM(Transaction_Value) FROM accrual_accounts "
+         "GROUP BY Country_Key ORDER BY Country_Key"),
+    ]
+
+    try:
+        # Every pattern gives the same rows as the query written by hand
+        print("1. Testing matched questions...")
+        for question, intent, expected_sql in cases:
+            match = matcher.match(question)
+            assert match is not None, f"'{question}' not matched"
+            assert match.intent == intent, f"'{question}' matched {match.intent}, expected {intent}"
+            assert match.table_name == 'accrual_accounts', f"Wrong table {match.table_name}"
+
+            result = engine.execute(match.sql)
+            expected = engine.execute(expected_sql)
+            assert result.shape == expected.shape, f"'{question}': shape {result.shape} != {expected.shape}"
+            assert (result.values == expected.values).all(), f"'{question}': {match.sql} gave other rows"
+            print(f"   ✓ '{question}' -> {match.sql}")
+
+        # Anything the patterns cannot answer with certainty goes to the LLM
+        print("\n2. Testing fallbacks...")
+        fallbacks = [
+            "Show the top 5 documents",
+            "What is the total by fiscal year?",
+            "How many rows were posted in 2019?",
+            "Which vendor has the highest balance?",
+            "Why are some accruals not cleared?",
+            "",
+        ]
+        for question in fallbacks:
+            assert matcher.match(question) is None, f"'{question}' should not match"
+        assert matcher.match("Show us the USD rows") is None, "Country code 'US' matched 'show us'"
+        print(f"   ✓ {len(fallbacks) + 1} questions left to the LLM\n")
+
+        # Matching is cheap next to an LLM call
+        print("3. Testing speed...")
+        questions = [question for question, _, _ in cases] + fallbacks
+        start = time.perf_counter()
+        for _ in range(50):
+            for question in questions:
+                matcher.match(question)
+        average = (time.perf_counter() - start) / (50 * len(questions))
+        assert average < 0.001, f"Matching takes {average * 1000:.2f} ms per question"
+        print(f"   ✓ {average * 1e6:.0f} µs per question\n")
+    finally:
+        engine.close()
+
+    print("✅ INTENT PATTERN TESTS PASSED\n")
+    return True
+
+
+def test_profiles():
+    """Test updating profiles and questions spanning several tables"""
+
+    print("=== TESTING INTENT PROFILES ===\n")
+
+    orders = pd.DataFrame({'Region': ['North', 'South', 'North'], 'Amount': [10.0, 20.0, 30.0]})
+    matcher = IntentMatcher([SchemaProfile.from_dataframe(orders, 'orders')])
+
+    # Values appear after a reload
+    print("1. Testing add_profile...")
+    assert matcher.match("How many West orders?") is None, "Unknown value matched"
+    orders = pd.concat([orders, pd.DataFrame({'Region': ['West'], 'Amount': [5.0]})], ignore_index=True)
+    matcher.add_profile(SchemaProfile.from_dataframe(orders, 'orders'))
+    match = matcher.match("How many West orders?")
+    assert match is not None and "Region = 'West'" in match.sql, f"Reloaded value not matched: {match}"
+    print(f"   ✓ {match.sql}\n")
+
+    # A question that fits more than one table is ambiguous
+    print("2. Testing several tables...")
+    matcher.add_profile(SchemaProfile.from_dataframe(orders.rename(columns={'Amount': 'Cost'}), 'returns'))
+    assert matcher.match("How many rows are there?") is None, "Ambiguous table matched"
+    assert matcher.match("What is the total amount by region?") is None, "Unnamed table matched"
+    match = matcher.match("What is the total amount of orders by region?")
+    assert match is not None and match.table_name == 'orders', f"Wrong table: {match}"
+    print(f"   ✓ Only a named table matches: {match.sql}\n")
+
+    print("✅ INTENT PROFILE TESTS PASSED\n")
+    return True
+
+
+if __name__ == '__main__':
+    try:
+        test_patterns()
+        test_profiles()
+        print("="*50)
+        print("✅ ALL INTENT MATCHER TESTS PASSED")
+        print("="*50)
+        sys.exit(0)
+    except AssertionError as e:
+        print(f'\n❌ INTENT MATCHER TEST FAILED: {e}')
+        sys.exit(1)
+    except Exception as e:
+        print(f'\n❌ ERROR: {e}')
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
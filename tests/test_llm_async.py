@@ -0,0 +1,201 @@
+"""
+Async LLM Service Tests
+Tests concurrency limits and non-blocking retries with a fake OpenAI client.
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from llm_service_async import AsyncLLMService
+
+
+class FakeCompletions:
+    """Stands in for client.chat.completions, recording concurrency."""
+
+    def __init__(self, delay: float = 0.05, failures: int = 0, cached_tokens: int = None):
+        self.delay = delay
+        self.failures = failures
+        self.cached_tokens = cached_tokens
+        self.cache_keys = []
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.failures > 0:
+                self.failures -= 1
+                raise RuntimeError("rate limited")
+            question = kwargs['messages'][1]['content']
+            message = SimpleNamespace(content=f"```sql\nSELECT '{question}';\n```")
+            self.cache_keys.append(kwargs.get('extra_body', {}).get('prompt_cache_key'))
+
+            usage = None
+            if self.cached_tokens is not None:
+                # The first request with a key fills the cache, later ones hit it
+                cached = self.cached_tokens if self.cache_keys.count(self.cache_keys[-1]) > 1 else 0
+                usage = SimpleNamespace(
+                    prompt_tokens=1200, completion_tokens=20, total_tokens=1220,
+                    prompt_tokens_details=SimpleNamespace(cached_tokens=cached)
+                )
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+        finally:
+            self.in_flight -= 1
+
+
+def make_service(completions: FakeCompletions, max_concurrency: int) -> AsyncLLMService:
+    """Build a service around a fake client."""
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return AsyncLLMService(client=client, max_concurrency=max_concurrency)
+
+
+class OldSDKCompletions:
+    """Stands in for an SDK release whose create() has no prompt_cache_key keyword."""
+
+    def __init__(self):
+        self.calls = 0
+        self.extra_bodies = []
+
+    async def create(self, *, model, messages, temperature, max_tokens, timeout, n=None, extra_body=None):
+        self.calls += 1
+        self.extra_bodies.append(extra_body)
+        message = SimpleNamespace(content="```sql\nSELECT 1;\n```")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+class RejectingCompletions:
+    """Rejects the arguments of every request, as an SDK does for an unknown keyword."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        raise TypeError("create() got an unexpected keyword argument")
+
+
+def test_concurrency_limit():
+    """Test that many generations run concurrently up to the limit"""
+
+    print("=== TESTING ASYNC CONCURRENCY LIMIT ===\n")
+
+    completions = FakeCompletions(delay=0.05)
+    service = make_service(completions, max_concurrency=4)
+    prompts = [{'system': 'sys', 'user': f'q{i}'} for i in range(12)]
+
+    start = time.perf_counter()
+    responses = asyncio.run(service.generate_many(prompts))
+    elapsed = time.perf_counter() - start
+
+    assert len(responses) == 12, "Missing responses"
+    assert all(f"'q{i}'" in r for i, r in enumerate(responses)), "Responses out of order"
+    assert completions.max_in_flight == 4, f"Expected 4 in flight, saw {completions.max_in_flight}"
+    assert elapsed < 12 * 0.05, f"Requests ran serially ({elapsed:.2f}s)"
+
+    print(f"✓ 12 requests, max 4 in flight, {elapsed:.2f}s total")
+    print("✅ ASYNC CONCURRENCY TESTS PASSED\n")
+    return True
+
+
+def test_non_blocking_retry():
+    """Test that a retrying request does not hold up the others"""
+
+    print("=== TESTING NON-BLOCKING RETRY ===\n")
+
+    completions = FakeCompletions(delay=0.01, failures=1)
+    service = make_service(completions, max_concurrency=2)
+    service.backoff_base = 0.2
+
+    async def run():
+        finished = []
+
+        async def ask(name):
+            await service.generate_sql('sys', name)
+            finished.append(name)
+
+        await asyncio.gather(ask('first'), *(ask(f'other{i}') for i in range(4)))
+        return finished
+
+    finished = asyncio.run(run())
+
+    assert completions.calls == 6, f"Expected 6 calls (one retry), got {completions.calls}"
+    assert len(finished) == 5, "Not all requests finished"
+
+    print(f"✓ Retry completed, finish order: {finished}")
+    print("✅ NON-BLOCKING RETRY TESTS PASSED\n")
+    return True
+
+
+def test_prompt_cache_stats():
+    """Test that prefix cache keys are sent and cached tokens are counted"""
+
+    print("=== TESTING PROMPT CACHE STATISTICS ===\n")
+
+    completions = FakeCompletions(delay=0.0, cached_tokens=1024)
+    service = make_service(completions, max_concurrency=4)
+    prompts = [{'system': 'sys', 'user': f'q{i}', 'cache_key': 'sql-abc'} for i in range(4)]
+    prompts.append({'system': 'sys', 'user': 'plain'})
+
+    async def run():
+        # One request first, so the others find its prefix cached
+        await service.generate_sql_with_retry(prompts[0])
+        await service.generate_many(prompts[1:])
+
+    asyncio.run(run())
+
+    assert completions.cache_keys == ['sql-abc'] * 4 + [None], f"Unexpected keys: {completions.cache_keys}"
+    stats = service.prompt_cache.stats()
+    assert stats['requests'] == 5 and stats['hits'] == 3, f"Unexpected stats: {stats}"
+    assert stats['cached_tokens'] == 3 * 1024, f"Wrong cached tokens: {stats}"
+    assert abs(stats['cached_share'] - 3 * 1024 / (5 * 1200)) < 1e-9, f"Wrong share: {stats}"
+
+    print(f"✓ {stats['hits']}/{stats['requests']} hits, {stats['cached_share']:.0%} of prompt tokens cached")
+
+    # SDKs without the prompt_cache_key keyword still send the key
+    completions = OldSDKCompletions()
+    service = make_service(completions, max_concurrency=1)
+    asyncio.run(service.generate_sql_with_retry(prompts[0]))
+    assert completions.extra_bodies == [{'prompt_cache_key': 'sql-abc'}], \
+        f"Key not sent: {completions.extra_bodies}"
+
+    # Arguments the client rejects are not retried as if the error were transient
+    completions = RejectingCompletions()
+    service = make_service(completions, max_concurrency=1)
+    try:
+        asyncio.run(service.generate_sql_with_retry(prompts[0]))
+        raise AssertionError("TypeError swallowed")
+    except TypeError:
+        pass
+    assert completions.calls == 1, f"Rejected arguments retried {completions.calls - 1} times"
+    print("✓ Key sent as an extra body field; rejected arguments fail at once")
+    print("✅ PROMPT CACHE STATISTICS TESTS PASSED\n")
+    return True
+
+
+if __name__ == '__main__':
+    try:
+        test_concurrency_limit()
+        test_non_blocking_retry()
+        test_prompt_cache_stats()
+        print("="*50)
+        print("✅ ALL ASYNC LLM TESTS PASSED")
+        print("="*50)
+        sys.exit(0)
+    except AssertionError as e:
+        print(f'\n❌ ASYNC LLM TEST FAILED: {e}')
+        sys.exit(1)
+    except Exception as e:
+        print(f'\n❌ ERROR: {e}')
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -3,14 +3,24 @@ Module Unit Tests
 Tests individual modules in isolation.
 """
 
+import os
+import shutil
 import sys
+import tempfile
+import tracemalloc
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
+
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
 
 from data_loader import DataLoader
+from dtype_compaction import compact_dataframe
+from query_engine import SQLiteEngine
 from query_handler import QueryHandler
+from schema_profile import SchemaProfile
 from sql_validator import SQLValidator
 
 
@@ -60,6 +70,263 @@ def test_data_loader():
     return True
 
 
+def test_data_cache():
+    """Test the on-disk cache of the parsed workbook"""
+
+    print("=== TESTING DATA CACHE ===\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        excel_path = os.path.join(tmp, 'data.xlsx')
+        shutil.copy('Data Dump - Accrual Accounts.xlsx', excel_path)
+        cache_dir = os.path.join(tmp, 'cache')
+
+        # Cold load writes the cache
+        print("1. Testing cold load...")
+        cold = DataLoader(excel_path, cache_dir=cache_dir)
+        cold.load_data()
+        cache_file = cold.cache.cache_path(excel_path)
+        assert cache_file.exists(), "Cache file not written"
+        print(f"   ✓ Cache written: {cache_file.name}\n")
+
+        # Warm load reads the same data back
+        print("2. Testing warm load...")
+        warm = DataLoader(excel_path, cache_dir=cache_dir)
+        warm.load_data()
+        assert warm.df.equals(cold.df), "Cached data differs from the workbook"
+        assert list(warm.df.dtypes) == list(cold.df.dtypes), "Cached dtypes differ"
+        print(f"   ✓ Warm load matches ({len(warm.df)} rows)\n")
+
+        # Touching the workbook invalidates the entry
+        print("3. Testing invalidation...")
+        stat = os.stat(excel_path)
+        os.utime(excel_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        assert not cold.cache.cache_path(excel_path).exists(), "Stale entry still valid"
+
+        DataLoader(excel_path, cache_dir=cache_dir).load_data()
+        entries = list(Path(cache_dir).glob('*.feather'))
+        assert len(entries) == 1, f"Expected 1 cache entry, found {len(entries)}"
+        assert entries[0] != cache_file, "Cache entry not replaced"
+        print("   ✓ Modified workbook re-read and stale entry removed\n")
+
+    print("✅ DATA CACHE TESTS PASSED\n")
+    return True
+
+
+def test_memory_mapped_loading():
+    """Test serving the data from a shared memory-mapped cache file"""
+
+    print("=== TESTING MEMORY-MAPPED LOADING ===\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        excel_path = os.path.join(tmp, 'data.xlsx')
+        shutil.copy('Data Dump - Accrual Accounts.xlsx', excel_path)
+        cache_dir = os.path.join(tmp, 'cache')
+
+        regular = DataLoader(excel_path)
+        regular.load_data()
+
+        # Cold and warm loads both serve the mapped file
+        print("1. Testing cold and warm loads...")
+        for attempt in ("cold", "warm"):
+            mapped = DataLoader(excel_path, cache_dir=cache_dir, memory_map=True)
+            mapped.load_data()
+            assert mapped.df.equals(regular.df), f"{attempt} mapped data differs from the workbook"
+            assert mapped.data_fingerprint == regular.data_fingerprint, "Fingerprint depends on load mode"
+            assert mapped.schema_fingerprint == regular.schema_fingerprint, "Schema depends on load mode"
+        print("   ✓ Same data, data fingerprint and schema as a regular load\n")
+
+        # Columns that need no conversion reference the file's pages
+        print("2. Testing zero-copy columns...")
+        values = np.asarray(mapped.df['Transaction_Value'].array)
+        assert not values.flags.writeable and not values.flags.owndata, \
+            "Transaction_Value was copied out of the memory map"
+        print("   ✓ Numeric column backed by the read-only mapping\n")
+
+        # The mapping needs somewhere to live
+        print("3. Testing configuration check...")
+        try:
+            DataLoader(excel_path, memory_map=True)
+            raise AssertionError("memory_map accepted without a cache_dir")
+        except ValueError as e:
+            print(f"   ✓ Rejected: {e}\n")
+
+        del mapped, values
+
+    print("✅ MEMORY-MAPPED LOADING TESTS PASSED\n")
+    return True
+
+
+def test_dtype_compaction():
+    """Test compacting column dtypes without changing any value"""
+
+    print("=== TESTING DTYPE COMPACTION ===\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        excel_path = os.path.join(tmp, 'data.xlsx')
+        shutil.copy('Data Dump - Accrual Accounts.xlsx', excel_path)
+        cache_dir = os.path.join(tmp, 'cache')
+
+        regular = DataLoader(excel_path, cache_dir=cache_dir)
+        regular.load_data()
+
+        # Values are preserved while the footprint shrinks
+        print("1. Testing compacted values and dtypes...")
+        compact = DataLoader(excel_path, cache_dir=cache_dir, compact_dtypes=True)
+        compact.load_data()
+        for col in regular.df.columns:
+            assert (compact.df[col].astype(object).fillna(-1) == regular.df[col].astype(object).fillna(-1)).all(), \
+                f"Values changed in {col}"
+        assert isinstance(compact.df['Currency'].dtype, pd.CategoricalDtype), "Currency not categorical"
+        assert compact.df['Fiscal_Year_1'].dtype == 'Int16', \
+            f"Fiscal_Year_1 not downcast: {compact.df['Fiscal_Year_1'].dtype}"
+        assert compact.df['Transaction_Value'].dtype == regular.df['Transaction_Value'].dtype, \
+            "Money column downcast with precision loss"
+        print("   ✓ All values equal, low-cardinality and whole-number columns compacted\n")
+
+        # The summary reports memory before and after
+        print("2. Testing memory summary...")
+        summary = compact.get_data_summary()
+        before, after = summary['memory_bytes_before_compaction'], summary['memory_bytes']
+        assert before == regular.get_data_summary()['memory_bytes'], "Wrong footprint before compaction"
+        assert after < before / 2, f"Compaction saved too little: {before} -> {after}"
+        assert 'memory_bytes_before_compaction' not in regular.get_data_summary(), \
+            "Uncompacted load reports a compaction"
+        print(f"   ✓ {before / 1024:.0f} KB -> {after / 1024:.0f} KB\n")
+
+        # Warm loads come from a separate cache entry and keep the report
+        print("3. Testing warm compacted load...")
+        warm = DataLoader(excel_path, cache_dir=cache_dir, compact_dtypes=True)
+        warm.load_data()
+        assert warm.df.dtypes.equals(compact.df.dtypes), "Warm load lost the compact dtypes"
+        assert warm.get_data_summary()['memory_bytes_before_compaction'] == before, \
+            "Warm load lost the footprint before compaction"
+        plain = DataLoader(excel_path, cache_dir=cache_dir)
+        plain.load_data()
+        assert plain.df.dtypes.equals(regular.df.dtypes), "Plain load served the compacted entry"
+        print("   ✓ Compacted and plain entries cached separately\n")
+
+    # Whole numbers outside int64 would overflow or change on conversion
+    print("4. Testing whole-number floats beyond int64...")
+    floats = pd.DataFrame({
+        'huge': [1e20, 2.0, np.nan],
+        'edge': [2.0 ** 63, -1.0, 0.0],
+        'lowest': [-2.0 ** 63, 1.0, np.nan],
+    })
+    compacted = compact_dataframe(floats)
+    for col in ['huge', 'edge']:
+        assert pd.api.types.is_float_dtype(compacted[col]), f"{col} converted to {compacted[col].dtype}"
+        assert np.array_equal(compacted[col].to_numpy(), floats[col].to_numpy(), equal_nan=True), \
+            f"{col} values changed"
+    assert compacted['lowest'].dtype == 'Int64' and compacted['lowest'][0] == -2 ** 63, \
+        f"int64 minimum not kept: {compacted['lowest'].tolist()}"
+    print("   ✓ Out-of-range columns kept as floats, the int64 minimum converted exactly\n")
+
+    print("✅ DTYPE COMPACTION TESTS PASSED\n")
+    return True
+
+
+def test_streaming_loader():
+    """Test streaming the workbook into a SQLite store in bounded chunks"""
+
+    print("=== TESTING STREAMING LOADER ===\n")
+
+    regular = DataLoader('Data Dump - Accrual Accounts.xlsx')
+    regular.load_data()
+    regular_engine = SQLiteEngine.from_loader(regular)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = SQLiteEngine(database_path=os.path.join(tmp, 'store.db'))
+        try:
+            streaming = DataLoader('Data Dump - Accrual Accounts.xlsx')
+            reloads = []
+            streaming.add_reload_listener(lambda loader: reloads.append(loader.data_fingerprint))
+
+            # The profile built from chunks matches a full in-memory load
+            print("1. Testing chunked load and profile...")
+            tracemalloc.start()
+            profile = streaming.load_streaming(engine, chunk_size=1000)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            assert streaming.df is None, "Streaming load kept the data in memory"
+            assert profile.fingerprint == regular.schema_fingerprint, \
+                "Chunked profile differs from the in-memory profile"
+            assert reloads == [streaming.data_fingerprint], "Reload listeners not notified"
+            summary = streaming.get_data_summary()
+            assert summary['row_count'] == len(regular.df) and 'memory_bytes' not in summary, \
+                f"Unexpected streaming summary: {summary}"
+            print(f"   ✓ {profile.row_count} rows in 1000-row chunks, peak {peak / 1024 / 1024:.1f} MB traced\n")
+
+            # The store answers queries exactly like a regular load
+            print("2. Testing queries against the store...")
+            for sql in [
+                "SELECT * FROM accrual_accounts",
+                "SELECT Currency, SUM(Transaction_Value) AS total FROM accrual_accounts GROUP BY Currency",
+                "SELECT COUNT(*) AS n FROM accrual_accounts WHERE Fiscal_Year_1 = 2015",
+            ]:
+                assert engine.execute(sql).equals(regular_engine.execute(sql)), f"Results differ for: {sql}"
+            print("   ✓ Same results as the in-memory load\n")
+
+            # Reloading swaps the table in one step and leaves no staging table
+            print("3. Testing reload into the existing store...")
+            streaming.load_streaming(engine, chunk_size=5000)
+            assert engine.list_tables() == ['accrual_accounts'], f"Unexpected tables: {engine.list_tables()}"
+            assert len(engine.execute("SELECT * FROM accrual_accounts")) == len(regular.df), \
+                "Reload appended instead of replacing"
+            assert reloads[0] == reloads[1], "Fingerprint depends on the chunk size"
+            print("   ✓ Table replaced, fingerprint independent of chunk size\n")
+        finally:
+            engine.close()
+            regular_engine.close()
+
+    print("✅ STREAMING LOADER TESTS PASSED\n")
+    return True
+
+
+def test_schema_profile():
+    """Test the schema profile computed at load time"""
+
+    print("=== TESTING SCHEMA PROFILE ===\n")
+
+    loader = DataLoader('Data Dump - Accrual Accounts.xlsx')
+    loader.load_data()
+    profile = loader.schema_profile
+
+    # Structured column statistics
+    print("1. Testing column statistics...")
+    assert profile.row_count == 13152, "Incorrect row count in profile"
+    assert len(profile.columns) == 18, f"Expected 18 column profiles, got {len(profile.columns)}"
+
+    currency = profile.get_column('Currency')
+    assert currency.distinct_count == 2, "Currency should have 2 distinct values"
+    assert currency.null_count == 0, "Currency should have no nulls"
+    assert set(currency.sample_values) == {'USD', 'CAD'}, "Unexpected Currency samples"
+
+    clearing = profile.get_column('Clearing_Date')
+    assert clearing.null_count == int(loader.df['Clearing_Date'].isnull().sum()), "Null count mismatch"
+    print(f"   ✓ {len(profile.columns)} columns profiled\n")
+
+    # Description is served from the profile
+    print("2. Testing precomputed description...")
+    assert loader.get_schema_description() is profile.description, "Description recomputed"
+    assert 'Currency (str)' in profile.description or 'Currency (object)' in profile.description, \
+        "Column line missing from description"
+    print("   ✓ Description precomputed\n")
+
+    # Fingerprint is stable across loads and tracks the schema text
+    print("3. Testing fingerprint...")
+    other = DataLoader('Data Dump - Accrual Accounts.xlsx')
+    other.load_data()
+    assert other.schema_fingerprint == loader.schema_fingerprint, "Fingerprint not stable across loads"
+
+    changed = SchemaProfile.from_dataframe(other.df.head(100), other.table_name)
+    assert changed.fingerprint != profile.fingerprint, "Fingerprint ignores data changes"
+    print(f"   ✓ Fingerprint: {profile.fingerprint[:16]}...\n")
+
+    print("✅ SCHEMA PROFILE TESTS PASSED\n")
+    return True
+
+
 def test_query_handler():
     """Test QueryHandler module"""
 
@@ -99,6 +366,47 @@ def test_query_handler():
     return True
 
 
+def test_prefix_prompt_layout():
+    """Test the cacheable prefix prompt layout"""
+
+    print("=== TESTING PREFIX PROMPT LAYOUT ===\n")
+
+    qh = QueryHandler(layout="prefix")
+    schema = "Table name: accrual_accounts\n\nColumns:\n  - Currency (str)\n\nTotal rows: 10"
+
+    # Everything but the question is a shared, byte-identical prefix
+    print("1. Testing the shared prefix...")
+    first = qh.build_prompt("How many CAD rows?", schema, "abc123")
+    second = qh.build_prompt("What is the total value by year?", schema, "abc123")
+    assert first['system'] is second['system'], "Prefix rebuilt for the same schema"
+    assert schema in first['system'] and "Examples:" in first['system'], "Schema or examples missing"
+    assert first['user'] == "User Question: How many CAD rows?", f"Question not alone: {first['user']!r}"
+    assert first['cache_key'] == second['cache_key'] == "sql-abc123", "Cache key not from the fingerprint"
+    print(f"   ✓ {len(first['system'])}-character prefix shared, question last\n")
+
+    # Corrections reuse the prefix; examples need their tables in the schema
+    print("2. Testing corrections and examples...")
+    correction = qh.build_correction_prompt("How many CAD rows?", schema, "SELECT x", "no such column", "abc123")
+    assert correction['system'] is first['system'], "Correction does not share the prefix"
+    assert "SELECT x" in correction['user'] and schema not in correction['user'], "Schema repeated"
+    other = qh.build_prompt("How many rows?", "Table name: vendors\n\nColumns:\n  - Name (str)")
+    assert "Examples:" not in other['system'], "Examples for another table included"
+    assert other['cache_key'] != first['cache_key'], "Different schemas share a cache key"
+    print("   ✓ Correction prompts share the prefix; unrelated examples left out\n")
+
+    print("3. Testing layout configuration...")
+    assert not QueryHandler(layout="inline").uses_prefix and qh.uses_prefix, "Layout not applied"
+    assert 'cache_key' not in QueryHandler(layout="inline").build_prompt("q", schema), "Inline prompt keyed"
+    try:
+        QueryHandler(layout="suffix")
+        raise AssertionError("Unknown layout accepted")
+    except ValueError as e:
+        print(f"   ✓ Rejected: {e}\n")
+
+    print("✅ PREFIX PROMPT LAYOUT TESTS PASSED\n")
+    return True
+
+
 def test_sql_validator():
     """Test SQLValidator module"""
 
@@ -156,7 +464,13 @@ if __name__ == '__main__':
         print("="*60 + "\n")
 
         test_data_loader()
+        test_data_cache()
+        test_memory_mapped_loading()
+        test_dtype_compaction()
+        test_streaming_loader()
+        test_schema_profile()
         test_query_handler()
+        test_prefix_prompt_layout()
         test_sql_validator()
 
         print("="*60)
@@ -0,0 +1,189 @@
+"""
+Query Cost Tests
+Tests static cost estimation and the cost guard against the real dataset profile.
+"""
+
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from data_loader import DataLoader
+from query_cost import QueryCostEstimator, QueryCostGuard
+from query_engine import SQLiteEngine
+from sql_validator import SQLValidator
+
+
+def load_estimator():
+    """Load the dataset and build an estimator from its profile."""
+    loader = DataLoader('Data Dump - Accrual Accounts.xlsx')
+    loader.load_data()
+    return loader, QueryCostEstimator([loader.schema_profile])
+
+
+def test_cost_estimates():
+    """Test cardinality and cost estimates for typical queries"""
+
+    print("=== TESTING QUERY COST ESTIMATES ===\n")
+
+    loader, estimator = load_estimator()
+    rows = loader.schema_profile.row_count
+
+    # Single-table queries
+    print("1. Testing single-table estimates...")
+    full = estimator.estimate("SELECT * FROM accrual_accounts")
+    assert full.rows == rows and full.cost == rows, f"Full scan misestimated: {full}"
+
+    usd = estimator.estimate("SELECT * FROM accrual_accounts WHERE Currency = 'USD'")
+    assert usd.rows == rows // 2, f"Equality selectivity not 1/distinct: {usd}"
+
+    grouped = estimator.estimate(
+        "SELECT Fiscal_Year_1, COUNT(*) FROM accrual_accounts GROUP BY Fiscal_Year_1"
+    )
+    distinct_years = loader.schema_profile.get_column('Fiscal_Year_1').distinct_count
+    assert grouped.rows == distinct_years and not grouped.streamable, f"GROUP BY misestimated: {grouped}"
+
+    limited = estimator.estimate("SELECT * FROM accrual_accounts LIMIT 5")
+    assert limited.rows == 5 and limited.cost < rows, f"LIMIT not applied: {limited}"
+    print(f"   ✓ Scan {full.rows}, USD filter {usd.rows}, {grouped.rows} year groups, LIMIT 5\n")
+
+    # Joins
+    print("2. Testing join estimates...")
+    cross = estimator.estimate("SELECT * FROM accrual_accounts a, accrual_accounts b")
+    assert cross.cartesian and cross.rows == rows * rows, f"Cartesian product missed: {cross}"
+
+    on_key = estimator.estimate(
+        "SELECT a.* FROM accrual_accounts a "
+        "JOIN accrual_accounts b ON a.Ref__Doc__Line_Item = b.Ref__Doc__Line_Item"
+    )
+    assert not on_key.cartesian and on_key.rows < cross.rows, f"Join predicate ignored: {on_key}"
+
+    join_sql = "SELECT * FROM accrual_accounts a JOIN accrual_accounts b ON a.Currency = b.Currency"
+    unfiltered = estimator.estimate(join_sql)
+    filtered = estimator.estimate(join_sql + " WHERE a.Fiscal_Year_1 = 2015 AND b.Fiscal_Year_1 = 2015")
+    expected = unfiltered.rows / distinct_years ** 2
+    assert abs(filtered.rows - expected) <= 1, f"Filters not applied to both join inputs: {filtered}"
+    print(f"   ✓ Cross join {cross.rows:,} rows, key join {on_key.rows:,}, filtered {filtered.rows:,}")
+
+    # USING and NATURAL joins are costed on their columns like the ON form
+    using = estimator.estimate("SELECT * FROM accrual_accounts a JOIN accrual_accounts b USING (Currency)")
+    assert (using.rows, using.cost) == (unfiltered.rows, unfiltered.cost), f"USING not costed like ON: {using}"
+    natural = estimator.estimate("SELECT * FROM accrual_accounts a NATURAL JOIN accrual_accounts b")
+    assert natural.rows <= rows and not natural.cartesian, f"NATURAL join misestimated: {natural}"
+    print(f"   ✓ USING join {using.rows:,} rows like its ON form, NATURAL join {natural.rows:,}\n")
+
+    # Subqueries outside FROM add their cost, per outer row when correlated
+    print("3. Testing subquery estimates...")
+    self_join = ("SELECT COUNT(*) FROM accrual_accounts a, accrual_accounts b "
+                 "WHERE a.Transaction_Value < b.Transaction_Value")
+    inner = estimator.estimate(self_join)
+    scalar = estimator.estimate(f"SELECT ({self_join}) AS n")
+    assert scalar.rows == 1 and scalar.cost >= inner.cost, f"Scalar subquery not costed: {scalar}"
+
+    exists = estimator.estimate(
+        "SELECT * FROM accrual_accounts a WHERE EXISTS "
+        "(SELECT 1 FROM accrual_accounts b, accrual_accounts c WHERE b.Currency = a.Currency)"
+    )
+    assert exists.cartesian, f"Cartesian product inside EXISTS missed: {exists}"
+
+    lookup = "SELECT AVG(b.Transaction_Value) FROM accrual_accounts b WHERE b.Currency = {outer}"
+    uncorrelated = estimator.estimate(
+        f"SELECT * FROM accrual_accounts a WHERE a.Transaction_Value > ({lookup.format(outer=repr('USD'))})"
+    )
+    correlated = estimator.estimate(
+        f"SELECT * FROM accrual_accounts a WHERE a.Transaction_Value > ({lookup.format(outer='a.Currency')})"
+    )
+    assert uncorrelated.cost < 3 * rows and correlated.cost >= rows * rows, \
+        f"Correlation ignored: {uncorrelated.cost:,} vs {correlated.cost:,}"
+    in_list = estimator.estimate("SELECT * FROM accrual_accounts WHERE Currency IN "
+                                 "(SELECT a.Currency FROM accrual_accounts a, accrual_accounts b)")
+    assert in_list.cartesian and in_list.cost >= cross.cost, f"IN subquery not costed: {in_list}"
+    print(f"   ✓ Scalar {scalar.cost:,}, correlated {correlated.cost:,} vs uncorrelated {uncorrelated.cost:,}\n")
+
+    print("✅ QUERY COST ESTIMATE TESTS PASSED\n")
+    return True
+
+
+def test_cost_guard():
+    """Test that over-budget queries are rejected or rewritten before execution"""
+
+    print("=== TESTING QUERY COST GUARD ===\n")
+
+    loader, estimator = load_estimator()
+    guard = QueryCostGuard(estimator, max_cost=1_000_000, rewrite_limit=100)
+
+    # Cheap queries pass unchanged
+    print("1. Testing queries within budget...")
+    sql = "SELECT Currency, COUNT(*) FROM accrual_accounts GROUP BY Currency"
+    assert guard.check(sql) == (True, sql, ""), "Cheap query changed or rejected"
+    print("   ✓ Cheap query passed unchanged\n")
+
+    # Streaming cartesian product gets a LIMIT and then runs quickly
+    print("2. Testing LIMIT rewrite...")
+    allowed, rewritten, message = guard.check("SELECT * FROM accrual_accounts a, accrual_accounts b;")
+    assert allowed and rewritten.endswith("LIMIT 100"), f"Query not rewritten: {rewritten}"
+    assert "LIMIT added" in message, f"Rewrite not explained: {message}"
+
+    engine = SQLiteEngine.from_loader(loader)
+    try:
+        assert len(engine.execute(rewritten)) == 100, "Rewritten query returned wrong row count"
+        print(f"   ✓ {message}\n")
+
+        # The LIMIT wraps the query, so nothing at its end can swallow or duplicate it
+        print("3. Testing rewrites of queries with trailing parts...")
+        cartesian = "SELECT a.Currency, b.Transaction_Value FROM accrual_accounts a, accrual_accounts b"
+        for sql in (cartesian + "; -- note",
+                    cartesian + " /* all pairs */",
+                    cartesian + " LIMIT 5000000"):
+            allowed, rewritten, message = guard.check(sql)
+            assert allowed and rewritten.endswith("LIMIT 100"), f"Query not rewritten: {rewritten}"
+            assert SQLValidator().validate(rewritten) == (True, ""), f"Rewrite is not valid SQL: {rewritten}"
+            assert len(engine.execute(rewritten)) == 100, f"Rewritten query returned wrong row count: {rewritten}"
+
+        # A compound query is rejected or wrapped whole, never given a second LIMIT
+        compound = cartesian + " UNION ALL SELECT Currency, Transaction_Value FROM accrual_accounts LIMIT 5000000"
+        allowed, rewritten, message = guard.check(compound)
+        assert not allowed or SQLValidator().validate(rewritten) == (True, ""), f"Invalid rewrite: {rewritten}"
+        print("   ✓ Trailing comments and larger LIMITs wrapped; compound query not broken\n")
+    finally:
+        engine.close()
+
+    # Materializing self-joins are rejected with a reason for the LLM
+    print("4. Testing rejection...")
+    allowed, _, message = guard.check(
+        "SELECT a.Currency, COUNT(*) FROM accrual_accounts a, accrual_accounts b GROUP BY a.Currency"
+    )
+    assert not allowed and "cartesian" in message, f"Expensive aggregate not rejected: {message}"
+
+    allowed, _, message = guard.check(
+        "SELECT (SELECT COUNT(*) FROM accrual_accounts a, accrual_accounts b "
+        "WHERE a.Transaction_Value < b.Transaction_Value) AS n"
+    )
+    assert not allowed and "process about" in message, f"Expensive scalar subquery not rejected: {message}"
+
+    no_rewrite = QueryCostGuard(estimator, max_cost=1_000_000, rewrite_limit=0)
+    allowed, _, message = no_rewrite.check("SELECT * FROM accrual_accounts a, accrual_accounts b")
+    assert not allowed, "Rewrite used although disabled"
+    print(f"   ✓ {message}\n")
+
+    print("✅ QUERY COST GUARD TESTS PASSED\n")
+    return True
+
+
+if __name__ == '__main__':
+    try:
+        test_cost_estimates()
+        test_cost_guard()
+        print("="*50)
+        print("✅ ALL QUERY COST TESTS PASSED")
+        print("="*50)
+        sys.exit(0)
+    except AssertionError as e:
+        print(f'\n❌ QUERY COST TEST FAILED: {e}')
+        sys.exit(1)
+    except Exception as e:
+        print(f'\n❌ ERROR: {e}')
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
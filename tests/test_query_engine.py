@@ -0,0 +1,324 @@
+"""
+Query Engine Tests
+Tests the persistent SQLite execution engine, the process pool engine,
+query timeouts and the DuckDB sandbox.
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from data_loader import DataLoader
+from query_engine import ENGINES, DuckDBEngine, ProcessPoolEngine, QueryTimeoutError, SQLiteEngine
+from query_handler import QueryHandler
+
+
+def test_sqlite_engine():
+    """Test loading the table once and querying it through the pool"""
+
+    print("=== TESTING SQLITE ENGINE ===\n")
+
+    loader = DataLoader('Data Dump - Accrual Accounts.xlsx')
+    loader.load_data()
+
+    # Build the engine
+    print("1. Testing engine creation...")
+    engine = SQLiteEngine.from_loader(loader, pool_size=2)
+
+    try:
+        assert engine.list_tables() == ['accrual_accounts'], "Table not loaded into store"
+        print("   ✓ Table written into the store\n")
+
+        # Simple count
+        print("2. Testing COUNT query...")
+        result = engine.execute("SELECT COUNT(*) AS total FROM accrual_accounts")
+        assert result.iloc[0, 0] == 13152, f"Expected 13152 rows, got {result.iloc[0, 0]}"
+        print(f"   ✓ Count: {result.iloc[0, 0]}\n")
+
+        # Aggregation matches pandas
+        print("3. Testing GROUP BY against pandas...")
+        result = engine.execute(
+            "SELECT Currency, COUNT(*) AS n FROM accrual_accounts GROUP BY Currency ORDER BY Currency"
+        )
+        expected = loader.df['Currency'].value_counts().sort_index()
+        assert result['Currency'].tolist() == expected.index.tolist(), "Group keys differ"
+        assert result['n'].tolist() == expected.tolist(), "Group counts differ"
+        print(f"   ✓ {len(result)} groups match pandas\n")
+
+        # Connections are read-only
+        print("4. Testing read-only connections...")
+        try:
+            engine.execute("DELETE FROM accrual_accounts")
+            raise AssertionError("DELETE was executed on a read-only connection")
+        except AssertionError:
+            raise
+        except Exception as e:
+            print(f"   ✓ Write rejected: {e}\n")
+
+        result = engine.execute("SELECT COUNT(*) FROM accrual_accounts")
+        assert result.iloc[0, 0] == 13152, "Data changed after rejected write"
+
+        # More concurrent queries than pooled connections
+        print("5. Testing concurrent queries on the pool...")
+        errors = []
+
+        def run_query():
+            try:
+                res = engine.execute("SELECT SUM(Transaction_Value) FROM accrual_accounts")
+                assert len(res) == 1
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run_query) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert not errors, f"Concurrent queries failed: {errors}"
+        assert engine._pool.qsize() == 2, "Connections not returned to the pool"
+        print("   ✓ 8 queries served by 2 connections\n")
+
+    finally:
+        engine.close()
+
+    print("✅ SQLITE ENGINE TESTS PASSED\n")
+    return True
+
+
+def test_process_pool_engine():
+    """Test running queries in worker processes that memory-map the table"""
+
+    print("=== TESTING PROCESS POOL ENGINE ===\n")
+
+    loader = DataLoader('Data Dump - Accrual Accounts.xlsx')
+    loader.load_data()
+
+    print("1. Testing queries in worker processes...")
+    engine = ProcessPoolEngine.from_loader(loader, workers=2)
+
+    try:
+        assert engine.list_tables() == ['accrual_accounts'], "Table not published"
+        result = engine.execute(
+            "SELECT Currency, COUNT(*) AS n FROM accrual_accounts GROUP BY Currency ORDER BY Currency"
+        )
+        expected = loader.df['Currency'].value_counts().sort_index()
+        assert result['n'].tolist() == expected.tolist(), "Worker result differs from pandas"
+        print(f"   ✓ {len(result)} groups match pandas\n")
+
+        # Queries from several sessions at once
+        print("2. Testing concurrent queries...")
+        results, errors = [], []
+
+        def run_query():
+            try:
+                results.append(engine.execute("SELECT COUNT(*) FROM accrual_accounts").iloc[0, 0])
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run_query) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert not errors, f"Concurrent queries failed: {errors}"
+        assert results == [13152] * 6, f"Unexpected results: {results}"
+        print("   ✓ 6 queries served by 2 workers\n")
+
+        # Workers pick up reloaded data
+        print("3. Testing table reload...")
+        engine.load_table('accrual_accounts', loader.df.head(10))
+        result = engine.execute("SELECT COUNT(*) FROM accrual_accounts")
+        assert result.iloc[0, 0] == 10, "Workers still serve the old table"
+        print("   ✓ Workers reloaded the published table\n")
+    finally:
+        engine.close()
+
+    # A query queued before a reload still finds the version it was given
+    print("4. Testing reloads while queries are queued...")
+    engine = ProcessPoolEngine(workers=1)
+    try:
+        engine.load_table('numbers', loader.df[['Transaction_Value']].head(5))
+        slow_sql = ("WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 2000000) "
+                    "SELECT COUNT(*) FROM c")
+        results, errors = [], []
+
+        def run_query(sql):
+            try:
+                results.append(engine.execute(sql).iloc[0, 0])
+            except Exception as e:
+                errors.append(e)
+
+        # The only worker is busy, so the second query waits with version 1 of the table
+        busy = threading.Thread(target=run_query, args=(slow_sql,))
+        busy.start()
+        engine.load_table('accrual_accounts', loader.df.head(20))
+        queued = threading.Thread(target=run_query, args=("SELECT COUNT(*) FROM accrual_accounts",))
+        queued.start()
+        time.sleep(0.1)
+        engine.load_table('accrual_accounts', loader.df.head(30))
+        busy.join()
+        queued.join()
+
+        assert not errors, f"Queued query failed after a reload: {errors}"
+        assert sorted(results) == [20, 2000000], f"Unexpected results: {results}"
+        assert engine.execute("SELECT COUNT(*) FROM accrual_accounts").iloc[0, 0] == 30, "New version not served"
+        published = sorted(path.name for path in engine._data_dir.glob('*.arrow'))
+        assert published == ['accrual_accounts-3.arrow', 'numbers-1.arrow'], f"Old files kept: {published}"
+        print("   ✓ Queued query ran on its version; the old file was removed afterwards")
+
+        # Worker databases live next to the table files, so close() removes them too
+        assert len(list(engine._data_dir.glob('worker_*.db'))) == 1, "Worker database not in the data directory"
+    finally:
+        engine.close()
+    assert not engine._data_dir.exists(), "Files left behind after close()"
+    print("   ✓ Worker database removed on close\n")
+
+    print("✅ PROCESS POOL ENGINE TESTS PASSED\n")
+    return True
+
+
+def test_query_timeout():
+    """Test that runaway queries are cancelled and leave the engine usable"""
+
+    print("=== TESTING QUERY TIMEOUTS ===\n")
+
+    loader = DataLoader('Data Dump - Accrual Accounts.xlsx')
+    loader.load_data()
+
+    slow_sql = (
+        "SELECT COUNT(*) FROM accrual_accounts a, accrual_accounts b "
+        "WHERE a.Transaction_Value < b.Transaction_Value"
+    )
+
+    for name, engine_class in ENGINES.items():
+        try:
+            size = {"workers": 1} if engine_class is ProcessPoolEngine else {"pool_size": 1}
+            engine = engine_class.from_loader(loader, timeout=0.2, **size)
+        except ImportError:
+            print(f"   - {name} not installed, skipped\n")
+            continue
+
+        try:
+            print(f"Testing {name} engine...")
+            start = time.perf_counter()
+            try:
+                engine.execute(slow_sql)
+                raise AssertionError("Runaway query was not cancelled")
+            except QueryTimeoutError as e:
+                elapsed = time.perf_counter() - start
+                assert elapsed < 2, f"Cancellation took {elapsed:.2f}s"
+                assert e.timeout == 0.2, "Timeout not recorded on the error"
+                print(f"   ✓ Cancelled after {elapsed:.2f}s")
+
+            # The same pooled connection still answers queries
+            result = engine.execute("SELECT COUNT(*) AS total FROM accrual_accounts")
+            assert result.iloc[0, 0] == 13152, "Engine unusable after cancellation"
+
+            # Per-call budgets override the default; other errors are not timeouts
+            try:
+                engine.execute(slow_sql, timeout=0.05)
+                raise AssertionError("Runaway query was not cancelled")
+            except QueryTimeoutError as e:
+                assert e.timeout == 0.05, "Per-call timeout ignored"
+            try:
+                engine.execute("SELECT Missing_Column FROM accrual_accounts")
+                raise AssertionError("Invalid query did not fail")
+            except QueryTimeoutError:
+                raise AssertionError("Ordinary error reported as a timeout")
+            except AssertionError:
+                raise
+            except Exception:
+                pass
+            print("   ✓ Engine still usable, ordinary errors unchanged\n")
+        finally:
+            engine.close()
+
+    # The timeout message is usable as correction feedback
+    prompts = QueryHandler().build_correction_prompt(
+        "Compare all transactions", "schema", slow_sql, str(QueryTimeoutError(0.2))
+    )
+    assert "timed out" in prompts['user'], "Timeout not explained in the correction prompt"
+    print("✓ Timeout error feeds the correction prompt\n")
+
+    print("✅ QUERY TIMEOUT TESTS PASSED\n")
+    return True
+
+
+def test_duckdb_sandbox():
+    """Test that DuckDB queries cannot touch files or run several statements"""
+
+    print("=== TESTING DUCKDB SANDBOX ===\n")
+
+    loader = DataLoader('Data Dump - Accrual Accounts.xlsx')
+    loader.load_data()
+    try:
+        engine = DuckDBEngine.from_loader(loader)
+    except ImportError:
+        print("   - duckdb not installed, skipped\n")
+        return True
+
+    output = Path("/tmp") / f"duckdb_sandbox_{time.time_ns()}.csv"
+    try:
+        print("1. Testing file access...")
+        for sql in ("SELECT * FROM read_csv('/etc/passwd', sep=':', header=false) LIMIT 2",
+                    f"COPY (SELECT 42 AS x) TO '{output}'",
+                    "SET enable_external_access = true"):
+            try:
+                engine.execute(sql)
+                raise AssertionError(f"Query was allowed: {sql}")
+            except AssertionError:
+                raise
+            except Exception:
+                pass
+        assert not output.exists(), "COPY wrote a file"
+        print("   ✓ Reading and writing files refused, setting locked\n")
+
+        print("2. Testing multiple statements...")
+        try:
+            engine.execute(f"SELECT 1 AS a; COPY (SELECT 42 AS x) TO '{output}'; SELECT 2 AS b")
+            raise AssertionError("Several statements were executed")
+        except ValueError as e:
+            assert "single SQL statement" in str(e), f"Wrong error: {e}"
+        assert not output.exists(), "COPY wrote a file"
+        print("   ✓ Rejected before execution\n")
+
+        # Registered tables still work, including after a reload
+        print("3. Testing registered tables...")
+        result = engine.execute("SELECT COUNT(*) AS total FROM accrual_accounts")
+        assert result.iloc[0, 0] == 13152, "Registered table unusable"
+        engine.load_table("accrual_accounts", loader.df.head(10))
+        result = engine.execute("SELECT COUNT(*) AS total FROM accrual_accounts")
+        assert result.iloc[0, 0] == 10, "Reloaded table unusable"
+        print("   ✓ Queried as before, including after a reload\n")
+    finally:
+        engine.close()
+        output.unlink(missing_ok=True)
+
+    print("✅ DUCKDB SANDBOX TESTS PASSED\n")
+    return True
+
+
+if __name__ == '__main__':
+    try:
+        test_sqlite_engine()
+        test_process_pool_engine()
+        test_query_timeout()
+        test_duckdb_sandbox()
+        print("="*50)
+        print("✅ ALL QUERY ENGINE TESTS PASSED")
+        print("="*50)
+        sys.exit(0)
+    except AssertionError as e:
+        print(f'\n❌ QUERY ENGINE TEST FAILED: {e}')
+        sys.exit(1)
+    except Exception as e:
+        print(f'\n❌ ERROR: {e}')
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,256 @@
+"""
+Query Pipeline Tests
+Tests the generate, validate, execute and correct loop with a scripted LLM
+(no API calls).
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from data_loader import DataLoader
+from intent_matcher import IntentMatcher
+from query_engine import SQLiteEngine
+from query_pipeline import FailedSQLCache, QueryPipeline
+from question_index import QuestionIndex
+from response_cache import ResponseCache
+
+
+VALID = "SELECT Currency, COUNT(*) AS n FROM accrual_accounts GROUP BY Currency ORDER BY Currency"
+UNKNOWN_COLUMN = "SELECT Currency_Code, COUNT(*) AS n FROM accrual_accounts GROUP BY Currency_Code"
+TYPE_MISMATCH = "SELECT Currency FROM accrual_accounts WHERE Currency = 1 + 'x' + Missing"
+
+
+class ScriptedLLM:
+    """Answers with a fixed list of SQL queries, one per call."""
+
+    model = "scripted"
+    temperature = 0.0
+
+    def __init__(self, answers, delay: float = 0.0):
+        self.answers = list(answers)
+        self.delay = delay
+        self.calls = 0
+        self.prompts = []
+
+    def _next(self, prompts) -> str:
+        self.calls += 1
+        self.prompts.append(prompts)
+        time.sleep(self.delay)
+        sql = self.answers[min(self.calls, len(self.answers)) - 1]
+        return f"```sql\n{sql}\n```\n\nExplanation: answer {self.calls}."
+
+    def generate_sql_with_retry(self, prompts):
+        return self._next(prompts)
+
+    def stream_sql_with_retry(self, prompts):
+        response = self._next(prompts)
+        for i in range(0, len(response), 7):
+            yield response[i:i + 7]
+
+
+class CountingEngine(SQLiteEngine):
+    """SQLite engine that records the queries it executes."""
+
+    def __init__(self, delay: float = 0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.delay = delay
+        self.executed = []
+
+    def execute(self, sql, timeout=None):
+        self.executed.append(sql)
+        time.sleep(self.delay)
+        return super().execute(sql, timeout=timeout)
+
+
+def load_data():
+    """Load the accrual accounts workbook."""
+    loader = DataLoader('Data Dump - Accrual Accounts.xlsx')
+    loader.load_data()
+    return loader
+
+
+def make_pipeline(loader, engine, llm, **kwargs) -> QueryPipeline:
+    """Build a pipeline without streaming or candidates unless asked for."""
+    options = {"stream": False, "candidates": 1, "deadline": 0}
+    options.update(kwargs)
+    return QueryPipeline(loader, llm, engine, **options)
+
+
+def test_correction_loop():
+    """Test corrections after execution errors, the attempt budget and failed queries"""
+
+    print("=== TESTING CORRECTION LOOP ===\n")
+
+    loader = load_data()
+    engine = CountingEngine.from_loader(loader)
+
+    try:
+        # Execution errors are sent back to the LLM
+        print("1. Testing execution error correction...")
+        llm = ScriptedLLM([UNKNOWN_COLUMN, VALID])
+        pipeline = make_pipeline(loader, engine, llm)
+        result = pipeline.run("How many rows per currency?")
+        assert result.status == "ok" and result.sql == VALID, f"Not corrected: {result.error}"
+        assert len(result.attempts) == 1 and "Currency_Code" in result.attempts[0].error, \
+            f"Wrong attempts: {result.attempts}"
+        assert "Currency_Code" in llm.prompts[1]['user'], "Error missing from the correction prompt"
+        assert len(result.df) == 2 and result.explanation == "answer 2.", "Wrong result"
+        print(f"   ✓ Corrected after: {result.attempts[0].error[:60]}...\n")
+
+        # A failed query is never executed again for the same question
+        print("2. Testing failed queries...")
+        executed = len(engine.executed)
+        llm = ScriptedLLM([UNKNOWN_COLUMN, VALID])
+        pipeline.llm_service = llm
+        result = pipeline.run("how many rows per currency")
+        assert result.status == "ok", f"Question failed: {result.error}"
+        assert engine.executed[executed:] == [VALID], f"Failed query ran again: {engine.executed[executed:]}"
+        assert "already failed" in result.attempts[0].error, f"Wrong error: {result.attempts[0].error}"
+        assert pipeline.failed_sql_cache.hits == 1, "Failure not served from the cache"
+
+        # Another question may still run the same query
+        result = make_pipeline(loader, engine, ScriptedLLM([UNKNOWN_COLUMN, VALID]),
+                               failed_sql_cache=pipeline.failed_sql_cache).run("Count rows by currency code")
+        assert engine.executed[-2:] == [UNKNOWN_COLUMN, VALID], "Failure applied to another question"
+        print("   ✓ Query skipped for the same question, run for another one\n")
+
+        # Validation errors are corrected too
+        print("3. Testing validation error correction...")
+        llm = ScriptedLLM(["DELETE FROM accrual_accounts", VALID])
+        result = make_pipeline(loader, engine, llm).run("Remove the rows, then count them by currency")
+        assert result.status == "ok" and len(result.attempts) == 1, f"Not corrected: {result}"
+        assert "DELETE" not in "".join(engine.executed), "Unsafe query executed"
+        print(f"   ✓ Corrected after: {result.attempts[0].error}\n")
+
+        # The attempt budget bounds the LLM calls
+        print("4. Testing the attempt budget...")
+        llm = ScriptedLLM([UNKNOWN_COLUMN, TYPE_MISMATCH, UNKNOWN_COLUMN + " LIMIT 5", VALID])
+        result = make_pipeline(loader, engine, llm, max_attempts=3).run("Rows per currency?")
+        assert result.status == "failed" and len(result.attempts) == 3, f"Wrong outcome: {result}"
+        assert llm.calls == 3 and "after 3 attempts" in result.error, f"Wrong error: {result.error}"
+        print(f"   ✓ {result.error[:70]}...\n")
+
+        # The failure cache is bounded
+        print("5. Testing the failure cache size...")
+        cache = FailedSQLCache(max_entries=2)
+        for i in range(3):
+            cache.put(f"question {i}", "SELECT 1", "schema", "error")
+        assert len(cache) == 2 and cache.get("question 0", "SELECT 1", "schema") is None, "Cache not bounded"
+        assert cache.get("Question 2?", " SELECT 1; ", "schema") == "error", "Keys not normalized"
+        assert cache.get("question 2", "SELECT 1", "other schema") is None, "Schema change kept failures"
+        print("   ✓ Oldest failure dropped; keys normalized and tied to the schema\n")
+    finally:
+        engine.close()
+
+    print("✅ CORRECTION LOOP TESTS PASSED\n")
+    return True
+
+
+def test_deadline():
+    """Test that the deadline bounds the whole loop"""
+
+    print("=== TESTING DEADLINE ===\n")
+
+    loader = load_data()
+    engine = CountingEngine.from_loader(loader)
+
+    try:
+        print("1. Testing a slow LLM...")
+        llm = ScriptedLLM([UNKNOWN_COLUMN + f" LIMIT {i}" for i in range(1, 20)], delay=0.2)
+        pipeline = make_pipeline(loader, engine, llm, max_attempts=20, deadline=0.5)
+        start = time.perf_counter()
+        result = pipeline.run("How many rows per currency?")
+        elapsed = time.perf_counter() - start
+        assert result.status == "failed" and "within 0.5 seconds" in result.error, f"Wrong error: {result.error}"
+        assert elapsed < 1.0 and llm.calls <= 3, f"Deadline ignored ({elapsed:.2f}s, {llm.calls} calls)"
+        print(f"   ✓ Stopped after {llm.calls} calls in {elapsed:.2f}s\n")
+
+        # A query cut short by the deadline is not remembered as failed
+        print("2. Testing queries cut short...")
+        slow_engine = CountingEngine.from_loader(loader, delay=0.3)
+        try:
+            slow_sql = ("SELECT COUNT(*) AS n FROM accrual_accounts a JOIN accrual_accounts b "
+                        "ON a.Currency = b.Currency")
+            pipeline = make_pipeline(loader, slow_engine, ScriptedLLM([slow_sql]), max_attempts=1,
+                                     deadline=0.35)
+            pipeline.cost_guard.max_cost = float('inf')
+            result = pipeline.run("Join every row with every row of the same currency")
+            assert result.status == "failed" and "timed out" in result.attempts[0].error, \
+                f"Query not cancelled: {result.attempts}"
+            assert len(pipeline.failed_sql_cache) == 0, "Query cut short by the deadline remembered"
+        finally:
+            slow_engine.close()
+        print(f"   ✓ {result.attempts[0].error[:50]}... (not remembered)\n")
+    finally:
+        engine.close()
+
+    print("✅ DEADLINE TESTS PASSED\n")
+    return True
+
+
+def test_sources():
+    """Test intents, streaming, the response cache and similar questions"""
+
+    print("=== TESTING QUERY SOURCES ===\n")
+
+    loader = load_data()
+    engine = CountingEngine.from_loader(loader)
+    llm = ScriptedLLM([VALID])
+    pipeline = make_pipeline(
+        loader, engine, llm, stream=True,
+        intent_matcher=IntentMatcher(loader.schema_profiles),
+        response_cache=ResponseCache(),
+        question_index=QuestionIndex(threshold=0.6)
+    )
+
+    try:
+        print("1. Testing intents...")
+        result = pipeline.run("How many USD transactions?")
+        assert result.status == "ok" and result.source == "intent" and llm.calls == 0, f"Wrong result: {result}"
+        print(f"   ✓ {result.sql} (no LLM call)\n")
+
+        # The explanation of a streamed response is read after the result is shown
+        print("2. Testing streaming...")
+        question = "Show the transaction count for each currency code"
+        result = pipeline.run(question, wait_for_explanation=False)
+        assert result.status == "ok" and result.source == "llm", f"Wrong result: {result}"
+        assert pipeline.response_cache.stats()['size'] == 0, "Response cached before it was complete"
+        assert result.finish() == "answer 1." and result.finish() == "answer 1.", "Explanation missing"
+        assert pipeline.response_cache.stats()['size'] == 1, "Response not cached"
+        print(f"   ✓ Explanation read after the result: '{result.explanation}'\n")
+
+        print("3. Testing cached and similar questions...")
+        result = pipeline.run(question + "?")
+        assert result.source == "cache" and result.explanation == "answer 1.", f"Wrong source: {result.source}"
+        result = pipeline.run("Show me the transaction count for each currency code")
+        assert result.source == "similar" and result.sql == VALID, f"Wrong source: {result.source}"
+        assert llm.calls == 1, f"LLM called {llm.calls} times"
+        print("   ✓ Cached response and similar question reused without the LLM\n")
+    finally:
+        engine.close()
+
+    print("✅ QUERY SOURCE TESTS PASSED\n")
+    return True
+
+
+if __name__ == '__main__':
+    try:
+        test_correction_loop()
+        test_deadline()
+        test_sources()
+        print("="*50)
+        print("✅ ALL QUERY PIPELINE TESTS PASSED")
+        print("="*50)
+        sys.exit(0)
+    except AssertionError as e:
+        print(f'\n❌ QUERY PIPELINE TEST FAILED: {e}')
+        sys.exit(1)
+    except Exception as e:
+        print(f'\n❌ ERROR: {e}')
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,144 @@
+"""
+Schema Selector Tests
+Tests pruning the schema description to the columns relevant to a question.
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from data_loader import DataLoader
+from query_handler import QueryHandler
+from schema_profile import SchemaProfile
+from schema_selector import SchemaSelector, estimate_tokens
+
+
+def load_profiles():
+    """Load the accrual accounts workbook and return its profiles."""
+    loader = DataLoader('Data Dump - Accrual Accounts.xlsx')
+    loader.load_data()
+    return loader.schema_profiles
+
+
+def described_columns(description: str):
+    """Names of the columns described in full."""
+    return [line.split(' (')[0][4:] for line in description.splitlines() if line.startswith('  - ')]
+
+
+def test_relevance():
+    """Test that the columns a question needs are described"""
+
+    print("=== TESTING SCHEMA RELEVANCE ===\n")
+
+    profiles = load_profiles()
+    selector = SchemaSelector(top_k=5, token_budget=0)
+
+    # Column names, abbreviations and values all count
+    print("1. Testing ranking...")
+    cases = [
+        ("How many transactions are in USD currency?", ['Currency', 'Transaction_Value']),
+        ("How many CAD rows are there?", ['Currency']),
+        ("What is the total transaction value by fiscal year?", ['Transaction_Value', 'Fiscal_Year_1']),
+        ("Count the documents by business transaction type", ['Bus__Transac__Type']),
+        ("What is the average exchange rate?", ['Exchange_rate']),
+    ]
+    for question, expected in cases:
+        description = selector.describe(question, profiles)
+        columns = described_columns(description)
+        assert len(columns) == 5, f"Expected 5 columns, got {columns}"
+        for name in expected:
+            assert name in columns, f"{name} missing for '{question}': {columns}"
+        print(f"   ✓ '{question}' -> {', '.join(expected)}")
+
+    # Omitted columns are still named, in the table's column order
+    print("\n2. Testing the description format...")
+    description = selector.describe("How many CAD rows are there?", profiles)
+    assert description.startswith("Table name: accrual_accounts"), "Table header missing"
+    assert "(Other columns: " in description and "Total rows: 13152" in description, "Format changed"
+    order = [column.name for column in profiles[0].columns]
+    columns = described_columns(description)
+    assert columns == sorted(columns, key=order.index), "Columns not in table order"
+    print("   ✓ Table header, other column names and row count kept\n")
+
+    # Values of low-cardinality columns are known in full, but not described
+    print("3. Testing known values...")
+    currency = profiles[0].get_column('Currency')
+    assert currency.known_values == ('CAD', 'USD'), f"Unexpected values: {currency.known_values}"
+    assert profiles[0].get_column('Transaction_Value').known_values == (), "High-cardinality values kept"
+    assert 'known_values' not in profiles[0].description, "Known values leaked into the description"
+    print(f"   ✓ Currency values {currency.known_values}\n")
+
+    print("✅ SCHEMA RELEVANCE TESTS PASSED\n")
+    return True
+
+
+def test_budget():
+    """Test the token budget, failed SQL columns and prompt savings"""
+
+    print("=== TESTING SCHEMA BUDGET ===\n")
+
+    profiles = load_profiles()
+    question = "How many transactions are in USD currency?"
+    full = profiles[0].description
+
+    # Prompts shrink with the default settings
+    print("1. Testing prompt savings...")
+    handler = QueryHandler()
+    pruned = SchemaSelector(top_k=10, token_budget=400).describe(question, profiles)
+    pruned_prompt = handler.build_prompt(question, pruned)
+    full_prompt = handler.build_prompt(question, full)
+    saved = 1 - estimate_tokens(pruned_prompt['user']) / estimate_tokens(full_prompt['user'])
+    assert saved > 0.2, f"Only {saved:.0%} of the prompt saved"
+    print(f"   ✓ User prompt ~{estimate_tokens(full_prompt['user'])} -> "
+          f"~{estimate_tokens(pruned_prompt['user'])} tokens ({saved:.0%} smaller)\n")
+
+    # The budget bounds the description
+    print("2. Testing the token budget...")
+    for budget in (120, 200, 300):
+        description = SchemaSelector(top_k=18, token_budget=budget).describe(question, profiles)
+        assert estimate_tokens(description) <= budget, f"Budget {budget} exceeded"
+        assert 'Currency' in described_columns(description), f"Best column dropped at budget {budget}"
+    print("   ✓ Descriptions stay within 120, 200 and 300 tokens\n")
+
+    # Columns used by failed SQL survive pruning
+    print("3. Testing failed SQL columns...")
+    failed_sql = ('SELECT "Posting_period_1", SUM(Exchange_rate) FROM accrual_accounts '
+                  'WHERE Country_Key = \'US\' GROUP BY Posting_period_1')
+    description = SchemaSelector(top_k=2, token_budget=60).describe(question, profiles, failed_sql=failed_sql)
+    columns = described_columns(description)
+    for name in ('Posting_period_1', 'Exchange_rate', 'Country_Key'):
+        assert name in columns, f"{name} from the failed SQL dropped: {columns}"
+    print(f"   ✓ Kept {', '.join(columns)} beyond the budget\n")
+
+    # Pruning can be switched off, and small tables are described in full
+    print("4. Testing full descriptions...")
+    assert SchemaSelector(top_k=0).describe(question, profiles) == full, "top_k=0 still pruned"
+    small = SchemaProfile.from_dataframe(pd.DataFrame({'Currency': ['USD'], 'Amount': [1.0]}), 'small')
+    assert SchemaSelector(top_k=10, token_budget=400).describe(question, [small]) == small.description, \
+        "Table within limits was changed"
+    print("   ✓ Unchanged descriptions when nothing needs pruning\n")
+
+    print("✅ SCHEMA BUDGET TESTS PASSED\n")
+    return True
+
+
+if __name__ == '__main__':
+    try:
+        test_relevance()
+        test_budget()
+        print("="*50)
+        print("✅ ALL SCHEMA SELECTOR TESTS PASSED")
+        print("="*50)
+        sys.exit(0)
+    except AssertionError as e:
+        print(f'\n❌ SCHEMA SELECTOR TEST FAILED: {e}')
+        sys.exit(1)
+    except Exception as e:
+        print(f'\n❌ ERROR: {e}')
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)